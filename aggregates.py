@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+import pickle
+
+from incremental import BoxScoreStore
+
+"""Counting stats of a player box score row that are summed and averaged"""
+STAT_COLUMNS = ['min', 'pts', 'fgm', 'fga', '3pm', '3pa', 'ftm', 'fta', 'oreb', 'dreb',
+                'reb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pm']
+
+"""Percentages recomputed from the summed made/attempted columns"""
+PERCENTAGES = [('fgp', 'fgm', 'fga'), ('3pp', '3pm', '3pa'), ('ftp', 'ftm', 'fta')]
+
+"""Rolling windows, in games"""
+WINDOWS = (5, 10, 20)
+
+"""Season stats columns compared by cross_check() -> allowed difference.
+Season stats are per game averages rounded to one decimal, and box score
+minutes are whole minutes."""
+CROSS_CHECK_TOLERANCES = dict({column: 0.051 for column in STAT_COLUMNS}, min=0.551, gp=0)
+
+SPLITS = ('team', 'matchup')
+
+
+def add_percentages(df, suffix: str = ''):
+    """
+    Adds fgp/3pp/ftp (0-100, like the tables) computed from the made and
+    attempted columns of a DataFrame of sums or averages.
+    """
+
+    df = df.copy()
+    for percentage, made, attempted in PERCENTAGES:
+        if made + suffix in df.columns:
+            attempts = df[attempted + suffix].where(df[attempted + suffix] != 0)
+            df[percentage + suffix] = 100 * df[made + suffix] / attempts
+    return df
+
+
+def rolling_averages(box_scores, windows=WINDOWS, columns=STAT_COLUMNS):
+    """
+    Computes every player's rolling averages over his last n games at each
+    game (the game included), for every window. Each window is a
+    difference of two per-player cumulative sums, so there is no Python
+    loop over players.
+
+    Args:
+        box_scores: DataFrame from parse_player_box_scores()
+        windows: window sizes in games
+        columns: stats to average
+    Returns:
+        DataFrame of player, gamedate and one <stat>_last<n> column per
+        stat and window, ordered by player and date.
+    """
+
+    import numpy
+
+    df = box_scores.sort_values(['player', 'gamedate'], kind='stable').reset_index(drop=True)
+    players = df['player'].astype(object).values
+    stats = df[columns].astype('float64')
+    sums = stats.groupby(players, sort=False).cumsum()
+    games = stats.groupby(players, sort=False).cumcount().values + 1
+
+    result = df[['player', 'gamedate']].copy()
+    for window in windows:
+        before = sums.groupby(players, sort=False).shift(window).fillna(0)
+        means = (sums - before).div(numpy.minimum(games, window), axis=0)
+        for column in columns:
+            result['{0}_last{1}'.format(column, window)] = means[column].values
+
+    return result
+
+
+def key_hashes(box_scores):
+    """
+    Returns a uint64 hash of each row's BoxScoreStore.KEY_COLUMNS, the
+    same whether the text columns are categorical or plain strings.
+    """
+
+    import pandas
+
+    keys = box_scores[BoxScoreStore.KEY_COLUMNS].copy()
+    for column in keys.columns:
+        if not pandas.api.types.is_datetime64_any_dtype(keys[column]):
+            keys[column] = keys[column].astype(object)
+    return pandas.util.hash_pandas_object(keys, index=False).values
+
+
+class BoxScoreAggregates:
+    """
+    Materialized aggregates of player box scores, updated in place as new
+    games are appended instead of re-scanning the season:
+
+        latest    rolling averages over each player's last 5/10/20 games
+        totals    season-to-date sums and games played per player and season
+        splits    the same sums per player, season and team or opponent
+
+    Only the last max(windows) games of each player are kept, plus a
+    64-bit hash of the key of every row appended, so memory grows by 8
+    bytes a row rather than a row's worth of data. Queries such as
+    last_games('LeBron James', 10) are index lookups.
+
+    Args:
+        windows: rolling window sizes in games
+        columns: stats to aggregate
+    """
+
+    def __init__(self, windows=WINDOWS, columns=STAT_COLUMNS):
+        import numpy
+        import pandas
+
+        self.windows = tuple(sorted(windows))
+        self.columns = list(columns)
+
+        self.recent = None # last max(windows) games of every player
+        self.keys = numpy.empty(0, dtype='uint64') # sorted key hashes of every row appended
+        self.latest = pandas.DataFrame()
+        self.totals = pandas.DataFrame()
+        self.splits = {by: pandas.DataFrame() for by in SPLITS}
+
+    def append(self, box_scores):
+        """
+        Adds box score rows, e.g. a newly collected page or the rows
+        update_player_box_scores() merged. Rows repeating a game already
+        appended (same player, team and date), however old, are ignored:
+        the watermark day a daily update fetches again, a resumed backfill
+        page or a re-run date range is not counted twice.
+
+        Args:
+            box_scores: DataFrame from parse_player_box_scores()
+        Returns:
+            Number of new rows.
+        """
+
+        import numpy
+
+        hashes = key_hashes(box_scores)
+        _, first = numpy.unique(hashes, return_index=True)
+        is_new = numpy.zeros(len(hashes), dtype=bool)
+        is_new[first] = True
+        if len(self.keys):
+            positions = numpy.searchsorted(self.keys, hashes).clip(max=len(self.keys) - 1)
+            is_new &= self.keys[positions] != hashes
+        if not is_new.any():
+            return 0
+
+        new = box_scores[is_new]
+        self.keys = numpy.union1d(self.keys, hashes[is_new])
+
+        rows = new[['player', 'team', 'matchup', 'season', 'gamedate']].copy()
+        for column in ['player', 'team', 'matchup', 'season']:
+            rows[column] = rows[column].astype(object)
+        rows[self.columns] = new[self.columns].astype('float64')
+        rows['gp'] = 1.0
+
+        self.totals = self._add(self.totals, rows, ['player', 'season'])
+        for by in SPLITS:
+            self.splits[by] = self._add(self.splits[by], rows, ['player', 'season', by])
+
+        self._update_latest(rows)
+        return len(rows)
+
+    def _add(self, current, rows, keys):
+        sums = rows.groupby(keys, sort=False)[['gp'] + self.columns].sum()
+        if current.empty:
+            return sums.sort_index()
+        return current.add(sums, fill_value=0).sort_index()
+
+    def _update_latest(self, rows):
+        import pandas
+
+        players = rows['player'].unique()
+
+        if self.recent is None:
+            history = rows
+        else:
+            history = pandas.concat([self.recent[self.recent['player'].isin(players)], rows],
+                                    ignore_index=True)
+
+        history = history.sort_values(['player', 'gamedate'], kind='stable')
+        grouped = history.groupby('player', sort=False)
+
+        tail = grouped.tail(self.windows[-1])
+        if self.recent is None:
+            self.recent = tail.reset_index(drop=True)
+        else:
+            others = self.recent[~self.recent['player'].isin(players)]
+            self.recent = pandas.concat([others, tail], ignore_index=True)
+
+        tail_grouped = tail.groupby('player', sort=False)
+        latest = pandas.DataFrame(index=pandas.Index(tail_grouped.size().index, name='player'))
+        latest['games'] = tail_grouped.size()
+        for window in self.windows:
+            means = tail_grouped.tail(window).groupby('player', sort=False)[self.columns].mean()
+            for column in self.columns:
+                latest['{0}_last{1}'.format(column, window)] = means[column]
+
+        if self.latest.empty:
+            self.latest = latest.sort_index()
+        else:
+            self.latest = pandas.concat([self.latest.drop(players, errors='ignore'),
+                                         latest]).sort_index()
+
+    def last_games(self, player: str, games: int = 10):
+        """
+        Returns a player's averages over his last games (a window size).
+        """
+
+        import numpy
+        import pandas
+
+        if games not in self.windows:
+            raise ValueError("No rolling window of {0} games.".format(games))
+
+        row = self.latest.loc[player]
+        suffix = '_last{0}'.format(games)
+        averages = {column: row[column + suffix] for column in self.columns}
+        averages['games'] = min(row['games'], games)
+        for percentage, made, attempted in PERCENTAGES:
+            if made in averages:
+                averages[percentage] = (100 * averages[made] / averages[attempted]
+                                        if averages[attempted] else numpy.nan)
+        return pandas.Series(averages, name=player)
+
+    def season_to_date(self, player: str = None, season: str = None, per_game: bool = False):
+        """
+        Returns season-to-date sums (or per game averages) with games
+        played, for one player or everyone, one row per player and season.
+        """
+
+        df = self.totals
+        if player is not None:
+            df = df.loc[[player]]
+        if season is not None:
+            df = df.xs(season, level='season', drop_level=False)
+        if per_game:
+            df = df[self.columns].div(df['gp'], axis=0).assign(gp=df['gp'])
+        return add_percentages(df)
+
+    def split(self, player: str, by: str = 'team', season: str = None, per_game: bool = True):
+        """
+        Returns a player's season numbers split by team or opponent.
+
+        Args:
+            player: player name
+            by: 'team' or 'matchup' (opponent)
+            season: only this season
+            per_game: averages instead of sums
+        """
+
+        df = self.splits[by].loc[[player]]
+        if season is not None:
+            df = df.xs(season, level='season', drop_level=False)
+        if per_game:
+            df = df[self.columns].div(df['gp'], axis=0).assign(gp=df['gp'])
+        return add_percentages(df)
+
+    def cross_check(self, season_stats, season: str, tolerances=None):
+        """
+        Compares season-to-date box score averages with the season stats
+        table, to catch missing or duplicated box score pages.
+
+        Args:
+            season_stats: DataFrame from parse_player_season_stats()
+            season: season of both tables
+            tolerances: column -> allowed difference (default:
+                        CROSS_CHECK_TOLERANCES)
+        Returns:
+            DataFrame of mismatches (player, column, box_scores,
+            season_stats, difference). Empty when the tables agree.
+        """
+
+        import pandas
+
+        tolerances = tolerances or CROSS_CHECK_TOLERANCES
+        columns = [column for column in tolerances
+                   if column == 'gp' or column in season_stats.columns]
+
+        # A traded player can have one season stats row per team.
+        stats = season_stats[['player'] + columns].copy()
+        stats['player'] = stats['player'].astype(object)
+        averages = [column for column in columns if column != 'gp']
+        stats[averages] = stats[averages].astype('float64').mul(stats['gp'], axis=0)
+        stats = stats.groupby('player').sum()
+        stats[averages] = stats[averages].div(stats['gp'], axis=0)
+
+        box = self.season_to_date(season=season, per_game=True).reset_index(level='season',
+                                                                           drop=True)
+        box, stats = box[columns].align(stats[columns], join='outer')
+
+        mismatches = list()
+        for column in columns:
+            difference = (box[column].fillna(0) - stats[column].fillna(0)).abs()
+            bad = difference > tolerances[column] + 1e-9
+            for player in difference.index[bad]:
+                mismatches.append((player, column, box.at[player, column],
+                                   stats.at[player, column], difference[player]))
+
+        print("[+] CROSS CHECK {0}: {1} MISMATCHES".format(season, len(mismatches)))
+        return pandas.DataFrame(mismatches, columns=['player', 'column', 'box_scores',
+                                                     'season_stats', 'difference'])
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import json
+import asyncio
+from urllib.parse import urlsplit
+
+from backends import STATS_ENDPOINTS, stats_request, result_set_to_dataframe
+from jobs import JobResult
+from metrics import METRICS
+from my_constants import STATS_BASE_URL, STATS_HEADERS
+from scheduler import SCHEDULER, THROTTLE_STATUSES, retry_after
+from seasons import SEASONS
+
+"""Responses worth another attempt, as in HttpBackend"""
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AsyncNbaDataCollector:
+    """
+    asyncio version of NbaDataCollector over the stats.nba.com JSON
+    endpoints (the HTTP backend), for services that must not block their
+    event loop.
+
+    Requests share one aiohttp session. At most concurrency requests run
+    at once, and at most per_host against any one host. Each one also
+    waits for its turn in scheduler.SCHEDULER and reports its outcome to
+    it, so the request rate adapts and Retry-After is honored as in the
+    other backends. Cancelling a collect call (or the task awaiting it)
+    aborts its request.
+
+    Use as an async context manager, or call close() when done:
+
+        async with AsyncNbaDataCollector() as dc:
+            results = await dc.collect_many(['2017-2018', '2018-2019'])
+
+    Args:
+        base_url: root of the stats API (e.g. a replay server, replay.py)
+        timeout: seconds to wait for each response
+        concurrency: requests in flight at once, across all hosts
+        per_host: requests in flight at once against one host
+        retries: retries on connection errors and 5xx/429 responses
+        backoff: seconds before the first retry, doubled after each one.
+                 Throttling responses are paced by the scheduler instead.
+    """
+
+    """Tables collect_many() can fan out, mapped to their collect method"""
+    KINDS = {
+        "player_box_scores": "collect_player_box_scores",
+        "player_season_stats": "collect_player_season_stats",
+        "team_box_scores": "collect_team_box_scores",
+        "team_season_stats": "collect_team_season_stats",
+    }
+
+    def __init__(self, base_url: str = STATS_BASE_URL, timeout: float = 30,
+                 concurrency: int = 8, per_host: int = 4, retries: int = 3,
+                 backoff: float = 0.5):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = None
+        self._semaphore = None
+        self._host_semaphores = dict()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _open(self):
+        import aiohttp
+
+        # Created lazily so they bind to the running event loop.
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+            self.session = aiohttp.ClientSession(
+                headers=STATS_HEADERS, connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    def _host_semaphore(self, url: str):
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._host_semaphores[host]
+
+    async def close(self):
+        """
+        Closes the HTTP session.
+        """
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_result_set(self, endpoint: str, params: dict):
+        """
+        Requests an endpoint and returns its first result set.
+
+        Args:
+            endpoint: endpoint name such as 'leaguegamelog'
+            params: query string parameters
+        Returns:
+            dict with 'headers' and 'rowSet'
+        """
+
+        import aiohttp
+
+        session = self._open()
+        url = self.base_url + endpoint
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore, self._host_semaphore(url):
+                    async with SCHEDULER.async_slot(url) as slot:
+                        with METRICS.stage('request', endpoint=endpoint):
+                            async with session.get(url, params=params) as response:
+                                slot.status = response.status
+                                slot.retry_after = retry_after(response.headers)
+                                text = await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if response.status not in RETRY_STATUSES or attempt == self.retries:
+                break
+            if response.status not in THROTTLE_STATUSES:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+            # Throttled: the scheduler slowed the host down and paused it for Retry-After.
+
+        response.raise_for_status()
+        METRICS.increment('responses', endpoint=endpoint)
+        # Decoding a season blocks for a while: keep the loop serving requests.
+        payload = await asyncio.get_running_loop().run_in_executor(None, json.loads, text)
+        if 'resultSets' in payload:
+            return payload['resultSets'][0]
+        return payload['resultSet']
+
+    async def collect(self, kind: str, season: str, since=None):
+        """
+        Collects one table of a season.
+
+        Args:
+            kind: key of KINDS
+            season: String containing season to collect.
+            since: only games from this date on (box score kinds)
+        Returns:
+            Dataframe typed like the matching NbaDataCollector method.
+        """
+
+        #Check valid season passed as parameter
+        if season not in SEASONS:
+            raise ValueError("Invalid season option entered.")
+
+        endpoint, params = stats_request(kind, season, since)
+        _, _, fields, schema, table = STATS_ENDPOINTS[kind]
+
+        with METRICS.stage('collect', kind=kind):
+            result_set = await self.get_result_set(endpoint, params)
+            df = await asyncio.get_running_loop().run_in_executor(
+                None, result_set_to_dataframe, result_set, fields, schema, season)
+
+        METRICS.increment('rows', len(df), table=table)
+        return df
+
+    async def collect_player_box_scores(self, season: str, since=None):
+        return await self.collect('player_box_scores', season, since)
+
+    async def collect_player_season_stats(self, season: str):
+        return await self.collect('player_season_stats', season)
+
+    async def collect_team_box_scores(self, season: str, since=None):
+        return await self.collect('team_box_scores', season, since)
+
+    async def collect_team_season_stats(self, season: str):
+        return await self.collect('team_season_stats', season)
+
+    async def _job(self, season: str, kind: str):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            data = await getattr(self, self.KINDS[kind])(season)
+            return JobResult(season, kind, data, None, loop.time() - start)
+        except Exception as error:
+            return JobResult(season, kind, None, repr(error), loop.time() - start)
+
+    async def collect_many(self, seasons, kinds=None):
+        """
+        Collects several seasons and tables concurrently on the event loop.
+        A failed job is returned with its error and does not stop the
+        others. Cancelling the call cancels every job still running.
+
+        Args:
+            seasons: seasons to collect, e.g. SEASONS.between('2010-2011')
+            kinds: keys of KINDS to collect (default: all of them)
+        Returns:
+            Dict of JobResult keyed by (season, kind).
+        """
+
+        if kinds is None:
+            kinds = list(self.KINDS)
+
+        jobs = [(season, kind) for season in seasons for kind in kinds]
+        results = await asyncio.gather(*(self._job(season, kind) for season, kind in jobs))
+
+        for result in results:
+            if result.error:
+                print("[-] FAILED {0} {1}: {2}".format(result.kind, result.season, result.error))
+            else:
+                print("[+] COLLECTED {0} {1}".format(result.kind, result.season))
+
+        return {(result.season, result.kind): result for result in results}
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+
+import json
+
+from checkpoint import PageJournal
+from driver_pool import DriverPool
+from incremental import BoxScoreStore
+from metrics import METRICS
+from my_constants import STATS_BASE_URL, STATS_HEADERS, \
+                         STATS_SITE_URL, PLAYER_BOX_SCORES_PATH, PLAYER_SEASON_STATS_PATH, \
+                         TEAM_BOX_SCORES_PATH, TEAM_SEASON_STATS_PATH
+from player_data_collection import get_player_box_scores, parse_player_box_scores, \
+                                   get_player_season_stats, parse_player_season_stats, \
+                                   get_player_box_scores_concurrently, \
+                                   iter_player_box_score_pages, iter_player_box_score_batches, \
+                                   get_player_box_scores_resumable
+from scheduler import SCHEDULER, THROTTLE_STATUSES, retry_after
+from seasons import SEASONS, api_season
+from team_data_collection import get_all_team_box_scores, get_team_box_scores_pages, \
+                                 parse_team_box_scores, get_team_season_stats, \
+                                 parse_team_season_stats
+from table_schema import PLAYER_BOX_SCORE_SCHEMA, PLAYER_SEASON_STATS_SCHEMA, \
+                         TEAM_BOX_SCORE_SCHEMA, TEAM_SEASON_STATS_SCHEMA, convert_column, \
+                         concat_batches
+
+
+def _value(value):
+    return value
+
+
+def _percent(value):
+    """Scales a 0-1 shooting percentage to the table's 0-100 value."""
+    if value is None:
+        return None
+    return value * 100
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _opponent(value):
+    """'LAL @ GSW' or 'LAL vs. GSW' -> 'GSW'"""
+    return _text(value).split(' ')[-1]
+
+
+def _game_date(value):
+    """'2019-04-10T00:00:00' -> '04/10/2019'"""
+    value = _text(value)
+    return '{0}/{1}/{2}'.format(value[5:7], value[8:10], value[0:4])
+
+
+"""(column, JSON header, transform) for each DataFrame the collectors return.
+Column dtypes come from the matching schema in table_schema.py"""
+PLAYER_BOX_SCORE_FIELDS = [
+    ('player', 'PLAYER_NAME', _text),
+    ('team', 'TEAM_ABBREVIATION', _text),
+    ('matchup', 'MATCHUP', _opponent),
+    ('gamedate', 'GAME_DATE', _game_date),
+    ('wl', 'WL', _text),
+    ('min', 'MIN', _value),
+    ('pts', 'PTS', _value),
+    ('fgm', 'FGM', _value),
+    ('fga', 'FGA', _value),
+    ('fgp', 'FG_PCT', _percent),
+    ('3pm', 'FG3M', _value),
+    ('3pa', 'FG3A', _value),
+    ('3pp', 'FG3_PCT', _percent),
+    ('ftm', 'FTM', _value),
+    ('fta', 'FTA', _value),
+    ('ftp', 'FT_PCT', _percent),
+    ('oreb', 'OREB', _value),
+    ('dreb', 'DREB', _value),
+    ('reb', 'REB', _value),
+    ('ast', 'AST', _value),
+    ('stl', 'STL', _value),
+    ('blk', 'BLK', _value),
+    ('tov', 'TOV', _value),
+    ('pf', 'PF', _value),
+    ('pm', 'PLUS_MINUS', _value),
+]
+
+PLAYER_SEASON_STATS_FIELDS = [
+    ('player', 'PLAYER_NAME', _text),
+    ('team', 'TEAM_ABBREVIATION', _text),
+    ('age', 'AGE', _value),
+    ('gp', 'GP', _value),
+    ('w', 'W', _value),
+    ('l', 'L', _value),
+    ('min', 'MIN', _value),
+    ('pts', 'PTS', _value),
+    ('fgm', 'FGM', _value),
+    ('fga', 'FGA', _value),
+    ('fgp', 'FG_PCT', _percent),
+    ('3pm', 'FG3M', _value),
+    ('3pa', 'FG3A', _value),
+    ('3pp', 'FG3_PCT', _percent),
+    ('ftm', 'FTM', _value),
+    ('fta', 'FTA', _value),
+    ('ftp', 'FT_PCT', _percent),
+    ('oreb', 'OREB', _value),
+    ('dreb', 'DREB', _value),
+    ('reb', 'REB', _value),
+    ('ast', 'AST', _value),
+    ('tov', 'TOV', _value),
+    ('stl', 'STL', _value),
+    ('blk', 'BLK', _value),
+    ('pf', 'PF', _value),
+    ('fp', 'NBA_FANTASY_PTS', _value),
+    ('dd2', 'DD2', _value),
+    ('td3', 'TD3', _value),
+    ('pm', 'PLUS_MINUS', _value),
+]
+
+TEAM_BOX_SCORE_FIELDS = [
+    ('team', 'TEAM_ABBREVIATION', _text),
+    ('opp', 'MATCHUP', _opponent),
+    ('date', 'GAME_DATE', _game_date),
+    ('wl', 'WL', _text),
+    ('min', 'MIN', _value),
+    ('pts', 'PTS', _value),
+    ('fgm', 'FGM', _value),
+    ('fga', 'FGA', _value),
+    ('fgp', 'FG_PCT', _percent),
+    ('3pm', 'FG3M', _value),
+    ('3pa', 'FG3A', _value),
+    ('3pp', 'FG3_PCT', _percent),
+    ('ftm', 'FTM', _value),
+    ('fta', 'FTA', _value),
+    ('ftp', 'FT_PCT', _percent),
+    ('oreb', 'OREB', _value),
+    ('dreb', 'DREB', _value),
+    ('reb', 'REB', _value),
+    ('ast', 'AST', _value),
+    ('stl', 'STL', _value),
+    ('blk', 'BLK', _value),
+    ('tov', 'TOV', _value),
+    ('pf', 'PF', _value),
+    ('pm', 'PLUS_MINUS', _value),
+]
+
+TEAM_SEASON_STATS_FIELDS = [
+    ('team', 'TEAM_NAME', _text),
+    ('gp', 'GP', _value),
+    ('w', 'W', _value),
+    ('l', 'L', _value),
+    ('winpct', 'W_PCT', _value),
+    ('min', 'MIN', _value),
+    ('pts', 'PTS', _value),
+    ('fgm', 'FGM', _value),
+    ('fga', 'FGA', _value),
+    ('fgp', 'FG_PCT', _percent),
+    ('3pm', 'FG3M', _value),
+    ('3pa', 'FG3A', _value),
+    ('3pp', 'FG3_PCT', _percent),
+    ('ftm', 'FTM', _value),
+    ('fta', 'FTA', _value),
+    ('ftp', 'FT_PCT', _percent),
+    ('oreb', 'OREB', _value),
+    ('dreb', 'DREB', _value),
+    ('reb', 'REB', _value),
+    ('ast', 'AST', _value),
+    ('tov', 'TOV', _value),
+    ('stl', 'STL', _value),
+    ('blk', 'BLK', _value),
+    ('blka', 'BLKA', _value),
+    ('pf', 'PF', _value),
+    ('pfd', 'PFD', _value),
+    ('pm', 'PLUS_MINUS', _value),
+]
+
+"""Query strings the stats.nba.com tables send for their data"""
+GAME_LOG_PARAMS = {
+    'Counter': 1000,
+    'DateFrom': '',
+    'DateTo': '',
+    'Direction': 'DESC',
+    'LeagueID': '00',
+    'PlayerOrTeam': 'P',
+    'SeasonType': 'Regular Season',
+    'Sorter': 'DATE',
+}
+
+DASH_STATS_PARAMS = {
+    'College': '', 'Conference': '', 'Country': '', 'DateFrom': '', 'DateTo': '',
+    'Division': '', 'DraftPick': '', 'DraftYear': '', 'GameScope': '',
+    'GameSegment': '', 'Height': '', 'LastNGames': 0, 'LeagueID': '00',
+    'Location': '', 'MeasureType': 'Base', 'Month': 0, 'OpponentTeamID': 0,
+    'Outcome': '', 'PORound': 0, 'PaceAdjust': 'N', 'PerMode': 'PerGame',
+    'Period': 0, 'PlayerExperience': '', 'PlayerPosition': '', 'PlusMinus': 'N',
+    'Rank': 'N', 'SeasonSegment': '', 'SeasonType': 'Regular Season',
+    'ShotClockRange': '', 'StarterBench': '', 'TeamID': 0, 'TwoWay': 0,
+    'VsConference': '', 'VsDivision': '', 'Weight': '',
+}
+
+TEAM_GAME_LOG_PARAMS = dict(GAME_LOG_PARAMS, PlayerOrTeam='T')
+
+TEAM_DASH_STATS_PARAMS = {name: value for name, value in DASH_STATS_PARAMS.items()
+                          if name not in ('College', 'Country', 'DraftPick', 'DraftYear',
+                                          'Height', 'PlayerExperience', 'PlayerPosition',
+                                          'StarterBench', 'Weight')}
+
+"""Collector kind -> (endpoint, query defaults, fields, schema, table name)"""
+STATS_ENDPOINTS = {
+    'player_box_scores': ('leaguegamelog', GAME_LOG_PARAMS, PLAYER_BOX_SCORE_FIELDS,
+                          PLAYER_BOX_SCORE_SCHEMA, 'players/boxscores'),
+    'player_season_stats': ('leaguedashplayerstats', DASH_STATS_PARAMS,
+                            PLAYER_SEASON_STATS_FIELDS, PLAYER_SEASON_STATS_SCHEMA,
+                            'players/traditional'),
+    'team_box_scores': ('leaguegamelog', TEAM_GAME_LOG_PARAMS, TEAM_BOX_SCORE_FIELDS,
+                        TEAM_BOX_SCORE_SCHEMA, 'teams/boxscores'),
+    'team_season_stats': ('leaguedashteamstats', TEAM_DASH_STATS_PARAMS,
+                          TEAM_SEASON_STATS_FIELDS, TEAM_SEASON_STATS_SCHEMA,
+                          'teams/traditional'),
+}
+
+
+def stats_request(kind: str, season: str, since=None):
+    """
+    Returns (endpoint, query parameters) of a kind's table for a season.
+
+    Args:
+        kind: key of STATS_ENDPOINTS
+        season: season such as '2018-2019'
+        since: only games from this date on (game log endpoints)
+    """
+
+    endpoint, defaults, _, _, _ = STATS_ENDPOINTS[kind]
+    params = dict(defaults, Season=SEASONS.api_season(season))
+    if since is not None:
+        params['DateFrom'] = since.strftime('%m/%d/%Y')
+    return endpoint, params
+
+
+def result_set_to_dataframe(result_set, fields, schema, season: str):
+    """
+    Builds a collector DataFrame from one stats.nba.com result set.
+
+    Args:
+        result_set: dict with 'headers' and 'rowSet' from the JSON response
+        fields: list of (column, JSON header, transform) tuples
+        schema: table_schema schema giving each column's dtype
+        season: season to append at the end of dataframe as column.
+    Returns:
+        Dataframe with the same columns and dtypes as the matching table
+        parser.
+    """
+
+    import pandas
+
+    headers = result_set['headers']
+    rows = result_set['rowSet']
+    dtypes = {column: dtype for column, _, dtype in schema}
+
+    with METRICS.stage('dataframe_build'):
+        columns = dict()
+        for column, header, transform in fields:
+            index = headers.index(header)
+            columns[column] = convert_column([transform(row[index]) for row in rows],
+                                             dtypes[column])
+
+        df = pandas.DataFrame(columns)
+        df['season'] = pandas.Categorical([season] * len(df)) #Add the season
+
+    return df
+
+
+class SeleniumBackend:
+    """
+    Fetch backend that drives Chrome through the stats.nba.com tables.
+
+    Args:
+        pool: DriverPool to lease browsers from. One is created from
+              pool_size and max_navigations when not given.
+        pool_size: drivers kept warm between calls
+        max_navigations: page loads before a driver is recycled
+        page_workers: browser sessions reading box score pages at once.
+                      The pool grows to at least this size.
+        cache: ResponseCache for the scraped tables. On a hit no browser
+               is started at all.
+        site_url: root of the table pages. Point it at a replay server
+                  (see replay.py) to run without the live site.
+        checkpoint_dir: journal the box score pages under this folder, so
+                  a failed season resumes at its first missing page
+                  (see checkpoint.py). Takes priority over cache.
+        driver_profile: profile of the pool's drivers, e.g. 'trimmed' for
+                  headless Chrome without images, fonts and ads (see
+                  driver_profiles.py)
+    """
+
+    def __init__(self, pool: DriverPool = None, pool_size: int = 1,
+                 max_navigations: int = 100, page_workers: int = 1, cache=None,
+                 site_url: str = STATS_SITE_URL, checkpoint_dir: str = None,
+                 driver_profile=None):
+        self.page_workers = page_workers
+        self.cache = cache
+        self.checkpoint_dir = checkpoint_dir
+        self.site_url = site_url.rstrip('/')
+        self.pool = pool or DriverPool(max(pool_size, page_workers), max_navigations,
+                                       profile=driver_profile)
+
+    def table_url(self, table: str):
+        """
+        Returns the URL a table such as 'players/boxscores' is cached under.
+        """
+
+        return '{0}/{1}/'.format(self.site_url, table)
+
+    def fetch_text(self, table: str, season: str, fetch, page: int = None):
+        """
+        Runs a getter through the cache, if there is one.
+        """
+
+        if self.cache is None:
+            return fetch()
+        return self.cache.fetch(self.table_url(table), season, fetch, page)
+
+    def _player_box_scores_text(self, season: str):
+        if self.page_workers > 1:
+            return get_player_box_scores_concurrently(
+                self.pool, SEASONS.boxscore_xpath(season), self.page_workers,
+                url=self.site_url + PLAYER_BOX_SCORES_PATH)
+        with self.pool.driver() as browser:
+            return get_player_box_scores(browser, SEASONS.boxscore_xpath(season),
+                                         url=self.site_url + PLAYER_BOX_SCORES_PATH)
+
+    def _player_season_stats_text(self, season: str):
+        with self.pool.driver() as browser:
+            return get_player_season_stats(browser, SEASONS.season_xpath(season),
+                                           url=self.site_url + PLAYER_SEASON_STATS_PATH)
+
+    def _player_box_scores_resumable(self, season: str):
+        journal = PageJournal('players/boxscores', season, self.checkpoint_dir)
+        with self.pool.driver() as browser:
+            box_scores_df = get_player_box_scores_resumable(
+                browser, SEASONS.boxscore_xpath(season), season, journal,
+                key_columns=BoxScoreStore.KEY_COLUMNS,
+                url=self.site_url + PLAYER_BOX_SCORES_PATH)
+        journal.clear() # The season is complete, the next run starts fresh.
+        return box_scores_df
+
+    def player_box_scores(self, season: str, since=None):
+        if self.checkpoint_dir is not None and since is None:
+            return self._player_box_scores_resumable(season)
+        if since is not None or (self.cache is None and self.page_workers == 1):
+            # Parse page by page rather than building one season-long string.
+            # A partial table (since=) must never be cached as the season.
+            box_scores_df = concat_batches(self.iter_player_box_scores(season, since))
+            if box_scores_df is None:
+                box_scores_df = parse_player_box_scores('', season)
+            return box_scores_df
+
+        raw_box_scores = self.fetch_text('players/boxscores', season,
+                                         lambda: self._player_box_scores_text(season))
+        return parse_player_box_scores(raw_box_scores, season)
+
+    def iter_player_box_scores(self, season: str, since=None):
+        """
+        Yields the season's box scores one parsed page at a time. A cached
+        season is yielded as a single batch without starting a browser.
+        """
+
+        if since is None and self.cache is not None:
+            raw_box_scores = self.cache.get(self.table_url('players/boxscores'), season)
+            if raw_box_scores is not None:
+                yield parse_player_box_scores(raw_box_scores, season)
+                return
+
+        with self.pool.driver() as browser:
+            pages = iter_player_box_score_pages(browser, SEASONS.boxscore_xpath(season), since=since,
+                                                url=self.site_url + PLAYER_BOX_SCORES_PATH)
+            for batch in iter_player_box_score_batches(pages, season):
+                yield batch
+
+    def player_season_stats(self, season: str):
+        raw_season_stats = self.fetch_text('players/traditional', season,
+                                           lambda: self._player_season_stats_text(season))
+        return parse_player_season_stats(raw_season_stats, season)
+
+    def _team_box_scores_text(self, season: str):
+        url = self.site_url + TEAM_BOX_SCORES_PATH
+        if self.page_workers > 1:
+            return '\n'.join(get_team_box_scores_pages(
+                self.pool, SEASONS.boxscore_xpath(season), self.page_workers, url=url))
+        with self.pool.driver() as browser:
+            return get_all_team_box_scores(browser, SEASONS.boxscore_xpath(season), url=url)
+
+    def _team_season_stats_text(self, season: str):
+        with self.pool.driver() as browser:
+            return get_team_season_stats(browser, SEASONS.season_xpath(season),
+                                         url=self.site_url + TEAM_SEASON_STATS_PATH)
+
+    def team_box_scores(self, season: str):
+        # Every page is read as text in one session, then parsed in one pass.
+        raw_box_scores = self.fetch_text('teams/boxscores', season,
+                                         lambda: self._team_box_scores_text(season))
+        return parse_team_box_scores(raw_box_scores, season)
+
+    def team_season_stats(self, season: str):
+        raw_season_stats = self.fetch_text('teams/traditional', season,
+                                           lambda: self._team_season_stats_text(season))
+        return parse_team_season_stats(raw_season_stats, season)
+
+    def close(self):
+        self.pool.close()
+
+
+class HttpBackend:
+    """
+    Fetch backend that requests the JSON endpoints behind the stats.nba.com
+    tables directly over a pooled HTTP session, no browser needed.
+
+    Args:
+        base_url: root of the stats API. Point it at a local server serving
+                  recorded responses to run without the live site.
+        timeout: seconds to wait for each response.
+        pool_size: connections kept alive in the session pool.
+        retries: retries on connection errors and 5xx/429 responses. 429
+                 and 503 are retried through the request scheduler, which
+                 slows down the host (see scheduler.py).
+        cache: ResponseCache for the raw JSON responses.
+    """
+
+    def __init__(self, base_url: str = STATS_BASE_URL, timeout: float = 30,
+                 pool_size: int = 4, retries: int = 3, cache=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.timeout = timeout
+        self.retries = retries
+        self.cache = cache
+
+        # 429/503 (with or without Retry-After) are left to the scheduler.
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 504),
+                      respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update(STATS_HEADERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_result_set(self, endpoint: str, params: dict, season: str = ''):
+        """
+        Requests an endpoint and returns its first result set.
+
+        Args:
+            endpoint: endpoint name such as 'leaguegamelog'
+            params: query string parameters
+            season: season being requested, e.g. '2018-2019' (cache key)
+        Returns:
+            dict with 'headers' and 'rowSet'
+        """
+
+        url = self.base_url + endpoint
+
+        def request():
+            for attempt in range(self.retries + 1):
+                with SCHEDULER.slot(url) as slot, METRICS.stage('request', endpoint=endpoint):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                    slot.status = response.status_code
+                    slot.retry_after = retry_after(response.headers)
+                if response.status_code not in THROTTLE_STATUSES:
+                    break
+            response.raise_for_status()
+            METRICS.increment('responses', endpoint=endpoint)
+            return response.text
+
+        if self.cache is None:
+            payload = json.loads(request())
+        else:
+            payload = json.loads(self.cache.fetch(url, season, request, params=params))
+
+        if 'resultSets' in payload:
+            return payload['resultSets'][0]
+        return payload['resultSet']
+
+    def table(self, kind: str, season: str, since=None):
+        """
+        Requests one table of STATS_ENDPOINTS for a season.
+        """
+
+        endpoint, params = stats_request(kind, season, since)
+        _, _, fields, schema, table = STATS_ENDPOINTS[kind]
+
+        result_set = self.get_result_set(endpoint, params, season)
+        df = result_set_to_dataframe(result_set, fields, schema, season)
+        METRICS.increment('rows', len(df), table=table)
+        return df
+
+    def player_box_scores(self, season: str, since=None):
+        print("[+] GETTING PLAYER BOX SCORES FROM STATS API")
+        return self.table('player_box_scores', season, since)
+
+    def iter_player_box_scores(self, season: str, since=None):
+        """
+        The game log endpoint returns the season in one response, so it is
+        yielded as a single batch.
+        """
+
+        yield self.player_box_scores(season, since)
+
+    def player_season_stats(self, season: str):
+        print("[+] GETTING PLAYER SEASON STATS FROM STATS API")
+        return self.table('player_season_stats', season)
+
+    def team_box_scores(self, season: str):
+        print("[+] GETTING TEAM BOX SCORES FROM STATS API")
+        return self.table('team_box_scores', season)
+
+    def team_season_stats(self, season: str):
+        print("[+] GETTING TEAM SEASON STATS FROM STATS API")
+        return self.table('team_season_stats', season)
+
+    def close(self):
+        self.session.close()
+
+
+BACKENDS = {
+    'selenium': SeleniumBackend,
+    'http': HttpBackend,
+}
@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas
+
+from table_schema import PLAYER_BOX_SCORE_HEADER
+from player_data_collection import parse_player_box_scores, parse_player_box_score_page, \
+                                   parse_player_season_stats
+from team_data_collection import parse_team_box_scores, parse_team_season_stats
+from driver_profiles import PROFILES
+from replay import ALL_PAGES, Recording, ReplayServer
+from scheduler import SCHEDULER
+
+TEAMS = ['ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GSW',
+         'HOU', 'IND', 'LAC', 'LAL', 'MEM', 'MIA', 'MIL', 'MIN', 'NOP', 'NYK',
+         'OKC', 'ORL', 'PHI', 'PHX', 'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS']
+ROWS_PER_PAGE = 50
+
+"""Header lines of the tables the synthetic recordings hold besides player box scores"""
+TEAM_BOX_SCORE_HEADER = "TEAM MATCH UP GAME DATE W/L MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST STL BLK TOV PF +/-"
+PLAYER_SEASON_STATS_HEADER = "# PLAYER TEAM AGE GP W L MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST TOV STL BLK PF FP DD2 TD3 +/-"
+TEAM_SEASON_STATS_HEADER = "# TEAM GP W L WIN% MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST TOV STL BLK BLKA PF PFD +/-"
+
+"""Recorded table -> parser of one of its pages"""
+PAGE_PARSERS = {
+    'players/boxscores': parse_player_box_score_page,
+    'players/traditional': parse_player_season_stats,
+    'teams/boxscores': parse_team_box_scores,
+    'teams/traditional': parse_team_season_stats,
+}
+
+"""Result set name of each stats endpoint"""
+RESULT_SET_NAMES = {
+    'leaguegamelog': 'LeagueGameLog',
+    'leaguedashplayerstats': 'LeagueDashPlayerStats',
+    'leaguedashteamstats': 'LeagueDashTeamStats',
+}
+
+"""Collector paths benchmark_collectors() can run"""
+COLLECTOR_PATHS = ['parse', 'http', 'selenium']
+
+"""Requests per second high enough for the scheduler never to wait"""
+UNLIMITED_RATE = 1e6
+
+"""Dependencies that must load on first use only, never at import time"""
+HEAVY_MODULES = ['selenium.webdriver', 'pandas', 'numpy', 'requests', 'aiohttp', 'pyarrow']
+
+"""Module -> import time budget in seconds, checked by benchmark_imports()"""
+IMPORT_BUDGETS = {
+    'data_collector': 0.15,
+    'async_collector': 0.15,
+    'backends': 0.1,
+    'player_data_collection': 0.1,
+    'team_data_collection': 0.1,
+    'response_cache': 0.05,
+    'storage': 0.05,
+    'aggregates': 0.05,
+    'dimensions': 0.05,
+    'changes': 0.05,
+}
+
+IMPORT_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {0}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def synthetic_player_box_score_pages(rows: int, seed: int = 0):
+    """
+    Builds player box score pages shaped like iter_player_box_score_pages()
+    output: name/stat line pairs, each page starting with the header.
+
+    Args:
+        rows: number of box score rows
+        seed: random seed, so runs are comparable
+    Returns:
+        List of page texts.
+    """
+
+    rng = random.Random(seed)
+    pages = list()
+
+    for start in range(0, rows, ROWS_PER_PAGE):
+        lines = [PLAYER_BOX_SCORE_HEADER]
+        for row in range(start, min(start + ROWS_PER_PAGE, rows)):
+            team, opp = rng.sample(TEAMS, 2)
+            fga, fgm = rng.randint(5, 25), rng.randint(0, 5)
+            lines.append("Player {0}".format(row % 500))
+            lines.append(' '.join(str(value) for value in [
+                team, team, rng.choice(['@', 'vs.']), opp,
+                '{0:02d}/{1:02d}/2019'.format(rng.randint(1, 12), rng.randint(1, 28)),
+                rng.choice('WL'), rng.randint(0, 48), rng.randint(0, 50), fgm, fga,
+                round(100.0 * fgm / fga, 1), rng.randint(0, 5), rng.randint(0, 10), 33.3,
+                rng.randint(0, 10), rng.randint(0, 12), 75.0, rng.randint(0, 5),
+                rng.randint(0, 10), rng.randint(0, 15), rng.randint(0, 12),
+                rng.randint(0, 4), rng.randint(0, 4), rng.randint(0, 6),
+                rng.randint(0, 6), rng.randint(-30, 30)]))
+        pages.append('\n'.join(lines))
+
+    return pages
+
+
+def synthetic_player_box_scores(rows: int, seed: int = 0):
+    """
+    Builds player box score table text shaped like get_player_box_scores()
+    output: the synthetic pages glued together without a newline.
+    """
+
+    return ''.join(synthetic_player_box_score_pages(rows, seed))
+
+
+def synthetic_team_box_score_pages(rows: int, seed: int = 0):
+    """
+    Builds team box score pages shaped like get_team_box_scores_pages()
+    output: a header and one stat line per row on each page.
+    """
+
+    rng = random.Random(seed)
+    pages = list()
+
+    for start in range(0, rows, ROWS_PER_PAGE):
+        lines = [TEAM_BOX_SCORE_HEADER]
+        for _ in range(start, min(start + ROWS_PER_PAGE, rows)):
+            team, opp = rng.sample(TEAMS, 2)
+            fga, fgm = rng.randint(75, 100), rng.randint(30, 50)
+            lines.append(' '.join(str(value) for value in [
+                team, team, rng.choice(['@', 'vs.']), opp,
+                '{0:02d}/{1:02d}/2019'.format(rng.randint(1, 12), rng.randint(1, 28)),
+                rng.choice('WL'), rng.choice([240, 265]), rng.randint(80, 140), fgm, fga,
+                round(100.0 * fgm / fga, 1), rng.randint(5, 20), rng.randint(20, 45), 35.1,
+                rng.randint(10, 30), rng.randint(15, 35), 77.8, rng.randint(5, 15),
+                rng.randint(30, 40), rng.randint(35, 55), rng.randint(15, 35),
+                rng.randint(3, 12), rng.randint(2, 9), rng.randint(8, 20),
+                rng.randint(15, 25), rng.randint(-30, 30)]))
+        pages.append('\n'.join(lines))
+
+    return pages
+
+
+def synthetic_player_season_stats(players: int, seed: int = 0):
+    """
+    Builds a player season stats table shaped like get_player_season_stats()
+    output: a header, then rank, name and stat lines.
+    """
+
+    rng = random.Random(seed)
+    lines = [PLAYER_SEASON_STATS_HEADER]
+
+    for player in range(players):
+        gp = rng.randint(1, 82)
+        w = rng.randint(0, gp)
+        lines.append(str(player + 1))
+        lines.append("Player {0}".format(player))
+        lines.append(' '.join(str(value) for value in
+                              [rng.choice(TEAMS), rng.randint(19, 40), gp, w, gp - w] +
+                              [round(rng.uniform(0, 40), 1) for _ in range(20)] +
+                              [rng.randint(0, 40), rng.randint(0, 10),
+                               round(rng.uniform(-10, 10), 1)]))
+
+    return '\n'.join(lines)
+
+
+def synthetic_team_season_stats(seed: int = 0):
+    """
+    Builds a team season stats table shaped like get_team_season_stats()
+    output: a header, then rank, name and stat lines for every team.
+    """
+
+    rng = random.Random(seed)
+    lines = [TEAM_SEASON_STATS_HEADER]
+
+    for rank, team in enumerate(TEAMS, 1):
+        w = rng.randint(15, 67)
+        lines.append(str(rank))
+        lines.append("Team {0}".format(team))
+        lines.append(' '.join(str(value) for value in
+                              [82, w, 82 - w, round(w / 82, 3)] +
+                              [round(rng.uniform(0, 120), 1) for _ in range(22)]))
+
+    return '\n'.join(lines)
+
+
+def synthetic_result_set(kind: str, df):
+    """
+    Builds the JSON the HTTP backend receives for the rows of a parsed
+    DataFrame of a collector kind, undoing the transforms of its fields
+    (see backends.STATS_ENDPOINTS).
+    """
+
+    from backends import STATS_ENDPOINTS, _percent, _text, _opponent, _game_date
+
+    endpoint, _, fields, _, _ = STATS_ENDPOINTS[kind]
+
+    columns = dict()
+    for column, header, transform in fields:
+        values = df[column]
+        if transform is _opponent:
+            columns[header] = df['team'].astype(str) + ' @ ' + values.astype(str)
+        elif transform is _game_date:
+            columns[header] = values.dt.strftime('%Y-%m-%dT00:00:00')
+        elif transform is _text:
+            columns[header] = values.astype(str)
+        elif transform is _percent:
+            columns[header] = values.astype('float64') / 100
+        else:
+            columns[header] = values.astype('float64')
+
+    headers = [header for _, header, _ in fields]
+    rows = pandas.DataFrame(columns)[headers].values.tolist()
+    return json.dumps({'resultSets': [{'name': RESULT_SET_NAMES[endpoint], 'headers': headers,
+                                       'rowSet': rows}]})
+
+
+def synthetic_recording(seasons, rows: int, seed: int = 0):
+    """
+    Builds a Recording of the four tables of some seasons (see
+    backends.STATS_ENDPOINTS), as table pages and as API responses holding
+    the same rows. Sized like a season: a team box score row per ten player
+    box score rows, a player per fifty.
+
+    Args:
+        seasons: seasons such as ['2018-2019']
+        rows: player box score rows per season
+        seed: random seed of the first season
+    Returns:
+        The Recording.
+    """
+
+    from backends import stats_request
+
+    recording = Recording()
+    for offset, season in enumerate(seasons):
+        seed_of_season = seed + offset
+        player_pages = synthetic_player_box_score_pages(rows, seed_of_season)
+        team_pages = synthetic_team_box_score_pages(max(rows // 10, 1), seed_of_season)
+        player_season_stats = synthetic_player_season_stats(max(rows // 50, 1), seed_of_season)
+        team_season_stats = synthetic_team_season_stats(seed_of_season)
+
+        for page, text in enumerate(player_pages, 1):
+            recording.add_page('players/boxscores', season, page, text)
+        for page, text in enumerate(team_pages, 1):
+            recording.add_page('teams/boxscores', season, page, text)
+        recording.add_page('players/traditional', season, ALL_PAGES, player_season_stats)
+        recording.add_page('teams/traditional', season, ALL_PAGES, team_season_stats)
+
+        dfs = {
+            'player_box_scores': parse_player_box_scores(''.join(player_pages), season),
+            'player_season_stats': parse_player_season_stats(player_season_stats, season),
+            'team_box_scores': parse_team_box_scores('\n'.join(team_pages), season),
+            'team_season_stats': parse_team_season_stats(team_season_stats, season),
+        }
+        for kind, df in dfs.items():
+            recording.add_response(*stats_request(kind, season), synthetic_result_set(kind, df))
+
+    return recording
+
+
+def legacy_parse_player_box_scores(raw_table, season: str):
+    """
+    The per-column list comprehension parser the typed parser replaced,
+    kept as the benchmark baseline.
+    """
+
+    is_name = True
+    player_names = list()
+    player_stats = list()
+
+    for line in raw_table.split('\n'):
+        if line == PLAYER_BOX_SCORE_HEADER:
+            continue
+        elif is_name:
+            player_names.append(line.replace("'", ""))
+            is_name = False
+        else:
+            line = line.replace(PLAYER_BOX_SCORE_HEADER, "")
+            player_stats.append([i for i in line.split(' ')])
+            is_name = True
+
+    columns = ['team', None, None, 'matchup', 'gamedate', 'wl', 'min', 'pts', 'fgm',
+               'fga', 'fgp', '3pm', '3pa', '3pp', 'ftm', 'fta', 'ftp', 'oreb',
+               'dreb', 'reb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pm']
+    data = {'player': player_names}
+    for index, column in enumerate(columns):
+        if column is not None:
+            data[column] = [i[index] for i in player_stats]
+
+    df = pandas.DataFrame(data)
+    df.insert(len(df.columns), 'season', season)
+
+    return df
+
+
+def time_call(function, *args, repeat: int = 3):
+    """
+    Returns (best seconds over repeat runs, result of the last run).
+    """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_parsers(rows: int, repeat: int = 3):
+    """
+    Times the legacy and typed player box score parsers on the same text
+    and compares the memory of the DataFrames they build.
+
+    Returns:
+        Dict of measurements.
+    """
+
+    raw_table = synthetic_player_box_scores(rows)
+
+    legacy_seconds, legacy_df = time_call(legacy_parse_player_box_scores, raw_table,
+                                          '2018-2019', repeat=repeat)
+    typed_seconds, typed_df = time_call(parse_player_box_scores, raw_table,
+                                        '2018-2019', repeat=repeat)
+
+    legacy_bytes = int(legacy_df.memory_usage(deep=True).sum())
+    typed_bytes = int(typed_df.memory_usage(deep=True).sum())
+
+    return {
+        'rows': rows,
+        'legacy_parse_seconds': legacy_seconds,
+        'typed_parse_seconds': typed_seconds,
+        'parse_speedup': legacy_seconds / typed_seconds,
+        'legacy_bytes': legacy_bytes,
+        'typed_bytes': typed_bytes,
+        'memory_reduction': legacy_bytes / typed_bytes,
+    }
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of this process so far.
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # KiB on Linux
+
+
+def path_results(path: str, pages: int, rows: int, seconds: float, parse_seconds: float):
+    return {
+        'path': path,
+        'pages': pages,
+        'rows': rows,
+        'seconds': seconds,
+        'fetch_seconds': seconds - parse_seconds,
+        'parse_seconds': parse_seconds,
+        'pages_per_second': pages / seconds if seconds else None,
+        'rows_per_second': rows / seconds if seconds else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def benchmark_parse_path(recording: Recording, seasons):
+    """
+    Parses the recorded pages of every table page by page, without
+    fetching.
+    """
+
+    pages = rows = 0
+    parse_seconds = 0.0
+
+    for season in seasons:
+        for table, parse in PAGE_PARSERS.items():
+            for page in range(1, recording.page_count(table, season) + 1):
+                text = recording.page(table, season, page)
+                start = time.perf_counter()
+                rows += len(parse(text, season))
+                parse_seconds += time.perf_counter() - start
+                pages += 1
+
+    return path_results('parse', pages, rows, parse_seconds, parse_seconds)
+
+
+def benchmark_http_path(recording: Recording, seasons, latency: float = 0.0):
+    """
+    Requests the recorded responses of every table from a replay server
+    through HttpBackend and converts them like HttpBackend.table() does.
+    """
+
+    from backends import HttpBackend, STATS_ENDPOINTS, stats_request, result_set_to_dataframe
+
+    pages = rows = 0
+    parse_seconds = 0.0
+
+    with ReplayServer(recording, latency) as server:
+        backend = HttpBackend(base_url=server.stats_url, retries=0)
+        start = time.perf_counter()
+        for season in seasons:
+            for kind, (_, _, fields, schema, _) in STATS_ENDPOINTS.items():
+                endpoint, params = stats_request(kind, season)
+                result_set = backend.get_result_set(endpoint, params, season)
+
+                parse_start = time.perf_counter()
+                rows += len(result_set_to_dataframe(result_set, fields, schema, season))
+                parse_seconds += time.perf_counter() - parse_start
+                pages += 1
+        seconds = time.perf_counter() - start
+        backend.close()
+
+    return path_results('http', pages, rows, seconds, parse_seconds)
+
+
+def benchmark_selenium_path(recording: Recording, seasons, latency: float = 0.0):
+    """
+    Drives Chrome through the recorded pages of every table served by a
+    replay server, parsing each page as it renders. Needs Chrome and
+    chromedriver.
+    """
+
+    from driver_pool import DriverPool
+    from my_constants import PLAYER_BOX_SCORES_PATH, PLAYER_SEASON_STATS_PATH, \
+                             TEAM_BOX_SCORES_PATH, TEAM_SEASON_STATS_PATH
+    from player_data_collection import iter_player_box_score_pages, get_player_season_stats
+    from team_data_collection import get_team_box_scores_pages, get_team_season_stats
+    from seasons import SEASONS
+
+    pages = rows = 0
+    parse_seconds = 0.0
+
+    def parse(parser, text, season):
+        nonlocal pages, rows, parse_seconds
+        parse_start = time.perf_counter()
+        rows += len(parser(text, season))
+        parse_seconds += time.perf_counter() - parse_start
+        pages += 1
+
+    with ReplayServer(recording, latency) as server, DriverPool() as pool:
+        start = time.perf_counter()
+        for season in seasons:
+            boxscore_xpath, season_xpath = SEASONS.boxscore_xpath(season), \
+                                           SEASONS.season_xpath(season)
+            with pool.driver() as browser:
+                for text in iter_player_box_score_pages(
+                        browser, boxscore_xpath, url=server.url + PLAYER_BOX_SCORES_PATH):
+                    parse(parse_player_box_score_page, text, season)
+            for text in get_team_box_scores_pages(pool, boxscore_xpath, workers=1,
+                                                  url=server.url + TEAM_BOX_SCORES_PATH):
+                parse(parse_team_box_scores, text, season)
+            with pool.driver() as browser:
+                parse(parse_player_season_stats, get_player_season_stats(
+                    browser, season_xpath, url=server.url + PLAYER_SEASON_STATS_PATH), season)
+            with pool.driver() as browser:
+                parse(parse_team_season_stats, get_team_season_stats(
+                    browser, season_xpath, url=server.url + TEAM_SEASON_STATS_PATH), season)
+        seconds = time.perf_counter() - start
+
+    return path_results('selenium', pages, rows, seconds, parse_seconds)
+
+
+"""Collector path -> benchmark function"""
+PATH_BENCHMARKS = {
+    'parse': benchmark_parse_path,
+    'http': benchmark_http_path,
+    'selenium': benchmark_selenium_path,
+}
+
+
+def run_path(path: str, recording_path: str, seasons, latency: float):
+    # The replay server is local: time the collectors, not the rate limit.
+    SCHEDULER.configure(rate=UNLIMITED_RATE, burst=UNLIMITED_RATE, max_rate=UNLIMITED_RATE)
+    recording = Recording(recording_path)
+    if path == 'parse':
+        return benchmark_parse_path(recording, seasons)
+    return PATH_BENCHMARKS[path](recording, seasons, latency)
+
+
+def benchmark_collectors(recording_path: str, seasons, paths=COLLECTOR_PATHS,
+                         latency: float = 0.0):
+    """
+    Runs each collector path over a recording, each in a fresh process so
+    its peak RSS is its own. A path that cannot run (e.g. no Chrome) is
+    reported with its error instead.
+
+    Args:
+        recording_path: Recording file (see replay.py)
+        seasons: recorded seasons to collect
+        paths: names from COLLECTOR_PATHS
+        latency: seconds the replay server waits before each response
+    Returns:
+        List of per path result dicts.
+    """
+
+    results = list()
+    for path in paths:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            try:
+                results.append(executor.submit(run_path, path, recording_path,
+                                               seasons, latency).result())
+            except Exception as error:
+                results.append({'path': path, 'error': repr(error)})
+
+    return results
+
+
+def benchmark_throttle(max_rate: float = 5.0, requests: int = 100, workers: int = 4,
+                       rows: int = 1000, increase: float = 0.25):
+    """
+    Sends game log requests from several threads through HttpBackend and
+    the request scheduler to a replay server answering 429 above max_rate
+    per second, to see how close the scheduler settles to that rate.
+
+    Args:
+        max_rate: requests per second the server accepts
+        requests: requests to complete
+        workers: threads sending them
+        rows: box score rows of the recorded game log
+        increase: scheduler rate increase per good response
+    Returns:
+        Dict of throughput, 429s received and the scheduler's final rate.
+    """
+
+    from backends import HttpBackend, GAME_LOG_PARAMS, api_season
+
+    season = '2018-2019'
+    params = dict(GAME_LOG_PARAMS, Season=api_season(season))
+    SCHEDULER.configure(rate=1.0, max_rate=max(4 * max_rate, 1.0), increase=increase)
+
+    with ReplayServer(synthetic_recording([season], rows), max_rate=max_rate) as server:
+        backend = HttpBackend(base_url=server.stats_url, retries=20)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: backend.get_result_set('leaguegamelog', params),
+                              range(requests)))
+        seconds = time.perf_counter() - start
+        backend.close()
+
+    return {
+        'max_rate': max_rate,
+        'requests': requests,
+        'seconds': round(seconds, 3),
+        'throughput': round(requests / seconds, 3),
+        'throttled': server.throttled,
+        'final_rate': round(SCHEDULER.rate_of(server.stats_url), 3),
+    }
+
+
+def process_tree_rss(pid: int):
+    """
+    Returns the resident memory in bytes of a process and its descendants
+    summed (shared pages count once per process), read from /proc. None
+    where there is no /proc.
+    """
+
+    if not os.path.isdir('/proc'):
+        return None
+
+    children = dict()
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{0}/stat'.format(entry)) as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue # Exited while listing.
+        children.setdefault(parent, list()).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open('/proc/{0}/statm'.format(current)) as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+        pending.extend(children.get(current, ()))
+
+    return total
+
+
+def benchmark_profiles(profiles=tuple(PROFILES), loads: int = 10, rows: int = 1000,
+                       latency: float = 0.02, assets: int = 20):
+    """
+    Loads the player box score page of a replay server, weighted like the
+    live page (see replay.asset_markup()), in Chrome drivers of each
+    driver profile, selecting the season like the collectors do. Each
+    profile's driver is started twice, so a warm profile shows on the
+    first load after the restart. Needs Chrome and chromedriver; a profile
+    that cannot run (e.g. a headed Chrome without a display) is reported
+    with its error instead.
+
+    Args:
+        profiles: names from driver_profiles.PROFILES
+        loads: page loads per driver
+        rows: box score rows of the recorded season
+        latency: seconds the replay server waits before each response,
+                 assets included
+        assets: images per page
+    Returns:
+        List of per profile result dicts: driver start, first load after
+        the start and after the restart, mean of the later loads, and the
+        RSS of the Chrome processes after the loads.
+    """
+
+    from my_constants import PLAYER_BOX_SCORES_PATH
+    from page_wait import select_season
+    from seasons import SEASONS
+    from utilities import initialize_chrome_driver
+
+    season = '2018-2019'
+    SCHEDULER.configure(rate=UNLIMITED_RATE, burst=UNLIMITED_RATE, max_rate=UNLIMITED_RATE)
+
+    def load(browser, url):
+        start = time.perf_counter()
+        browser.get(url)
+        select_season(browser, SEASONS.boxscore_xpath(season))
+        return time.perf_counter() - start
+
+    results = list()
+    with ReplayServer(synthetic_recording([season], rows), latency, assets=assets) as server:
+        url = server.url + PLAYER_BOX_SCORES_PATH
+        for profile in profiles:
+            try:
+                first_loads = list()
+                for _ in range(2):
+                    start = time.perf_counter()
+                    browser = initialize_chrome_driver(profile)
+                    driver_start = time.perf_counter() - start
+                    try:
+                        first_loads.append(load(browser, url))
+                        later = [load(browser, url) for _ in range(loads - 1)]
+                        rss = process_tree_rss(browser.service.process.pid)
+                    finally:
+                        browser.quit()
+            except Exception as error:
+                results.append({'profile': profile, 'error': repr(error)})
+                continue
+
+            results.append({
+                'profile': profile,
+                'driver_start_seconds': round(driver_start, 3),
+                'first_load_seconds': round(first_loads[0], 3),
+                'restarted_first_load_seconds': round(first_loads[1], 3),
+                'page_seconds': round(sum(later) / max(len(later), 1), 3),
+                'rss_bytes': rss,
+            })
+
+    return results
+
+
+def benchmark_imports(budgets=IMPORT_BUDGETS, repeat: int = 3):
+    """
+    Imports each module in a fresh interpreter and checks it against its
+    budget: the best of repeat import times must fit, and none of
+    HEAVY_MODULES may have been loaded.
+
+    Returns:
+        List of per module result dicts, with 'ok' False for a module
+        over its budget.
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = list()
+    for module, budget in budgets.items():
+        runs = [json.loads(subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module)],
+                                          cwd=directory, capture_output=True, text=True,
+                                          check=True).stdout)
+                for _ in range(repeat)]
+        seconds = min(run['seconds'] for run in runs)
+        loaded = [name for name in HEAVY_MODULES if name in runs[0]['modules']]
+        results.append({'module': module, 'seconds': round(seconds, 4), 'budget': budget,
+                        'loaded': loaded, 'ok': seconds <= budget and not loaded})
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the table parsers and collectors.")
+    parser.add_argument('--suite', choices=['parsers', 'collectors', 'imports', 'throttle',
+                                            'profiles'],
+                        default='parsers')
+    parser.add_argument('--rows', type=int, default=250000,
+                        help="box score rows (a season is about 26,000)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--recording', default=None,
+                        help="recording to replay (default: synthetic, --rows per season)")
+    parser.add_argument('--seasons', nargs='+', default=['2018-2019'])
+    parser.add_argument('--paths', nargs='+', choices=COLLECTOR_PATHS, default=COLLECTOR_PATHS)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds the replay server waits before each response")
+    parser.add_argument('--max-rate', type=float, default=5.0,
+                        help="requests per second the throttle suite's server accepts")
+    parser.add_argument('--requests', type=int, default=100,
+                        help="requests sent by the throttle suite")
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES),
+                        help="driver profiles compared by the profiles suite")
+    parser.add_argument('--loads', type=int, default=10,
+                        help="page loads per driver in the profiles suite")
+    parser.add_argument('--assets', type=int, default=20,
+                        help="images per page in the profiles suite")
+    parser.add_argument('--json', default=None,
+                        help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.suite == 'parsers':
+        results = benchmark_parsers(args.rows, args.repeat)
+    elif args.suite == 'imports':
+        results = benchmark_imports(repeat=args.repeat)
+    elif args.suite == 'throttle':
+        results = benchmark_throttle(args.max_rate, args.requests)
+    elif args.suite == 'profiles':
+        results = benchmark_profiles(args.profiles, args.loads, latency=args.latency,
+                                     assets=args.assets)
+    else:
+        recording_path = args.recording
+        if recording_path is None:
+            handle, recording_path = tempfile.mkstemp(suffix='.jsonl')
+            os.close(handle)
+            synthetic_recording(args.seasons, args.rows).save(recording_path)
+        try:
+            results = {
+                'recording': args.recording or 'synthetic',
+                'seasons': args.seasons,
+                'latency': args.latency,
+                'results': benchmark_collectors(recording_path, args.seasons,
+                                                args.paths, args.latency),
+            }
+        finally:
+            if args.recording is None:
+                os.remove(recording_path)
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print("[+] WROTE RESULTS TO {0}".format(args.json))
+    elif args.suite in ('parsers', 'throttle'):
+        for key, value in results.items():
+            print('{0:>22}: {1}'.format(key, value))
+    elif args.suite in ('imports', 'profiles'):
+        for result in results:
+            print(json.dumps(result))
+    else:
+        for result in results['results']:
+            print(json.dumps(result))
+
+    if args.suite == 'imports' and not all(result['ok'] for result in results):
+        sys.exit("[-] ERROR: IMPORT BUDGET EXCEEDED")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import os
+from collections import namedtuple
+
+from db_loader import TABLES
+
+DEFAULT_SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+
+"""Result of diff(): DataFrames of the new rows, the rows whose values
+changed, the rows gone from the new version and the repeated rows dropped
+from it, plus the number of rows left as they were"""
+ChangeSet = namedtuple('ChangeSet', ['inserted', 'updated', 'deleted', 'duplicates', 'unchanged'])
+
+
+def natural_key(kind: str):
+    """
+    Returns the natural key columns of a collector kind (see db_loader.TABLES).
+    """
+
+    return TABLES[kind][2]
+
+
+def row_hashes(df, key_columns):
+    """
+    Returns one uint64 hash per row of its non-key values, independent of
+    column order and of how categoricals are coded.
+    """
+
+    import pandas
+
+    values = df.drop(columns=key_columns)
+    values = values[sorted(values.columns)]
+    return pandas.util.hash_pandas_object(values, index=False).values
+
+
+def key_index(df, key_columns):
+    import pandas
+
+    return pandas.MultiIndex.from_frame(df[key_columns].astype(object))
+
+
+def dedupe(df, key_columns):
+    """
+    Splits off rows repeating an earlier row's natural key, e.g. a row
+    shown on two pages when games are added while paginating.
+
+    Returns:
+        (DataFrame without repeats, DataFrame of the dropped repeats)
+    """
+
+    repeated = df.duplicated(subset=key_columns, keep='first').values
+    return df[~repeated].reset_index(drop=True), df[repeated].reset_index(drop=True)
+
+
+def diff(old, new, key_columns, complete: bool = True):
+    """
+    Compares a new version of a table with the previous one by natural key
+    and row hash.
+
+    Args:
+        old: previous DataFrame (None when there is none)
+        new: freshly collected DataFrame
+        key_columns: natural key, e.g. natural_key('player_box_scores')
+        complete: whether new is the whole table. Rows missing from a
+                  partial collection (e.g. since a watermark) are not
+                  deletions.
+    Returns:
+        ChangeSet
+    """
+
+    new, duplicates = dedupe(new, key_columns)
+    if old is None or old.empty:
+        return ChangeSet(new, new.iloc[:0], new.iloc[:0], duplicates, 0)
+
+    old = dedupe(old, key_columns)[0]
+    old_keys, new_keys = key_index(old, key_columns), key_index(new, key_columns)
+
+    # Position of each new row's key in the old table (-1: not there).
+    positions = old_keys.get_indexer(new_keys)
+    inserted = positions == -1
+    updated = ~inserted & (row_hashes(old, key_columns)[positions]
+                           != row_hashes(new, key_columns))
+
+    if complete:
+        deleted = old[~old_keys.isin(new_keys)].reset_index(drop=True)
+    else:
+        deleted = old.iloc[:0]
+
+    changes = ChangeSet(new[inserted].reset_index(drop=True), new[updated].reset_index(drop=True),
+                        deleted, duplicates, 0)
+    return changes._replace(unchanged=len(new) - len(changes.inserted) - len(changes.updated))
+
+
+class SnapshotStore:
+    """
+    The last collected version of each table and season (pickled to keep
+    dtypes), so a re-collection can be reduced to what changed since.
+
+        changes = snapshots.update('player_season_stats', season, df)
+        load_changes(connection, 'player_season_stats', changes)
+
+    Args:
+        directory: folder holding one pickle per kind and season
+    """
+
+    def __init__(self, directory: str = DEFAULT_SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, kind: str, season: str):
+        return os.path.join(self.directory, '{0}_{1}.pkl'.format(kind, season))
+
+    def load(self, kind: str, season: str):
+        """
+        Returns the snapshot of a table and season, or None.
+        """
+
+        import pandas
+
+        path = self.path(kind, season)
+        if not os.path.exists(path):
+            return None
+        return pandas.read_pickle(path)
+
+    def save(self, kind: str, season: str, df):
+        path = self.path(kind, season)
+        df.to_pickle(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def update(self, kind: str, season: str, df, complete: bool = True):
+        """
+        Diffs a freshly collected table against its snapshot and makes it
+        the new snapshot.
+
+        Args:
+            kind: key of db_loader.TABLES, e.g. 'player_box_scores'
+            season: season of the table
+            df: DataFrame from the matching collect method
+            complete: False when df holds only part of the table (the
+                      snapshot then keeps the rows df does not have)
+        Returns:
+            ChangeSet against the previous snapshot.
+        """
+
+        import pandas
+
+        key_columns = natural_key(kind)
+        old = self.load(kind, season)
+        changes = diff(old, df, key_columns, complete)
+
+        if complete or old is None:
+            snapshot = dedupe(df, key_columns)[0]
+        else:
+            changed = pandas.concat([changes.inserted, changes.updated], ignore_index=True)
+            kept = old[~key_index(old, key_columns).isin(key_index(changed, key_columns))]
+            snapshot = pandas.concat([changed, kept], ignore_index=True)
+            # Concatenating categoricals with different categories gives objects.
+            for column in df.select_dtypes('category').columns:
+                snapshot[column] = snapshot[column].astype('category')
+
+        if len(changes.inserted) or len(changes.updated) or len(changes.deleted) or old is None:
+            self.save(kind, season, snapshot)
+
+        print("[+] {0} {1}: {2} INSERTED, {3} UPDATED, {4} DELETED, {5} UNCHANGED, "
+              "{6} DUPLICATES DROPPED".format(kind.upper(), season, len(changes.inserted),
+                                              len(changes.updated), len(changes.deleted),
+                                              changes.unchanged, len(changes.duplicates)))
+        return changes
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import time
+import shutil
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from metrics import METRICS
+from page_wait import select_season, DEFAULT_TIMEOUT
+from pagination import count_pages, read_pages
+from scheduler import navigate
+from table_schema import concat_batches
+
+DEFAULT_JOURNAL_DIR = os.path.join('data', 'checkpoints')
+
+"""Retries of a failed page, waiting backoff * 2 ** attempt seconds before each"""
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+
+PAGE_FILE = re.compile(r'^page-(\d+)\.pkl$')
+
+
+class PageJournal:
+    """
+    On-disk journal of the parsed pages of one table and season, one
+    pickle per page (pickle keeps the parser's dtypes).
+
+    A run that dies midway leaves its finished pages behind, so the next
+    run only fetches the pages still missing. clear() it once the table
+    has been stored.
+
+    Args:
+        table: table name, e.g. 'players/boxscores'
+        season: season of the table
+        directory: root folder of all journals
+    """
+
+    def __init__(self, table: str, season: str, directory: str = DEFAULT_JOURNAL_DIR):
+        self.table = table
+        self.season = season
+        self.directory = os.path.join(directory, table, season)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def page_path(self, page: int):
+        return os.path.join(self.directory, 'page-{0:05d}.pkl'.format(page))
+
+    def pages(self):
+        """
+        Returns the journaled page numbers in increasing order.
+        """
+
+        matches = (PAGE_FILE.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def missing(self, page_count: int):
+        """
+        Returns the pages of 1..page_count not journaled yet.
+        """
+
+        done = set(self.pages())
+        return [page for page in range(1, page_count + 1) if page not in done]
+
+    def save(self, page: int, df):
+        path = self.page_path(page)
+        df.to_pickle(path + '.tmp')
+        os.replace(path + '.tmp', path) # Never leave half a page behind.
+
+    def load(self, page: int):
+        import pandas
+
+        return pandas.read_pickle(self.page_path(page))
+
+    def dataframe(self, key_columns=None):
+        """
+        Concatenates the journaled pages in page order.
+
+        Rows shift to later pages when games are added between runs, so a
+        resumed table can hold a row twice. Pass its natural key to keep
+        the first copy only.
+        """
+
+        df = concat_batches(self.load(page) for page in self.pages())
+        if df is not None and key_columns:
+            df = df.drop_duplicates(subset=key_columns).reset_index(drop=True)
+        return df
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def iter_resumable_pages(browser, url: str, season_xpath: str, journal: PageJournal,
+                         timeout: float = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                         backoff: float = DEFAULT_BACKOFF):
+    """
+    Yields the pages of a paginated table that are missing from a journal,
+    jumping straight to the first one through the page dropdown.
+
+    A page that fails to load is retried with exponential backoff after
+    reloading the table; a reload that fails counts as a failed attempt
+    too. The end of the table comes from the dropdown's
+    page count, so a failed click is never mistaken for the last page.
+
+    Args:
+        browser: Chrome driver browser instance
+        url: stats.nba.com page with the table
+        season_xpath: XPATH of NBA season
+        journal: PageJournal of the table and season
+        timeout: seconds to wait for each page to render
+        retries: attempts per page after the first one
+        backoff: seconds before the first retry, doubled after each one
+    Returns:
+        Generator of (page number, page text).
+    Raises:
+        TimeoutException or WebDriverException when a page still fails
+        after every retry. The pages yielded before it stay valid.
+    """
+
+    def open_table():
+        navigate(browser, url)
+        return select_season(browser, season_xpath, timeout)
+
+    shown_text = open_table()
+    page_count = count_pages(browser)
+    missing = journal.missing(page_count)
+
+    if not missing:
+        print("[+] ALL {0} PAGES OF {1} {2} ALREADY JOURNALED".format(
+            page_count, journal.table, journal.season))
+        return
+    if len(missing) < page_count:
+        print("[+] RESUMING {0} {1} AT PAGE {2} ({3} OF {4} PAGES LEFT)".format(
+            journal.table, journal.season, missing[0], len(missing), page_count))
+
+    for page in missing:
+        reload = False
+        for attempt in range(retries + 1):
+            try:
+                if reload:
+                    # Reload, which shows page 1 again, and jump back to the page.
+                    shown_text = open_table()
+                page_text = read_pages(browser, [page], shown_text, timeout)[page]
+                break
+            except (TimeoutException, WebDriverException) as error:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                print("[-] PAGE {0} FAILED ({1}), RETRYING IN {2:.1f}s".format(
+                    page, type(error).__name__, delay))
+                METRICS.increment('page_retries', table=journal.table)
+                time.sleep(delay)
+                reload = True
+
+        shown_text = page_text
+        yield page, page_text
+
+
+def collect_resumable(browser, url: str, season_xpath: str, journal: PageJournal, parse,
+                      key_columns=None, timeout: float = DEFAULT_TIMEOUT,
+                      retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+    """
+    Collects a paginated table page by page, journaling each parsed page
+    before moving on, and returns the whole table.
+
+    Args:
+        browser, url, season_xpath, journal, timeout, retries, backoff:
+            see iter_resumable_pages()
+        parse: callable turning one page text and its page number into
+               a DataFrame
+        key_columns: natural key used to drop rows seen on two pages
+    Returns:
+        DataFrame of every journaled page (None for an empty table).
+    """
+
+    for page, page_text in iter_resumable_pages(browser, url, season_xpath, journal,
+                                                timeout, retries, backoff):
+        journal.save(page, parse(page_text, page))
+
+    return journal.dataframe(key_columns)
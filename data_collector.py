@@ -1,8 +1,53 @@
-import sys
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
-from utilities import initialize_chrome_driver
-from player_data_collection import get_player_box_scores, parse_player_box_scores, \
-                                   get_player_season_stats, parse_player_season_stats
+from aggregates import BoxScoreAggregates
+from backends import BACKENDS
+from dimensions import DimensionIndex
+from incremental import BoxScoreStore
+from jobs import JobResult
+from metrics import METRICS
+from quarantine import QUARANTINE
+from scheduler import lane, season_lane
+from storage import StatsStore
+from my_constants import BUTTON_PAGE_SELECT, BUTTON_ALL_PLAYERS
+from seasons import SEASONS
+
+
+def run_collection_job(backend_factory, backend_options: dict, season: str, kind: str):
+    """
+    Collects one table for one season with its own backend. Runs inside a
+    worker thread or process, so failures are returned instead of raised.
+
+    Args:
+        backend_factory: callable (e.g. a backend class) creating the backend
+        backend_options: keyword arguments for backend_factory
+        season: season to collect
+        kind: key of NbaDataCollector.KINDS
+    Returns:
+        JobResult with the DataFrame, or the error if the job failed.
+    """
+
+    # A worker process has its own METRICS, sent back with the result.
+    in_worker_process = multiprocessing.parent_process() is not None
+    if in_worker_process:
+        METRICS.reset()
+
+    def job_metrics():
+        return METRICS.snapshot() if in_worker_process else None
+
+    start = time.monotonic()
+    collector = NbaDataCollector(backend_factory(**backend_options))
+
+    try:
+        data = getattr(collector, NbaDataCollector.KINDS[kind])(season)
+        return JobResult(season, kind, data, None, time.monotonic() - start, job_metrics())
+    except Exception as error:
+        return JobResult(season, kind, None, repr(error), time.monotonic() - start,
+                         job_metrics())
+    finally:
+        collector.close()
 
 
 class NbaDataCollector:
@@ -11,51 +56,102 @@ class NbaDataCollector:
     """
 
     """XPATHs for buttons"""
-    BUTTON_PAGE_SELECT = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option[{0}]'
-    BUTTON_ALL_PLAYERS = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option[1]'
+    BUTTON_PAGE_SELECT = BUTTON_PAGE_SELECT
+    BUTTON_ALL_PLAYERS = BUTTON_ALL_PLAYERS
     LAST_PAGE = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/text()[2]'
 
-    """XPATHs For Generic Tables""" 
-    SEASON_XPATHS = {
-        "2018-2019": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[1]',
-        "2017-2018": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[2]',
-        "2016-2017": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[3]',
-        "2015-2016": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[4]',
-        "2014-2015": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[5]',
-        "2013-2014": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[6]',
-        "2012-2013": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[7]',
-        "2011-2012": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[8]',
-        "2010-2011": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[9]',
-    }
+    """Seasons the collector accepts (seasons.py, set by $NBA_SEASONS_CONFIG)"""
+    SEASONS = SEASONS
+
+    """XPATHs For Generic Tables"""
+    SEASON_XPATHS = SEASONS.season_xpaths
 
     """XPATHs for Box Scores"""
-    BOXSCORE_XPATHS = {
-        "2018-2019": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[2]',
-        "2017-2018": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[3]',
-        "2016-2017": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[4]',
-        "2015-2016": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[5]',
-        "2014-2015": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[6]',
-        "2013-2014": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[7]',
-        "2012-2013": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[8]',
-        "2011-2012": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[9]',
-        "2010-2011": '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[10]',
-    }
+    BOXSCORE_XPATHS = SEASONS.boxscore_xpaths
 
-    SEASON_STRINGS = {
-        "2018-2019": "2018-2019",
-        "2017-2018": "2017-2018",
-        "2016-2017": "2016-2017",
-        "2015-2016": "2015-2016",
-        "2014-2015": "2014-2015",
-        "2013-2014": "2013-2014",
-        "2012-2013": "2012-2013",
-        "2011-2012": "2011-2012",
-        "2010-2011": "2010-2011",
+    """Season -> season string of every accepted season"""
+    SEASON_STRINGS = {season: season for season in SEASONS}
+
+    """Tables collect_many() can fan out, mapped to their collect method"""
+    KINDS = {
+        "player_box_scores": "collect_player_box_scores",
+        "player_season_stats": "collect_player_season_stats",
+        "team_box_scores": "collect_team_box_scores",
+        "team_season_stats": "collect_team_season_stats",
     }
 
 
-    def __init__(self):
-        pass
+    def __init__(self, backend='selenium', store: StatsStore = None, metrics_log: str = None,
+                 dimensions: DimensionIndex = None, quarantine_log: str = None,
+                 **backend_options):
+        """
+        Args:
+            backend: fetch backend used by the collect methods. Either a name
+                     from backends.BACKENDS ('selenium' or 'http') or a
+                     backend instance such as HttpBackend(base_url=...).
+            store: StatsStore used by store_season() and load() (default:
+                     Parquet files under ./data/warehouse)
+            metrics_log: JSON lines file getting one event per timed stage
+                     (see metrics.py). Aggregates are kept either way and
+                     written by export_metrics().
+            dimensions: DimensionIndex used by collect_facts() (default:
+                     ./data/dimensions, opened on first use)
+            quarantine_log: JSON lines file getting the malformed rows the
+                     parsers leave out (see quarantine.py). The most
+                     recent ones are kept in memory in self.quarantine
+                     either way.
+            backend_options: keyword arguments for a backend given by name,
+                     e.g. pool_size=2 for the selenium driver pool.
+        """
+
+        self.metrics = METRICS
+        if metrics_log is not None:
+            self.metrics.log_to(metrics_log)
+
+        self.quarantine = QUARANTINE
+        if quarantine_log is not None:
+            self.quarantine.log_to(quarantine_log)
+
+        self.backend_factory = None
+        self.backend_options = backend_options
+
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError("Invalid backend option entered.")
+            self.backend_factory = BACKENDS[backend]
+            backend = self.backend_factory(**backend_options)
+
+        self.backend = backend
+        self.store = store or StatsStore()
+        self.dimensions = dimensions
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        """
+        Releases the backend's browsers or HTTP connections.
+        """
+
+        self.backend.close()
+
+
+    def export_metrics(self, path: str):
+        """
+        Writes the stage timings, page and row counts collected so far, as
+        a Prometheus textfile when path ends in .prom and as JSON otherwise.
+        """
+
+        if path.endswith('.prom'):
+            self.metrics.write_prometheus(path)
+        else:
+            self.metrics.write_json(path)
     
 
     def collect_player_box_scores(self, season: str):
@@ -70,15 +166,88 @@ class NbaDataCollector:
 
         #Check valid season passed as parameter
         if(season not in self.SEASON_STRINGS):
-            sys.exit("Invalid season option entered.")
+            raise ValueError("Invalid season option entered.")
 
-        browser = initialize_chrome_driver()
-        raw_box_scores = get_player_box_scores(browser, self.BOXSCORE_XPATHS[season])
-        box_scores_df = parse_player_box_scores(raw_box_scores, season)
+        with self.metrics.stage('collect', kind='player_box_scores'), lane(season_lane(season)):
+            box_scores_df = self.backend.player_box_scores(season)
 
         return box_scores_df
 
 
+    def iter_player_box_scores(self, season: str):
+        """
+        Collects the box scores of a season as a stream of DataFrame
+        batches, one per table page, so memory stays bounded by a page.
+
+        Args:
+            season: String containing season of box scores to collect.
+        Returns:
+            Generator of typed box score DataFrames.
+        """
+
+        #Check valid season passed as parameter
+        if(season not in self.SEASON_STRINGS):
+            raise ValueError("Invalid season option entered.")
+
+        return self.backend.iter_player_box_scores(season)
+
+
+    def stream_player_box_scores(self, season: str, sink):
+        """
+        Collects the box scores of a season and hands each page's batch to
+        sink as soon as it is parsed, e.g. to append it to storage.
+
+        Args:
+            season: String containing season of box scores to collect.
+            sink: callable taking one DataFrame batch
+        Returns:
+            Number of rows written.
+        """
+
+        rows = 0
+        with lane(season_lane(season)):
+            for batch in self.iter_player_box_scores(season):
+                sink(batch)
+                rows += len(batch)
+
+        return rows
+
+
+    def update_player_box_scores(self, season: str, store: BoxScoreStore = None,
+                                 aggregates: BoxScoreAggregates = None):
+        """
+        Collects only the box scores played since the last run of a season
+        and merges them into the stored dataset.
+
+        The first run for a season collects the whole table. Later runs
+        stop paginating at the stored watermark date, so a daily refresh
+        reads one or two pages.
+
+        Args:
+            season: String containing season of box scores to collect.
+            store: BoxScoreStore holding the datasets (default: ./data)
+            aggregates: BoxScoreAggregates to update with the new games
+        Returns:
+            Dataframe of the full stored box score table for the season
+        """
+
+        #Check valid season passed as parameter
+        if(season not in self.SEASON_STRINGS):
+            raise ValueError("Invalid season option entered.")
+
+        store = store or BoxScoreStore()
+        since = store.watermark(season)
+
+        with self.metrics.stage('collect', kind='player_box_scores_update'), lane('incremental'):
+            new_rows = self.backend.player_box_scores(season, since=since)
+            if since is not None:
+                new_rows = new_rows[new_rows['gamedate'].dt.date >= since]
+            if aggregates is not None:
+                aggregates.append(new_rows)
+
+            return store.merge(season, new_rows)
+
+
     def collect_player_season_stats(self, season: str):
         """
         Scraps stats.nba.com to collect all box scores of a particular season.
@@ -91,15 +260,187 @@ class NbaDataCollector:
 
         #Check valid season passed as parameter
         if(season not in self.SEASON_STRINGS):
-            sys.exit("Invalid season option entered.")
+            raise ValueError("Invalid season option entered.")
 
-        browser = initialize_chrome_driver()
-        raw_season_stats = get_player_season_stats(browser, self.SEASON_XPATHS[season])
-        season_scores_df = parse_player_season_stats(raw_season_stats, season)
+        with self.metrics.stage('collect', kind='player_season_stats'), lane(season_lane(season)):
+            season_scores_df = self.backend.player_season_stats(season)
 
         return season_scores_df
 
 
+    def collect_team_box_scores(self, season: str):
+        """
+        Scraps stats.nba.com to collect all team box scores of a particular
+        season. The season is selected once and every page is read in the
+        same browser session.
+
+        Args:
+            season: String containing season of box scores to collect.
+        Returns:
+            Dataframe of team box score table
+        """
+
+        #Check valid season passed as parameter
+        if(season not in self.SEASON_STRINGS):
+            raise ValueError("Invalid season option entered.")
+
+        with self.metrics.stage('collect', kind='team_box_scores'), lane(season_lane(season)):
+            team_box_scores_df = self.backend.team_box_scores(season)
+
+        return team_box_scores_df
+
+
+    def collect_team_season_stats(self, season: str):
+        """
+        Scraps stats.nba.com to collect the season stats of all teams.
+
+        Args:
+            season: String containing season of stats to collect.
+        Returns:
+            Dataframe of team season stats table
+        """
+
+        #Check valid season passed as parameter
+        if(season not in self.SEASON_STRINGS):
+            raise ValueError("Invalid season option entered.")
+
+        with self.metrics.stage('collect', kind='team_season_stats'), lane(season_lane(season)):
+            team_season_stats_df = self.backend.team_season_stats(season)
+
+        return team_season_stats_df
+
+
+
+    def iter_many(self, seasons, kinds=None, workers: int = 4, processes: bool = False,
+                  backend=None, **backend_options):
+        """
+        Collects several seasons and tables in parallel, yielding each
+        result as soon as its job finishes.
+
+        Every job gets its own backend so jobs share no browser or session.
+        A failed job yields a JobResult with error set and does not stop
+        the others.
+
+        Args:
+            seasons: seasons to collect, e.g. SEASON_STRINGS
+            kinds: keys of KINDS to collect (default: all of them)
+            workers: number of jobs run at once
+            processes: use a process pool instead of a thread pool
+            backend: backend name or factory for the jobs. Defaults to the
+                     one this collector was created with.
+            backend_options: keyword arguments for the backend factory
+        Returns:
+            Generator of JobResult in completion order.
+        """
+
+        if backend is None:
+            if self.backend_factory is None:
+                raise ValueError("Pass backend= to collect_many when the collector "
+                                 "was created from a backend instance.")
+            backend, backend_options = self.backend_factory, self.backend_options
+        elif isinstance(backend, str):
+            backend = BACKENDS[backend]
+
+        if kinds is None:
+            kinds = list(self.KINDS)
+
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+        with executor_class(max_workers=workers) as executor:
+            futures = [executor.submit(run_collection_job, backend, backend_options,
+                                       season, kind)
+                       for season in seasons for kind in kinds]
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result.metrics is not None:
+                        METRICS.merge(result.metrics)
+                    if result.error:
+                        print("[-] FAILED {0} {1}: {2}".format(result.kind, result.season,
+                                                               result.error))
+                    else:
+                        print("[+] COLLECTED {0} {1}".format(result.kind, result.season))
+                    yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+    def collect_many(self, seasons, kinds=None, workers: int = 4, processes: bool = False,
+                     backend=None, **backend_options):
+        """
+        Collects several seasons and tables in parallel. See iter_many().
+
+        Returns:
+            Dict of JobResult keyed by (season, kind).
+        """
+
+        return {(result.season, result.kind): result
+                for result in self.iter_many(seasons, kinds, workers, processes,
+                                             backend, **backend_options)}
+
+
+
+    def store_season(self, kind: str, season: str):
+        """
+        Collects one table for a season and saves it as a typed, season
+        partitioned dataset in the collector's store. Player box scores
+        are streamed to storage page by page.
+
+        Args:
+            kind: key of KINDS, e.g. 'player_box_scores'
+            season: String containing season to collect.
+        Returns:
+            Number of rows stored.
+        """
+
+        if kind == 'player_box_scores':
+            with self.metrics.stage('collect', kind='player_box_scores_stream'), \
+                    self.store.writer(kind, season) as writer:
+                return self.stream_player_box_scores(season, writer)
+
+        df = getattr(self, self.KINDS[kind])(season)
+        self.store.write(kind, df, season)
+        return len(df)
+
+
+    def collect_facts(self, kind: str, season: str):
+        """
+        Collects one table for a season as a fact table keyed by integer
+        player_id/team_id/game_id, and saves any new ids to the
+        collector's DimensionIndex (see dimensions.py).
+
+        Args:
+            kind: key of KINDS, e.g. 'player_box_scores'
+            season: String containing season to collect.
+        Returns:
+            Fact table DataFrame. self.dimensions.table('players') etc.
+            hold the names behind the ids.
+        """
+
+        if self.dimensions is None:
+            self.dimensions = DimensionIndex()
+
+        df = getattr(self, self.KINDS[kind])(season)
+        facts = self.dimensions.normalize(kind, df)
+        self.dimensions.save()
+
+        return facts
+
+
+    def load(self, kind: str, columns=None, filters=None, seasons=None):
+        """
+        Reads a stored dataset with column projection and filter pushdown,
+        e.g. load('player_box_scores', ['player', 'pts', 'ast'],
+        [('team', '==', 'LAL')]).
+
+        Returns:
+            DataFrame of the matching rows (see StatsStore.read()).
+        """
+
+        return self.store.read(kind, columns, filters, seasons)
+
+
 if __name__ == "__main__":
     print("The variable 'dc' is an available NbaDataCollector object")
     dc = NbaDataCollector()
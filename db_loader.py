@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import sys
+
+from metrics import METRICS
+from table_schema import PLAYER_BOX_SCORE_SCHEMA, PLAYER_SEASON_STATS_SCHEMA, \
+                         TEAM_BOX_SCORE_SCHEMA, TEAM_SEASON_STATS_SCHEMA
+
+"""Table name, column schema and natural key of each collector DataFrame"""
+TABLES = {
+    'player_box_scores': ('player_box_scores', PLAYER_BOX_SCORE_SCHEMA,
+                          ['player', 'team', 'gamedate']),
+    'player_season_stats': ('player_season_stats', PLAYER_SEASON_STATS_SCHEMA,
+                            ['player', 'team', 'season']),
+    'team_box_scores': ('team_box_scores', TEAM_BOX_SCORE_SCHEMA,
+                        ['team', 'date']),
+    'team_season_stats': ('team_season_stats', TEAM_SEASON_STATS_SCHEMA,
+                          ['team', 'season']),
+}
+
+SQL_TYPES = {
+    'string': 'TEXT',
+    'category': 'TEXT',
+    'date': 'DATE',
+    'int16': 'INTEGER',
+    'int32': 'INTEGER',
+    'float32': 'REAL',
+}
+
+PLACEHOLDERS = {
+    'qmark': '?',
+    'format': '%s',
+    'pyformat': '%s',
+}
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def quote(identifier: str):
+    """Column names like 3pm need quoting in SQL."""
+    return '"{0}"'.format(identifier)
+
+
+def placeholder_for(connection):
+    """
+    Returns the parameter placeholder of the DB-API driver behind a
+    connection ('?' for sqlite3, '%s' for psycopg2 and MySQL drivers).
+    """
+
+    module = sys.modules.get(type(connection).__module__.split('.')[0])
+    return PLACEHOLDERS.get(getattr(module, 'paramstyle', 'qmark'), '?')
+
+
+def table_columns(kind: str):
+    """
+    Returns (table name, [(column, sql type)], key columns) for a kind.
+    """
+
+    table, schema, keys = TABLES[kind]
+    columns = [(column, SQL_TYPES[dtype]) for column, _, dtype in schema]
+    columns.append(('season', 'TEXT'))
+    return table, columns, keys
+
+
+def create_table(connection, kind: str):
+    """
+    Creates the table for a collector DataFrame if it does not exist, with
+    its natural key as primary key.
+
+    Args:
+        connection: DB-API connection (sqlite3, psycopg2, ...)
+        kind: key of TABLES
+    """
+
+    table, columns, keys = table_columns(kind)
+    definition = ', '.join('{0} {1}'.format(quote(column), sql_type)
+                           for column, sql_type in columns)
+    key = ', '.join(quote(column) for column in keys)
+
+    cursor = connection.cursor()
+    cursor.execute('CREATE TABLE IF NOT EXISTS {0} ({1}, PRIMARY KEY ({2}))'.format(
+        table, definition, key))
+    connection.commit()
+
+
+def upsert_statement(kind: str, placeholder: str = '?'):
+    """
+    Builds the parameterized INSERT ... ON CONFLICT DO UPDATE statement for
+    a kind (SQLite 3.24+ and PostgreSQL syntax).
+    """
+
+    table, columns, keys = table_columns(kind)
+    names = [column for column, _ in columns]
+
+    updates = ', '.join('{0} = excluded.{0}'.format(quote(column))
+                        for column in names if column not in keys)
+
+    return 'INSERT INTO {0} ({1}) VALUES ({2}) ON CONFLICT ({3}) DO UPDATE SET {4}'.format(
+        table,
+        ', '.join(quote(column) for column in names),
+        ', '.join([placeholder] * len(names)),
+        ', '.join(quote(column) for column in keys),
+        updates)
+
+
+def delete_statement(kind: str, placeholder: str = '?'):
+    """
+    Builds the parameterized DELETE of one row by natural key for a kind.
+    """
+
+    table, _, keys = table_columns(kind)
+    return 'DELETE FROM {0} WHERE {1}'.format(
+        table, ' AND '.join('{0} = {1}'.format(quote(column), placeholder) for column in keys))
+
+
+def dataframe_rows(df, kind: str):
+    """
+    Converts a collector DataFrame to DB-API parameter tuples column by
+    column: dates to YYYY-MM-DD strings, numpy numbers to Python numbers
+    and missing values to None.
+
+    Returns:
+        List of tuples in table column order.
+    """
+
+    import numpy
+
+    _, columns, _ = table_columns(kind)
+    converted = list()
+
+    for column, sql_type in columns:
+        values = df[column]
+        if sql_type == 'DATE':
+            values = values.dt.strftime('%Y-%m-%d')
+        elif sql_type == 'REAL':
+            # float32 -> float64 adds noise digits; stats have at most three.
+            values = numpy.round(values.astype('float64'), 3)
+
+        values = values.astype(object)
+        converted.append(values.where(values.notna(), None).tolist())
+
+    return list(zip(*converted))
+
+
+def load_dataframe(connection, kind: str, df, batch_size: int = DEFAULT_BATCH_SIZE,
+                   create: bool = True):
+    """
+    Writes a collector DataFrame to its table in batched, parameterized
+    executemany calls inside one transaction, updating rows whose natural
+    key already exists.
+
+    Names are sent as parameters, so apostrophes (O'Neal) are stored as is.
+
+    Args:
+        connection: DB-API connection (sqlite3, psycopg2, ...)
+        kind: key of TABLES, e.g. 'player_box_scores'
+        df: DataFrame from the matching parse function or backend
+        batch_size: rows sent per executemany call
+        create: create the table first if it does not exist
+    Returns:
+        Number of rows written.
+    """
+
+    if create:
+        create_table(connection, kind)
+
+    statement = upsert_statement(kind, placeholder_for(connection))
+    rows = dataframe_rows(df, kind)
+
+    print("[+] LOADING {0} ROWS INTO {1}".format(len(rows), TABLES[kind][0]))
+
+    cursor = connection.cursor()
+    try:
+        with METRICS.stage('load', table=TABLES[kind][0]):
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(statement, rows[start:start + batch_size])
+            connection.commit()
+    except:
+        connection.rollback()
+        raise
+
+    METRICS.increment('rows_loaded', len(rows), table=TABLES[kind][0])
+    return len(rows)
+
+
+def load_changes(connection, kind: str, changes, batch_size: int = DEFAULT_BATCH_SIZE,
+                 create: bool = True):
+    """
+    Applies a ChangeSet (see changes.py) to a kind's table in one
+    transaction: inserted and updated rows are upserted and deleted rows
+    are removed, so a re-collection only writes what changed.
+
+    Args:
+        connection: DB-API connection (sqlite3, psycopg2, ...)
+        kind: key of TABLES
+        changes: ChangeSet from SnapshotStore.update() or changes.diff()
+        batch_size: rows sent per executemany call
+        create: create the table first if it does not exist
+    Returns:
+        Number of rows written or deleted.
+    """
+
+    import pandas
+
+    if create:
+        create_table(connection, kind)
+
+    placeholder = placeholder_for(connection)
+    _, columns, keys = table_columns(kind)
+    key_positions = [[column for column, _ in columns].index(key) for key in keys]
+
+    upserts = dataframe_rows(pandas.concat([changes.inserted, changes.updated],
+                                           ignore_index=True), kind)
+    deletes = [tuple(row[position] for position in key_positions)
+               for row in dataframe_rows(changes.deleted, kind)]
+
+    print("[+] APPLYING {0} UPSERTS AND {1} DELETES TO {2}".format(
+        len(upserts), len(deletes), TABLES[kind][0]))
+
+    cursor = connection.cursor()
+    try:
+        with METRICS.stage('load', table=TABLES[kind][0]):
+            for statement, rows in ((upsert_statement(kind, placeholder), upserts),
+                                    (delete_statement(kind, placeholder), deletes)):
+                for start in range(0, len(rows), batch_size):
+                    cursor.executemany(statement, rows[start:start + batch_size])
+            connection.commit()
+    except:
+        connection.rollback()
+        raise
+
+    METRICS.increment('rows_loaded', len(upserts), table=TABLES[kind][0])
+    METRICS.increment('rows_deleted', len(deletes), table=TABLES[kind][0])
+    return len(upserts) + len(deletes)
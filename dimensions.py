@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+
+DEFAULT_DIMENSIONS_DIR = os.path.join('data', 'dimensions')
+
+"""Team names in the season stats tables -> abbreviation in the box scores"""
+TEAM_ABBREVIATIONS = {
+    'Atlanta Hawks': 'ATL', 'Boston Celtics': 'BOS', 'Brooklyn Nets': 'BKN',
+    'New Jersey Nets': 'NJN', 'Charlotte Hornets': 'CHA', 'Charlotte Bobcats': 'CHA',
+    'Chicago Bulls': 'CHI', 'Cleveland Cavaliers': 'CLE', 'Dallas Mavericks': 'DAL',
+    'Denver Nuggets': 'DEN', 'Detroit Pistons': 'DET', 'Golden State Warriors': 'GSW',
+    'Houston Rockets': 'HOU', 'Indiana Pacers': 'IND', 'LA Clippers': 'LAC',
+    'Los Angeles Clippers': 'LAC', 'Los Angeles Lakers': 'LAL', 'Memphis Grizzlies': 'MEM',
+    'Miami Heat': 'MIA', 'Milwaukee Bucks': 'MIL', 'Minnesota Timberwolves': 'MIN',
+    'New Orleans Pelicans': 'NOP', 'New Orleans Hornets': 'NOH', 'New York Knicks': 'NYK',
+    'Oklahoma City Thunder': 'OKC', 'Orlando Magic': 'ORL', 'Philadelphia 76ers': 'PHI',
+    'Phoenix Suns': 'PHX', 'Portland Trail Blazers': 'POR', 'Sacramento Kings': 'SAC',
+    'San Antonio Spurs': 'SAS', 'Toronto Raptors': 'TOR', 'Utah Jazz': 'UTA',
+    'Washington Wizards': 'WAS',
+}
+
+"""Dimension -> (id column, key columns, id dtype)"""
+DIMENSIONS = {
+    'players': ('player_id', ['player'], 'int32'),
+    'teams': ('team_id', ['team'], 'int16'),
+    'games': ('game_id', ['gamedate', 'team_id', 'opp_team_id'], 'int32'),
+}
+
+"""Collector kind -> (player column, team column, opponent column, date column)
+of its string columns replaced by ids in the fact table (None: not in the table)"""
+FACT_COLUMNS = {
+    'player_box_scores': ('player', 'team', 'matchup', 'gamedate'),
+    'player_season_stats': ('player', 'team', None, None),
+    'team_box_scores': (None, 'team', 'opp', 'date'),
+    'team_season_stats': (None, 'team', None, None),
+}
+
+
+class DimensionIndex:
+    """
+    Persistent integer ids for players, teams and games, so collected
+    tables can be stored as compact fact tables of int keys plus one small
+    dimension table per entity instead of repeating the same strings on
+    every row.
+
+    Ids are stable: a name keeps its id across runs and seasons, so facts
+    written on different days join on integer keys.
+
+    A game is one date and pair of teams, whichever side a row is from.
+    Players are keyed by name, the only identity the tables show.
+
+    Args:
+        directory: folder holding one pickled DataFrame per dimension
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIMENSIONS_DIR):
+        import pandas
+
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.keys = dict() # dimension -> {key: id}
+
+        for dimension, (id_column, key_columns, _) in DIMENSIONS.items():
+            self.keys[dimension] = dict()
+            path = self.path(dimension)
+            if os.path.exists(path):
+                table = pandas.read_pickle(path)
+                keys = zip(*[table[column].tolist() for column in key_columns])
+                self.keys[dimension] = {key if len(key_columns) > 1 else key[0]: value
+                                        for key, value in zip(keys, table[id_column].tolist())}
+
+    def path(self, dimension: str):
+        return os.path.join(self.directory, '{0}.pkl'.format(dimension))
+
+    def ids(self, dimension: str, keys):
+        """
+        Returns the ids of a sequence of keys, assigning new ids to keys
+        seen for the first time. Work is per distinct key, not per row.
+
+        Args:
+            dimension: key of DIMENSIONS
+            keys: Series of names, or DataFrame of key columns for games
+        Returns:
+            numpy array of ids, one per key.
+        """
+
+        import numpy
+        import pandas
+
+        _, _, dtype = DIMENSIONS[dimension]
+        if isinstance(keys, pandas.DataFrame):
+            codes, uniques = pandas.MultiIndex.from_frame(keys).factorize()
+        else:
+            codes, uniques = pandas.factorize(pandas.Series(keys).astype(object))
+
+        with self._lock:
+            known = self.keys[dimension]
+            for key in uniques:
+                if key not in known:
+                    known[key] = len(known)
+            unique_ids = numpy.array([known[key] for key in uniques], dtype=dtype)
+
+        return unique_ids[codes]
+
+    def team_ids(self, teams):
+        """
+        Returns the team ids of abbreviations or full team names.
+        """
+
+        import pandas
+
+        teams = pandas.Series(teams).astype(object)
+        return self.ids('teams', teams.map(lambda team: TEAM_ABBREVIATIONS.get(team, team)))
+
+    def game_ids(self, dates, team_ids, opp_team_ids):
+        import numpy
+        import pandas
+
+        # Both sides of a game get the same key: (date, lower id, higher id).
+        team_ids, opp_team_ids = numpy.asarray(team_ids), numpy.asarray(opp_team_ids)
+        keys = pandas.DataFrame({
+            'gamedate': pandas.to_datetime(pandas.Series(dates)).values,
+            'team_id': numpy.minimum(team_ids, opp_team_ids),
+            'opp_team_id': numpy.maximum(team_ids, opp_team_ids),
+        })
+        return self.ids('games', keys)
+
+    def normalize(self, kind: str, df):
+        """
+        Turns a collector DataFrame into a fact table: player, team,
+        opponent and game date columns are replaced by player_id, team_id,
+        opp_team_id and game_id.
+
+        Args:
+            kind: key of FACT_COLUMNS, e.g. 'player_box_scores'
+            df: DataFrame from the matching collect method
+        Returns:
+            The fact table, id columns first.
+        """
+
+        player, team, opp, date = FACT_COLUMNS[kind]
+        ids = dict()
+
+        if player is not None:
+            ids['player_id'] = self.ids('players', df[player])
+        ids['team_id'] = self.team_ids(df[team])
+        if opp is not None:
+            ids['opp_team_id'] = self.team_ids(df[opp])
+        if date is not None:
+            ids['game_id'] = self.game_ids(df[date], ids['team_id'], ids['opp_team_id'])
+
+        dropped = [column for column in (player, team, opp, date) if column is not None]
+        facts = df.drop(columns=dropped)
+        for position, (column, values) in enumerate(ids.items()):
+            facts.insert(position, column, values)
+
+        return facts
+
+    def table(self, dimension: str):
+        """
+        Returns a dimension table: the id column and its key columns.
+        """
+
+        import numpy
+        import pandas
+
+        id_column, key_columns, dtype = DIMENSIONS[dimension]
+        with self._lock:
+            items = list(self.keys[dimension].items())
+
+        keys = [key if len(key_columns) > 1 else (key,) for key, _ in items]
+        table = pandas.DataFrame(keys, columns=key_columns)
+        table.insert(0, id_column, numpy.array([value for _, value in items], dtype=dtype))
+        if dimension == 'games':
+            table['gamedate'] = pandas.to_datetime(table['gamedate'])
+            table[['team_id', 'opp_team_id']] = table[['team_id', 'opp_team_id']].astype('int16')
+        return table
+
+    def label(self, facts):
+        """
+        Adds the player, team and opponent names back to a fact table
+        (as categoricals) and the game date, e.g. for display.
+        """
+
+        import pandas
+
+        df = facts.copy()
+        for dimension, column, name in (('players', 'player_id', 'player'),
+                                        ('teams', 'team_id', 'team'),
+                                        ('teams', 'opp_team_id', 'opp')):
+            if column in df.columns:
+                table = self.table(dimension).set_index(DIMENSIONS[dimension][0])
+                names = table[DIMENSIONS[dimension][1][0]]
+                df[name] = pandas.Categorical(names.reindex(df[column]).values)
+        if 'game_id' in df.columns:
+            games = self.table('games').set_index('game_id')['gamedate']
+            df['gamedate'] = games.reindex(df['game_id']).values
+        return df
+
+    def save(self):
+        """
+        Writes every dimension table to the index directory.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        for dimension in DIMENSIONS:
+            path = self.path(dimension)
+            self.table(dimension).to_pickle(path + '.tmp')
+            os.replace(path + '.tmp', path)
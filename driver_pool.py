@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import atexit
+import queue
+import functools
+import threading
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from metrics import METRICS
+from utilities import initialize_chrome_driver
+
+
+class PooledDriver:
+    """
+    Wraps a Chrome driver to count page navigations. Every other attribute
+    is passed straight through to the driver.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.navigations = 0
+
+    def get(self, url: str):
+        self.navigations += 1
+        with METRICS.stage('navigation'):
+            return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """
+    Pool of warm Chrome drivers shared across collector calls.
+
+    Drivers are created lazily up to size, health checked before each
+    lease, recycled after max_navigations page loads, and all quit on
+    close(), when leaving a with block, or at interpreter exit.
+
+    Args:
+        size: maximum number of drivers alive at once
+        max_navigations: page loads before a driver is replaced
+        factory: callable that starts a new driver (default: Chrome with
+                 profile, see initialize_chrome_driver())
+        profile: driver profile of the default factory, see driver_profiles.py
+    """
+
+    def __init__(self, size: int = 1, max_navigations: int = 100, factory=None,
+                 profile=None):
+        self.size = size
+        self.max_navigations = max_navigations
+        self.factory = factory or functools.partial(initialize_chrome_driver, profile)
+
+        self._idle = queue.LifoQueue()
+        self._all = list()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self):
+        print("[+] STARTING CHROME DRIVER")
+        with METRICS.stage('driver_start'):
+            return PooledDriver(self.factory())
+
+    def _quit(self, driver):
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _is_healthy(self, driver):
+        if driver.navigations >= self.max_navigations:
+            return False
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self, timeout: float = None):
+        """
+        Leases a driver, starting one if the pool is not full yet.
+
+        Args:
+            timeout: seconds to wait for a free driver (None waits forever)
+        Returns:
+            A PooledDriver. Hand it back with release().
+        """
+
+        if self._closed:
+            raise RuntimeError("Driver pool is closed.")
+
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_start = len(self._all) < self.size
+                    if can_start:
+                        # Reserve the slot before the slow driver start.
+                        self._all.append(None)
+
+                if can_start:
+                    try:
+                        driver = self._start()
+                    finally:
+                        with self._lock:
+                            self._all.remove(None)
+                    with self._lock:
+                        self._all.append(driver)
+                    return driver
+
+                driver = self._idle.get(timeout=timeout)
+
+            if self._is_healthy(driver):
+                return driver
+
+            print("[+] RECYCLING CHROME DRIVER")
+            self._quit(driver)
+
+    def release(self, driver):
+        """
+        Returns a leased driver to the pool.
+        """
+
+        if self._closed:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def driver(self):
+        """
+        Leases a driver for the duration of a with block.
+        """
+
+        browser = self.acquire()
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def close(self):
+        """
+        Quits every driver the pool started.
+        """
+
+        self._closed = True
+        atexit.unregister(self.close) # Lets a closed pool be garbage collected.
+
+        with self._lock:
+            drivers = [driver for driver in self._all if driver is not None]
+
+        for driver in drivers:
+            self._quit(driver)
+
+        while not self._idle.empty():
+            self._idle.get_nowait()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from collections import namedtuple
+
+"""Environment variable naming the profile of drivers started without one"""
+DRIVER_PROFILE_ENV = 'NBA_DRIVER_PROFILE'
+
+"""Folder of the persistent Chrome profiles, one subfolder per live driver"""
+DEFAULT_PROFILE_DIR = os.path.join('data', 'chrome_profiles')
+
+"""URL patterns (Network.setBlockedURLs syntax) of each blockable resource type"""
+RESOURCE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*'],
+    'stylesheet': ['*.css*'],
+}
+
+"""Ad, analytics and tracking hosts stats.nba.com pulls in, none of which the tables need"""
+THIRD_PARTY_HOSTS = [
+    '*doubleclick.net*',
+    '*googlesyndication.com*',
+    '*googletagmanager.com*',
+    '*google-analytics.com*',
+    '*amazon-adsystem.com*',
+    '*adsafeprotected.com*',
+    '*scorecardresearch.com*',
+    '*omtrdc.net*',
+    '*demdex.net*',
+    '*facebook.net*',
+    '*optimizely.com*',
+    '*onetrust.com*',
+]
+
+"""
+How a Chrome driver is launched:
+    headless            run without a window
+    blocked_resources   keys of RESOURCE_PATTERNS never downloaded
+    blocked_hosts       URL patterns never requested, e.g. THIRD_PARTY_HOSTS
+    disable_gpu         no GPU process (nothing to draw headless)
+    disable_extensions  no extensions (or component extensions) loaded
+    profile_dir         folder of persistent profiles, so the HTTP cache
+                        and cookies stay warm across runs (None: a fresh
+                        temporary profile per driver)
+    page_load_strategy  'normal' waits for every asset, 'eager' only for
+                        the DOM; page_wait.py waits for the table itself
+    window_size         (width, height) of the window
+"""
+DriverProfile = namedtuple('DriverProfile', ['headless', 'blocked_resources', 'blocked_hosts',
+                                             'disable_gpu', 'disable_extensions', 'profile_dir',
+                                             'page_load_strategy', 'window_size'],
+                           defaults=[False, (), (), False, False, None, 'normal', None])
+
+_HEADLESS = DriverProfile(headless=True, disable_gpu=True, disable_extensions=True,
+                          window_size=(1920, 1080))
+_TRIMMED = _HEADLESS._replace(blocked_resources=('image', 'font', 'media'),
+                              blocked_hosts=tuple(THIRD_PARTY_HOSTS), page_load_strategy='eager')
+
+"""Named driver profiles, from a plain Chrome to the leanest one"""
+PROFILES = {
+    'full': DriverProfile(),
+    'headless': _HEADLESS,
+    'trimmed': _TRIMMED,
+    'warm': _TRIMMED._replace(profile_dir=DEFAULT_PROFILE_DIR),
+}
+DEFAULT_PROFILE = 'full'
+
+"""Files Chrome holds in a profile folder while it uses it"""
+PROFILE_LOCKS = ('SingletonLock', 'lockfile')
+
+_claim_lock = threading.Lock()
+_claimed = set()
+
+
+def get_profile(profile=None):
+    """
+    Returns the DriverProfile for a name of PROFILES, a DriverProfile
+    (returned as is) or None (the profile named by $NBA_DRIVER_PROFILE,
+    else DEFAULT_PROFILE).
+    """
+
+    if isinstance(profile, DriverProfile):
+        return profile
+
+    name = profile or os.environ.get(DRIVER_PROFILE_ENV) or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError("Unknown driver profile {0!r}, expected one of {1}.".format(
+            name, ', '.join(PROFILES)))
+    return PROFILES[name]
+
+
+def blocked_patterns(profile: DriverProfile):
+    patterns = list(profile.blocked_hosts)
+    for resource in profile.blocked_resources:
+        patterns.extend(RESOURCE_PATTERNS[resource])
+    return patterns
+
+
+def chrome_options(profile: DriverProfile, user_data_dir: str = None):
+    """
+    Builds the ChromeOptions of a profile.
+    """
+
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    if profile.headless:
+        options.add_argument('--headless')
+    if profile.disable_gpu:
+        options.add_argument('--disable-gpu')
+    if profile.disable_extensions:
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-component-extensions-with-background-pages')
+    if profile.window_size:
+        options.add_argument('--window-size={0},{1}'.format(*profile.window_size))
+    if user_data_dir:
+        options.add_argument('--user-data-dir=' + os.path.abspath(user_data_dir))
+    if 'image' in profile.blocked_resources:
+        # Also stops images set from CSS, which URL patterns can miss.
+        options.add_experimental_option(
+            'prefs', {'profile.managed_default_content_settings.images': 2})
+
+    options.page_load_strategy = profile.page_load_strategy
+    return options
+
+
+def claim_profile_dir(directory: str):
+    """
+    Returns the first profile folder under directory that no Chrome is
+    using, so each live driver gets its own and reuses it across runs.
+    Hand it back with release_profile_dir() once Chrome has started.
+    """
+
+    with _claim_lock:
+        index = 0
+        while True:
+            path = os.path.join(directory, 'driver-{0}'.format(index))
+            in_use = any(os.path.lexists(os.path.join(path, lock)) for lock in PROFILE_LOCKS)
+            if path not in _claimed and not in_use:
+                _claimed.add(path)
+                os.makedirs(path, exist_ok=True)
+                return path
+            index += 1
+
+
+def release_profile_dir(path: str):
+    with _claim_lock:
+        _claimed.discard(path)
+
+
+def start_chrome(profile=None, executable_path: str = None):
+    """
+    Starts a Chrome driver with a driver profile.
+
+    Args:
+        profile: see get_profile()
+        executable_path: chromedriver to run (None: chromedriver on PATH)
+    Returns:
+        The driver, with the profile's URL blocking in place.
+    """
+
+    from selenium import webdriver
+
+    profile = get_profile(profile)
+    user_data_dir = claim_profile_dir(profile.profile_dir) if profile.profile_dir else None
+
+    kwargs = {'options': chrome_options(profile, user_data_dir)}
+    if executable_path:
+        kwargs['executable_path'] = executable_path
+
+    try:
+        browser = webdriver.Chrome(**kwargs)
+    finally:
+        if user_data_dir:
+            # Chrome holds its lock on the folder from here on.
+            release_profile_dir(user_data_dir)
+
+    patterns = blocked_patterns(profile)
+    if patterns:
+        browser.execute_cdp_cmd('Network.enable', {})
+        browser.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+    return browser
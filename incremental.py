@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import datetime
+
+DEFAULT_STORE_DIR = 'data'
+
+
+class BoxScoreStore:
+    """
+    Stored player box scores per season (pickled to keep dtypes), plus a watermark of the latest
+    game date already ingested for each season.
+
+    The watermark lets a daily run fetch only the newest pages of the box
+    score table and merge them into what is already stored.
+
+    Args:
+        directory: folder holding the datasets and watermarks.json
+    """
+
+    """Natural key of a player box score row"""
+    KEY_COLUMNS = ['player', 'team', 'gamedate']
+
+    def __init__(self, directory: str = DEFAULT_STORE_DIR):
+        self.directory = directory
+        self.watermark_path = os.path.join(directory, 'watermarks.json')
+        os.makedirs(directory, exist_ok=True)
+
+    def dataset_path(self, season: str):
+        return os.path.join(self.directory, 'player_box_scores_{0}.pkl'.format(season))
+
+    def _watermarks(self):
+        try:
+            with open(self.watermark_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def watermark(self, season: str):
+        """
+        Returns the latest game date stored for a season, or None.
+        """
+
+        value = self._watermarks().get(season)
+        return datetime.date.fromisoformat(value) if value else None
+
+    def set_watermark(self, season: str, date: datetime.date):
+        watermarks = self._watermarks()
+        watermarks[season] = date.isoformat()
+
+        temp_path = self.watermark_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(watermarks, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.watermark_path)
+
+    def load(self, season: str):
+        """
+        Returns the stored box scores of a season, or None.
+        """
+
+        import pandas
+
+        path = self.dataset_path(season)
+        if not os.path.exists(path):
+            return None
+        return pandas.read_pickle(path) # Pickle keeps the parser's dtypes.
+
+    def merge(self, season: str, new_rows):
+        """
+        Merges freshly collected rows into the stored season, saves it and
+        moves the watermark to the newest game.
+
+        Rows already stored are replaced by their new version, matched on
+        KEY_COLUMNS, so re-fetching the watermark's own day is harmless.
+
+        Args:
+            season: season of the rows
+            new_rows: DataFrame from parse_player_box_scores()
+        Returns:
+            The full stored DataFrame for the season.
+        """
+
+        import pandas
+
+        stored = self.load(season)
+        frames = [new_rows] if stored is None else [new_rows, stored]
+
+        merged = pandas.concat(frames, ignore_index=True)
+        merged = merged.drop_duplicates(subset=self.KEY_COLUMNS, keep='first')
+
+        # Concatenating categoricals with different categories gives objects.
+        for column in new_rows.select_dtypes('category').columns:
+            merged[column] = merged[column].astype('category')
+
+        dates = merged['gamedate']
+        order = dates.sort_values(ascending=False, kind='stable').index
+        merged = merged.loc[order].reset_index(drop=True)
+
+        added = len(merged) - (0 if stored is None else len(stored))
+        print("[+] MERGED {0} NEW BOX SCORE ROWS INTO {1}".format(added, season))
+
+        merged.to_pickle(self.dataset_path(season))
+        if len(merged):
+            self.set_watermark(season, dates.max().date())
+
+        return merged
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+
+from collections import namedtuple
+
+"""Outcome of one (season, kind) job run by NbaDataCollector.iter_many() or
+AsyncNbaDataCollector.collect_many(). metrics is the job's metrics snapshot
+when it ran in a worker process."""
+JobResult = namedtuple('JobResult', ['season', 'kind', 'data', 'error', 'seconds', 'metrics'],
+                       defaults=[None])
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+"""Upper bounds, in seconds, of the stage latency histogram buckets"""
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+"""
+Stages timed by the collectors, all recorded in the stage_seconds histogram:
+    driver_start     starting a Chrome driver (driver_pool.py)
+    navigation       browser.get() of a table page (driver_pool.py)
+    page_wait        waiting for a season or page to render (page_wait.py)
+    extraction       reading the table text from the DOM (page_wait.py)
+    request          one stats API request (backends.py)
+    parse            framing a table into a DataFrame, dataframe_build included
+    dataframe_build  building the typed columns (table_schema.py, backends.py)
+    store, load      writing to storage.py / db_loader.py
+    collect          one NbaDataCollector collect call, end to end
+
+The request scheduler (scheduler.py) adds the queue_depth and request_rate
+gauges and the queue_wait_seconds histogram.
+"""
+STAGE_HISTOGRAM = 'stage_seconds'
+
+DEFAULT_PREFIX = 'nba_collector'
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, str(value).replace('"', '\\"'))
+                          for name, value in pairs) + '}'
+
+
+def _write_atomic(path: str, text: str):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and latency histograms for
+    the collectors, exportable as JSON or as a Prometheus textfile.
+
+    Every module records into the shared METRICS registry. Jobs run in
+    worker processes send theirs back with their JobResult, where
+    NbaDataCollector.iter_many() merges them.
+
+    Args:
+        log_path: JSON lines file getting one event per finished stage
+                  (None to keep only the aggregates)
+        buckets: histogram bucket upper bounds, in seconds
+    """
+
+    def __init__(self, log_path: str = None, buckets=LATENCY_BUCKETS):
+        self.log_path = log_path
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = dict()   # (name, label key) -> value
+            self.gauges = dict()     # (name, label key) -> value
+            self.histograms = dict() # (name, label key) -> [bucket counts, count, sum]
+
+    def log_to(self, path: str):
+        """
+        Starts (or with None stops) writing stage events to a JSON lines file.
+        """
+
+        self.log_path = path
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    @contextmanager
+    def stage(self, stage: str, **labels):
+        """
+        Times a with block into the stage_seconds histogram, e.g.
+
+            with METRICS.stage('parse', table='players/boxscores'):
+                ...
+
+        A block that raises is counted in stage_errors as well.
+        """
+
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as exception:
+            error = exception
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(STAGE_HISTOGRAM, seconds, stage=stage, **labels)
+            if error is not None:
+                self.increment('stage_errors', stage=stage, **labels)
+            if self.log_path:
+                self.log_event(dict(labels, stage=stage, seconds=seconds,
+                                    error=None if error is None else repr(error)))
+
+    def log_event(self, event: dict):
+        event = dict(event, time=time.time())
+        with self._lock:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(event, default=str) + '\n')
+
+    def snapshot(self):
+        """
+        Returns the counters and histograms as a JSON-serializable dict.
+        """
+
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(key), 'value': value}
+                        for (name, key), value in sorted(self.counters.items())]
+            gauges = [{'name': name, 'labels': dict(key), 'value': value}
+                      for (name, key), value in sorted(self.gauges.items())]
+            histograms = [{'name': name, 'labels': dict(key), 'buckets': list(self.buckets),
+                           'counts': list(counts), 'count': count, 'sum': total}
+                          for (name, key), (counts, count, total)
+                          in sorted(self.histograms.items())]
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def merge(self, snapshot: dict):
+        """
+        Adds a snapshot (e.g. from a worker process) into this registry.
+        Its gauges replace the current values.
+        """
+
+        for counter in snapshot['counters']:
+            self.increment(counter['name'], counter['value'], **counter['labels'])
+        for gauge in snapshot.get('gauges', ()):
+            self.set_gauge(gauge['name'], gauge['value'], **gauge['labels'])
+
+        with self._lock:
+            for histogram in snapshot['histograms']:
+                key = (histogram['name'], _label_key(histogram['labels']))
+                current = self.histograms.get(key)
+                if current is None:
+                    current = self.histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+                current[0] = [a + b for a, b in zip(current[0], histogram['counts'])]
+                current[1] += histogram['count']
+                current[2] += histogram['sum']
+
+    def to_prometheus(self, prefix: str = DEFAULT_PREFIX):
+        """
+        Renders the registry in the Prometheus text exposition format.
+        """
+
+        snapshot = self.snapshot()
+        lines = list()
+
+        names = sorted({counter['name'] for counter in snapshot['counters']})
+        for name in names:
+            lines.append('# TYPE {0}_{1}_total counter'.format(prefix, name))
+            for counter in snapshot['counters']:
+                if counter['name'] == name:
+                    lines.append('{0}_{1}_total{2} {3}'.format(
+                        prefix, name, _format_labels(_label_key(counter['labels'])),
+                        counter['value']))
+
+        names = sorted({gauge['name'] for gauge in snapshot['gauges']})
+        for name in names:
+            lines.append('# TYPE {0}_{1} gauge'.format(prefix, name))
+            for gauge in snapshot['gauges']:
+                if gauge['name'] == name:
+                    lines.append('{0}_{1}{2} {3}'.format(
+                        prefix, name, _format_labels(_label_key(gauge['labels'])),
+                        gauge['value']))
+
+        names = sorted({histogram['name'] for histogram in snapshot['histograms']})
+        for name in names:
+            lines.append('# TYPE {0}_{1} histogram'.format(prefix, name))
+            for histogram in snapshot['histograms']:
+                if histogram['name'] != name:
+                    continue
+                key = _label_key(histogram['labels'])
+                cumulative = 0
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    cumulative += count
+                    lines.append('{0}_{1}_bucket{2} {3}'.format(
+                        prefix, name, _format_labels(key, [('le', bound)]), cumulative))
+                lines.append('{0}_{1}_bucket{2} {3}'.format(
+                    prefix, name, _format_labels(key, [('le', '+Inf')]), histogram['count']))
+                lines.append('{0}_{1}_sum{2} {3}'.format(
+                    prefix, name, _format_labels(key), histogram['sum']))
+                lines.append('{0}_{1}_count{2} {3}'.format(
+                    prefix, name, _format_labels(key), histogram['count']))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = DEFAULT_PREFIX):
+        """
+        Writes a textfile for the node_exporter textfile collector.
+        """
+
+        _write_atomic(path, self.to_prometheus(prefix))
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+
+"""Registry shared by every collector module"""
+METRICS = Metrics()
@@ -3,4 +3,37 @@
 """XPATHs for buttons"""
 BUTTON_PAGE_SELECT = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option[{0}]'
 BUTTON_ALL_PLAYERS = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option[1]'
+PAGE_OPTIONS = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option'
 
+
+"""XPATH of option n of the season dropdown. seasons.py generates the
+season and box score XPATHs of every season from it."""
+SEASON_SELECT = '/html/body/main/div[2]/div/div[2]/div/div/div[1]/div[1]/div/div/label/select/option[{0}]'
+
+"""stats.nba.com table pages (the site root can be swapped for a replay server)"""
+STATS_SITE_URL = 'https://stats.nba.com'
+PLAYER_BOX_SCORES_PATH = '/players/boxscores/'
+PLAYER_SEASON_STATS_PATH = '/players/traditional/?sort=PTS&dir=-1s'
+TEAM_BOX_SCORES_PATH = '/teams/boxscores/'
+TEAM_SEASON_STATS_PATH = '/teams/traditional/?sort=W_PCT&dir=-1'
+
+"""stats.nba.com JSON endpoints"""
+STATS_BASE_URL = 'https://stats.nba.com/stats/'
+STATS_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive',
+    'Origin': 'https://www.nba.com',
+    'Referer': 'https://www.nba.com/',
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0 Safari/537.36',
+    'x-nba-stats-origin': 'stats',
+    'x-nba-stats-token': 'true',
+}
+
+
+def __getattr__(name):
+    # SEASON_XPATHS and BOXSCORE_XPATHS are generated by the season registry.
+    if name in ('SEASON_XPATHS', 'BOXSCORE_XPATHS'):
+        from seasons import SEASONS
+        return SEASONS.season_xpaths if name == 'SEASON_XPATHS' else SEASONS.boxscore_xpaths
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import time
+
+from selenium.common.exceptions import NoSuchElementException, \
+                                       StaleElementReferenceException, \
+                                       TimeoutException
+
+from metrics import METRICS
+from scheduler import SCHEDULER, page_url
+
+"""Readiness defaults, in seconds"""
+DEFAULT_TIMEOUT = 15
+INITIAL_POLL = 0.05
+MAX_POLL = 0.5
+
+TABLE_CLASS = 'nba-stat-table__overflow'
+
+
+def wait_until(condition, timeout: float = DEFAULT_TIMEOUT,
+               initial_poll: float = INITIAL_POLL, max_poll: float = MAX_POLL):
+    """
+    Polls a condition until it returns something truthy.
+
+    The poll interval starts at initial_poll and doubles after every miss
+    up to max_poll, so fast pages return almost immediately and slow pages
+    are not hammered with DOM queries.
+
+    Args:
+        condition: callable with no arguments
+        timeout: seconds to wait before giving up
+        initial_poll: first delay between polls
+        max_poll: largest delay between polls
+    Returns:
+        The truthy value returned by condition.
+    Raises:
+        TimeoutException if the condition is not met in time.
+    """
+
+    deadline = time.monotonic() + timeout
+    poll = initial_poll
+
+    while True:
+        try:
+            value = condition()
+            if value:
+                return value
+        except (NoSuchElementException, StaleElementReferenceException):
+            pass
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutException('Condition not met after {0}s'.format(timeout))
+
+        time.sleep(min(poll, remaining))
+        poll = min(poll * 2, max_poll)
+
+
+def wait_for_element(browser, xpath: str, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Waits for an element to be present and displayed.
+
+    Args:
+        browser: Chrome driver browser instance
+        xpath: XPATH of the element
+        timeout: seconds to wait
+    Returns:
+        The WebElement.
+    """
+
+    def displayed():
+        element = browser.find_element_by_xpath(xpath)
+        return element if element.is_displayed() else None
+
+    return wait_until(displayed, timeout)
+
+
+def table_text(browser):
+    """
+    Returns the text of the stats table, or '' if it is not rendered yet.
+    """
+
+    try:
+        with METRICS.stage('extraction'):
+            return browser.find_element_by_class_name(TABLE_CLASS).text
+    except (NoSuchElementException, StaleElementReferenceException):
+        return ''
+
+
+def wait_for_table(browser, previous_text: str = '', timeout: float = DEFAULT_TIMEOUT):
+    """
+    Waits for the stats table to have rows that differ from a previous
+    render, e.g. after choosing a season or a new page.
+
+    Args:
+        browser: Chrome driver browser instance
+        previous_text: table text before the click ('' on first load)
+        timeout: seconds to wait
+    Returns:
+        The new table text.
+    """
+
+    def changed():
+        text = table_text(browser)
+        # A header line plus at least one row means the table has data.
+        if text.count('\n') >= 1 and text != previous_text:
+            return text
+        return None
+
+    with METRICS.stage('page_wait'):
+        return wait_until(changed, timeout)
+
+
+def select_season(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Chooses a season from the season dropdown once the page is ready and
+    waits for the table to show it.
+
+    If the requested season is the one already displayed, its table is
+    returned without clicking.
+
+    Args:
+        browser: Chrome driver browser instance
+        season_xpath: XPATH of the season option
+        timeout: seconds to wait for each step
+    Returns:
+        The table text for the season.
+    """
+
+    season_option = wait_for_element(browser, season_xpath, timeout)
+    default_text = wait_for_table(browser, timeout=timeout)
+    if season_option.is_selected():
+        return default_text
+
+    with SCHEDULER.slot(page_url(browser)):
+        season_option.click()
+
+        try:
+            return wait_for_table(browser, default_text, timeout)
+        except TimeoutException:
+            # A season whose table renders the same text as the default.
+            if season_option.is_selected():
+                return default_text
+            raise
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import contextvars
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from my_constants import BUTTON_PAGE_SELECT, PAGE_OPTIONS
+from metrics import METRICS
+from page_wait import select_season, wait_for_table, DEFAULT_TIMEOUT
+from scheduler import SCHEDULER, navigate, page_url
+
+
+def count_pages(browser):
+    """
+    Reads the number of table pages from the page dropdown.
+
+    The dropdown lists an 'All' option followed by one option per page.
+
+    Args:
+        browser: Chrome driver browser instance with a table loaded
+    Returns:
+        Number of pages (at least 1).
+    """
+
+    options = browser.find_elements_by_xpath(PAGE_OPTIONS)
+    return max(len(options) - 1, 1)
+
+
+def split_pages(page_count: int, chunks: int):
+    """
+    Splits pages 1..page_count into contiguous ranges, one per session.
+
+    Args:
+        page_count: number of pages in the table
+        chunks: number of ranges wanted
+    Returns:
+        List of non-empty page ranges.
+    """
+
+    size = -(-page_count // max(chunks, 1))
+    return [range(start, min(start + size, page_count + 1))
+            for start in range(1, page_count + 1, size)]
+
+
+def read_pages(browser, pages, season_text: str, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Clicks through a range of pages in a browser that already shows the
+    season's first page.
+
+    Args:
+        browser: Chrome driver browser instance
+        pages: page numbers to read, in increasing order
+        season_text: table text shown right after selecting the season
+        timeout: seconds to wait for each page to render
+    Returns:
+        Dict of page number to table text.
+    """
+
+    results = dict()
+    previous_page = season_text
+
+    for page in pages:
+        if page == 1:
+            results[page] = season_text #Shown when the season loads.
+            continue
+
+        message = '[+] GETTING TABLE PAGE {0}'.format(str(page))
+        print(message)
+
+        with SCHEDULER.slot(page_url(browser)):
+            browser.find_element_by_xpath(BUTTON_PAGE_SELECT.format(str(page + 1))).click()
+            previous_page = wait_for_table(browser, previous_page, timeout)
+        results[page] = previous_page
+
+    return results
+
+
+def fetch_page_range(pool, url: str, season_xpath: str, pages,
+                     timeout: float = DEFAULT_TIMEOUT):
+    """
+    Loads a table in a driver leased from the pool and reads a page range.
+    """
+
+    with pool.driver() as browser:
+        navigate(browser, url)
+        season_text = select_season(browser, season_xpath, timeout)
+        return read_pages(browser, pages, season_text, timeout)
+
+
+def get_table_pages(pool, url: str, season_xpath: str, workers: int = 4,
+                    timeout: float = DEFAULT_TIMEOUT):
+    """
+    Collects every page of a paginated stats table using several browser
+    sessions at once.
+
+    The first session selects the season, counts the pages and reads the
+    first range itself while the other ranges are read by drivers leased
+    from the pool in parallel.
+
+    Args:
+        pool: DriverPool to lease browsers from (size >= workers to get
+              the full speed up)
+        url: stats.nba.com page with the table
+        season_xpath: XPATH of NBA season
+        workers: number of browser sessions reading pages
+        timeout: seconds to wait for each page to render
+    Returns:
+        List of page texts in page order.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=max(workers - 1, 1))
+    futures = list()
+    try:
+        browser = pool.acquire()
+        try:
+            navigate(browser, url)
+            season_text = select_season(browser, season_xpath, timeout)
+            page_count = count_pages(browser)
+            chunks = split_pages(page_count, workers)
+
+            message = '[+] FOUND {0} PAGES, READING WITH {1} SESSIONS'.format(page_count,
+                                                                             len(chunks))
+            print(message)
+
+            # Each session runs in the caller's context to keep its scheduler lane.
+            futures = [executor.submit(contextvars.copy_context().run, fetch_page_range,
+                                       pool, url, season_xpath, chunk, timeout)
+                       for chunk in chunks[1:]]
+
+            pages = read_pages(browser, chunks[0], season_text, timeout)
+        finally:
+            # Hand the driver back before waiting so a small pool can't deadlock.
+            pool.release(browser)
+
+        for future in futures:
+            pages.update(future.result())
+    finally:
+        # On a failure, sessions not started yet are dropped and running
+        # ones finish and hand their drivers back before this returns.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+    METRICS.increment('pages', page_count, table=urlsplit(url).path.strip('/'))
+
+    return [pages[page] for page in range(1, page_count + 1)]
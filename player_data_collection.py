@@ -2,15 +2,105 @@
 
 from termcolor import colored
 
-import sys
-import time
-import pandas
+import re
+import datetime
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, \
+                                       WebDriverException
 
 from utilities import dateConversion
-from my_constants import BUTTON_ALL_PLAYERS, BUTTON_PAGE_SELECT
+from my_constants import BUTTON_ALL_PLAYERS, BUTTON_PAGE_SELECT, STATS_SITE_URL, \
+                         PLAYER_BOX_SCORES_PATH, PLAYER_SEASON_STATS_PATH
+from metrics import METRICS
+from page_wait import select_season, wait_for_table, DEFAULT_TIMEOUT
+from pagination import get_table_pages
+from scheduler import SCHEDULER, navigate
+from checkpoint import PageJournal, collect_resumable, DEFAULT_RETRIES, DEFAULT_BACKOFF
+from quarantine import QUARANTINE
+from table_schema import PLAYER_BOX_SCORE_SCHEMA, PLAYER_SEASON_STATS_SCHEMA, \
+                         PLAYER_BOX_SCORE_HEADER, frame_alternating, frame_ranked, \
+                         parse_records, stat_width
+
+PLAYER_BOX_SCORES_URL = STATS_SITE_URL + PLAYER_BOX_SCORES_PATH
+PLAYER_SEASON_STATS_URL = STATS_SITE_URL + PLAYER_SEASON_STATS_PATH
+GAME_DATE_PATTERN = re.compile(r'\b\d{2}/\d{2}/\d{4}\b')
+
+
+def oldest_game_date(page_text: str):
+    """
+    Returns the earliest MM/DD/YYYY game date on a box score page, or None.
+    """
+
+    dates = [datetime.datetime.strptime(date, '%m/%d/%Y').date()
+             for date in GAME_DATE_PATTERN.findall(page_text)]
+    return min(dates) if dates else None
 
 
-def get_player_box_scores(browser, season_xpath: str):
+def iter_player_box_score_pages(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT,
+                                since: datetime.date = None, url: str = PLAYER_BOX_SCORES_URL):
+    """
+    Yields the box score table of NBA players one page at a time, as soon
+    as each page renders.
+
+    Args:
+        browser: Chrome driver browser instance (created from 
+                        initalizeChromeDriver() in utilities.py)
+        season_xpath: XPATH of NBA season (from my_constants.py)
+        timeout: seconds to wait for each page to render (see page_wait.py)
+        since: stop after the first page with games older than this date.
+               The table is sorted newest first, so later pages are all
+               older (see incremental.py).
+        url: page with the table (see replay.py for a local stand-in)
+    Returns:
+        Generator of page texts, each starting with the table header.
+    """
+
+    #I found that the webpage becomes unresponsive when you click on the all option
+
+    navigate(browser, url)
+
+    try:
+        select_season(browser, season_xpath, timeout)
+    except (TimeoutException, WebDriverException):
+        print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        raise
+
+    # The season loads on the first page, so option 2 (page 1) does not
+    # change the table; every later page must differ from the one before.
+    previous_page = ''
+
+    for page in range(2, 1000):
+        page_selected = BUTTON_PAGE_SELECT.format(str(page))
+
+        with SCHEDULER.slot(url) as slot:
+            try:
+                browser.find_element_by_xpath(page_selected).click()
+                message = '[+] GETTING PLAYER BOX SCORES TABLE \
+                        FROM PAGE {0}'.format(str(page - 1))
+                print(message)
+            except NoSuchElementException: # No option for this page.
+                slot.counted = False
+                print("[+] REACHED END OF BOX SCORE TABLE FOR SEASON")
+                break
+
+            try:
+                previous_page = wait_for_table(browser, previous_page, timeout)
+            except (TimeoutException, WebDriverException):
+                print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+                raise
+
+        METRICS.increment('pages', table='players/boxscores')
+        yield previous_page
+
+        if since is not None:
+            oldest = oldest_game_date(previous_page)
+            if oldest is not None and oldest < since:
+                print("[+] REACHED GAMES BEFORE {0}".format(since.isoformat()))
+                break
+
+
+def get_player_box_scores(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT,
+                          since: datetime.date = None, url: str = PLAYER_BOX_SCORES_URL):
     """
     Collects the box scores of NBA players from a particular page 
         and season
@@ -19,44 +109,79 @@ def get_player_box_scores(browser, season_xpath: str):
         browser: Chrome driver browser instance (created from 
                         initalizeChromeDriver() in utilities.py)
         season_xpath: XPATH of NBA season (from my_constants.py)
+        timeout: seconds to wait for each page to render (see page_wait.py)
+        since: see iter_player_box_score_pages()
+        url: page with the table
     Returns:
         Table (long string) separate by new lines and spaces of the NBA
         players stats for a particular season from the box scores.
     """
 
-    #I found that the webpage becomes unresponsive when you click on the all option
+    return ''.join(iter_player_box_score_pages(browser, season_xpath, timeout, since, url))
 
-    raw_table = ""
 
-    browser.get('https://stats.nba.com/players/boxscores/')
-    time.sleep(3) # Load stats.nba.com.
+def get_player_box_scores_concurrently(pool, season_xpath: str, workers: int = 4,
+                                       timeout: float = DEFAULT_TIMEOUT,
+                                       url: str = PLAYER_BOX_SCORES_URL):
+    """
+    Collects the box scores of NBA players for a season, reading page
+    ranges in several browser sessions at once (see pagination.py).
+
+    Args:
+        pool: DriverPool to lease browsers from
+        season_xpath: XPATH of NBA season (from my_constants.py)
+        workers: number of browser sessions reading pages
+        timeout: seconds to wait for each page to render
+        url: page with the table
+    Returns:
+        Same table string as get_player_box_scores(), pages in order.
+    """
 
     try:
-        browser.find_element_by_xpath(season_xpath).click()
-    except:
-        sys.exit("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        pages = get_table_pages(pool, url, season_xpath, workers, timeout)
+    except (TimeoutException, WebDriverException):
+        print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        raise
 
-    time.sleep(3) # Load the season.
+    return ''.join(pages)
 
-    for page in range(2, 1000):
-        #TODO fix constant structure.
 
-        page_selected = BUTTON_PAGE_SELECT.format(str(page))
+def get_player_box_scores_resumable(browser, season_xpath: str, season: str,
+                                    journal: PageJournal = None, key_columns=None,
+                                    timeout: float = DEFAULT_TIMEOUT,
+                                    retries: int = DEFAULT_RETRIES,
+                                    backoff: float = DEFAULT_BACKOFF,
+                                    url: str = PLAYER_BOX_SCORES_URL):
+    """
+    Collects and parses the box scores of NBA players for a season,
+    journaling every parsed page so a failed run resumes at the first
+    missing page instead of starting over (see checkpoint.py).
 
-        try:
-            browser.find_element_by_xpath(page_selected).click()
-            message = '[+] GETTING PLAYER BOX SCORES TABLE \
-                    FROM PAGE {0}'.format(str(page - 1))
-            print(message)
-        except:
-            print("[+] REACHED END OF BOX SCORE TABLE FOR SEASON")
-            break
+    Args:
+        browser: Chrome driver browser instance
+        season_xpath: XPATH of NBA season (from my_constants.py)
+        season: season to append at the end of dataframe as column.
+        journal: PageJournal to resume from (default: ./data/checkpoints)
+        key_columns: natural key of a row, to drop rows seen on two pages
+        timeout: seconds to wait for each page to render
+        retries: attempts per page after the first one
+        backoff: seconds before the first retry, doubled after each one
+        url: page with the table
+    Returns:
+        Dataframe of players box score table. The journal is kept until
+        the caller clear()s it.
+    """
 
-        time.sleep(3) # Load selected page.
+    journal = journal or PageJournal('players/boxscores', season)
 
-        raw_table += browser.find_element_by_class_name('nba-stat-table__overflow').text
+    box_scores_df = collect_resumable(
+        browser, url, season_xpath, journal,
+        lambda page_text, page: parse_player_box_score_page(page_text, season, page),
+        key_columns, timeout, retries, backoff)
 
-    return raw_table
+    if box_scores_df is None:
+        box_scores_df = parse_player_box_score_page('', season)
+    return box_scores_df
 
 
 def parse_player_box_scores(raw_table, season: str):
@@ -68,69 +193,60 @@ def parse_player_box_scores(raw_table, season: str):
                    NBA players stats for a particular season.
         season: season to append at the end of dataframe as column.
     Returns:
-        Dataframe of players box score table
+        Dataframe of players box score table, typed per
+        PLAYER_BOX_SCORE_SCHEMA in table_schema.py
     """
 
-    is_name = True
-
     print("[+] PARSING PLAYERS BOX SCORES TABLE")
 
-    player_names = list()
-    player_stats = list()
-    lines_to_parse = raw_table.split('\n')
-
-    for line in lines_to_parse:
-        if (line == "PLAYER TEAM MATCH UP GAME DATE W/L MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST STL BLK TOV PF +/-"):
-            continue
-        elif (is_name):
-            if "'" in line:
-                line = line.replace("'", "")
-            player_names.append(line)
-            is_name = False
-        elif (not is_name):
-            line = line.replace("PLAYER TEAM MATCH UP GAME DATE W/L MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST STL BLK TOV PF +/-", "")
-            player_stats.append([i for i in line.split(' ')])
-            is_name = True
-
-    df = pandas.DataFrame({'player': player_names,
-                       'team': [i[0] for i in player_stats],
-                       'matchup': [i[3] for i in player_stats],
-                       'gamedate': [i[4] for i in player_stats],
-                       'wl': [i[5] for i in player_stats], 
-                       'min': [i[6] for i in player_stats],
-                       'pts': [i[7] for i in player_stats],
-                       'fgm': [i[8] for i in player_stats],
-                       'fga': [i[9] for i in player_stats],
-                       'fgp': [i[10] for i in player_stats],
-                       '3pm': [i[11] for i in player_stats],
-                       '3pa': [i[12] for i in player_stats],
-                       '3pp': [i[13] for i in player_stats],
-                       'ftm': [i[14] for i in player_stats],
-                       'fta': [i[15] for i in player_stats],
-                       'ftp': [i[16] for i in player_stats],
-                       'oreb': [i[17] for i in player_stats],
-                       'dreb': [i[18] for i in player_stats],
-                       'reb': [i[19] for i in player_stats],
-                       'ast': [i[20] for i in player_stats],
-                       'stl': [i[21] for i in player_stats],
-                       'blk': [i[22] for i in player_stats],
-                       'tov': [i[23] for i in player_stats],
-                       'pf': [i[24] for i in player_stats],
-                       'pm': [i[25] for i in player_stats],
-                       })
-
-    df.insert(len(df.columns), 'season', season) #Add the season
+    return parse_player_box_score_page(raw_table, season)
 
+
+def parse_player_box_score_page(page_text, season: str, first_page: int = 1):
+    """
+    Parses one page (or several concatenated pages) of the player box
+    score table, without the progress banner. Malformed rows are left out
+    and quarantined (see quarantine.py) with first_page as the page of the
+    text's first line.
+    """
+
+    with METRICS.stage('parse', table='players/boxscores'):
+        lines_to_parse = page_text.split('\n')
+        framed = frame_alternating(lines_to_parse, PLAYER_BOX_SCORE_HEADER,
+                                   stat_width(PLAYER_BOX_SCORE_SCHEMA))
+        df, rejects = parse_records(PLAYER_BOX_SCORE_SCHEMA, framed, season)
+
+    QUARANTINE.add('players/boxscores', season, rejects, first_page)
+    METRICS.increment('rows', len(df), table='players/boxscores')
     return df
 
 
-def get_player_season_stats(browser, season_xpath: str):
+def iter_player_box_score_batches(pages, season: str):
+    """
+    Parses box score pages into DataFrame batches as they arrive, so only
+    one page of text is held at a time.
+
+    Args:
+        pages: iterable of page texts, e.g. iter_player_box_score_pages()
+        season: season to append at the end of each batch as column.
+    Returns:
+        Generator of typed DataFrames, one per page.
+    """
+
+    for page, page_text in enumerate(pages, 1):
+        yield parse_player_box_score_page(page_text, season, page)
+
+
+def get_player_season_stats(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT,
+                            url: str = PLAYER_SEASON_STATS_URL):
     """
     Collects data from NBA.com on all players season stats.
 
     Args
         browser: Chrome driver browser instance (from initalizeChromeDriver())
         season_xpath: XPATH of NBA season (defined on nba_data_scrapper.py)
+        timeout: seconds to wait for each page to render (see page_wait.py)
+        url: page with the table
 
     Returns:
         Table (long string) separate by new lines and spaces of the NBA
@@ -140,24 +256,18 @@ def get_player_season_stats(browser, season_xpath: str):
     print("[+] GETTING PLAYER SEASON STATS TABLE")
 
     #Get table of stats. 
-    browser.get("https://stats.nba.com/players/traditional/?sort=PTS&dir=-1s")
+    navigate(browser, url)
 
     try:
-        browser.find_element_by_xpath(season_xpath).click()
-    except:
-        sys.exit("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
-
-    time.sleep(3) # Load the season.
+        season_table = select_season(browser, season_xpath, timeout)
+        with SCHEDULER.slot(url):
+            browser.find_element_by_xpath(BUTTON_ALL_PLAYERS).click()
+            raw_table = wait_for_table(browser, season_table, timeout) # Load all players
+    except (TimeoutException, WebDriverException):
+        print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        raise
 
-    try:
-        browser.find_element_by_xpath(BUTTON_ALL_PLAYERS).click()
-    except:
-        sys.exit("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
-    
-    time.sleep(3) # Load all players
-    raw_table = browser.find_element_by_class_name('nba-stat-table__overflow')
-
-    return raw_table.text
+    return raw_table
 
 
 def parse_player_season_stats(table, season: str):
@@ -169,57 +279,17 @@ def parse_player_season_stats(table, season: str):
                      players stats for a particular season.
         season: season to append at the end (for my use for inserting into DB)
     Returns:
-        A data frame of the player season stats.
+        A data frame of the player season stats, typed per
+        PLAYER_SEASON_STATS_SCHEMA in table_schema.py
     """
 
     print("[+] PARSING PLAYER SEASON STATS TABLE")
 
-    player_names = list()
-    player_stats = list()
-
-    lines_to_parse = table.split('\n')
-
-    for line_num, lines in enumerate(lines_to_parse):
-        if line_num != 0:
-            if line_num % 3 == 2:
-                if "'" in lines:
-                    lines = lines.replace("'", "")
-                player_names.append(lines)
-            elif line_num % 3 == 0:
-                player_stats.append([i for i in lines.split(' ')])
-    
-    df = pandas.DataFrame({'player': player_names,
-                       'team': [i[0] for i in player_stats],
-                       'age': [i[1] for i in player_stats],
-                       'gp': [i[2] for i in player_stats],
-                       'w': [i[3] for i in player_stats], 
-                       'l': [i[4] for i in player_stats],
-                       'min': [i[5] for i in player_stats],
-                       'pts': [i[6] for i in player_stats],
-                       'fgm': [i[7] for i in player_stats],
-                       'fga': [i[8] for i in player_stats],
-                       'fgp': [i[9] for i in player_stats],
-                       '3pm': [i[10] for i in player_stats],
-                       '3pa': [i[11] for i in player_stats],
-                       '3pp': [i[12] for i in player_stats],
-                       'ftm': [i[13] for i in player_stats],
-                       'fta': [i[14] for i in player_stats],
-                       'ftp': [i[15] for i in player_stats],
-                       'oreb': [i[16] for i in player_stats],
-                       'dreb': [i[17] for i in player_stats],
-                       'reb': [i[18] for i in player_stats],
-                       'ast': [i[19] for i in player_stats],
-                       'tov': [i[20] for i in player_stats],
-                       'stl': [i[21] for i in player_stats],
-                       'blk': [i[22] for i in player_stats],
-                       'pf': [i[23] for i in player_stats],
-                       'fp': [i[24] for i in player_stats],
-                       'dd2': [i[25] for i in player_stats],
-                       'td3': [i[26] for i in player_stats],
-                       'pm': [i[27] for i in player_stats]
-                       })
-
-    df.insert(len(df.columns), 'season', season) #Add the season
-
-    return df
+    with METRICS.stage('parse', table='players/traditional'):
+        lines_to_parse = table.split('\n')
+        framed = frame_ranked(lines_to_parse, stat_width(PLAYER_SEASON_STATS_SCHEMA))
+        df, rejects = parse_records(PLAYER_SEASON_STATS_SCHEMA, framed, season)
 
+    QUARANTINE.add('players/traditional', season, rejects)
+    METRICS.increment('rows', len(df), table='players/traditional')
+    return df
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+from collections import deque
+
+from metrics import METRICS
+
+"""Most recent rejected rows kept in memory; older ones only in the log file"""
+MAX_ROWS_IN_MEMORY = 1000
+
+
+class Quarantine:
+    """
+    Thread-safe store of the rows the table parsers rejected (see
+    table_schema.frame_records()), with the table, season, page and line
+    they came from. One malformed row no longer aborts a parse: it is put
+    aside here and the rest of the table is kept.
+
+    Only the last max_rows rows stay in self.rows, so a long collection
+    with many bad rows does not grow memory; self.count keeps the total.
+
+    Args:
+        log_path: JSON lines file getting one entry per rejected row
+                  (None to keep them in memory only)
+        max_rows: rows kept in memory
+    """
+
+    def __init__(self, log_path: str = None, max_rows: int = MAX_ROWS_IN_MEMORY):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.rows = deque(maxlen=max_rows)
+        self.count = 0
+
+    def log_to(self, path: str):
+        """
+        Starts (or with None stops) appending rejected rows to a JSON lines file.
+        """
+
+        self.log_path = path
+
+    def add(self, table: str, season: str, rejects, first_page: int = 1):
+        """
+        Quarantines the rejects of one parse.
+
+        Args:
+            table: table the rows come from, e.g. 'players/boxscores'
+            season: season of the rows
+            rejects: list of table_schema.Reject
+            first_page: page the parsed text starts at, when it is not
+                        the whole table
+        """
+
+        if not rejects:
+            return
+
+        rows = [dict(table=table, season=season, page=reject.page + first_page - 1,
+                     line=reject.line, reason=reject.reason, text=reject.text)
+                for reject in rejects]
+
+        with self._lock:
+            self.rows.extend(rows)
+            self.count += len(rows)
+            if self.log_path:
+                with open(self.log_path, 'a') as f:
+                    f.writelines(json.dumps(row) + '\n' for row in rows)
+
+        METRICS.increment('rows_quarantined', len(rows), table=table)
+        print("[-] QUARANTINED {0} MALFORMED ROWS OF {1} {2} (PAGES {3})".format(
+            len(rows), table, season, ', '.join(sorted({str(row['page']) for row in rows}, key=int))))
+
+    def clear(self):
+        with self._lock:
+            self.rows.clear()
+            self.count = 0
+
+
+"""Quarantine shared by every parser"""
+QUARANTINE = Quarantine()
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import string
+import argparse
+import threading
+from urllib.parse import urlsplit, urlencode, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from my_constants import PLAYER_BOX_SCORES_PATH, \
+                         PLAYER_SEASON_STATS_PATH, TEAM_BOX_SCORES_PATH, TEAM_SEASON_STATS_PATH
+from scheduler import TokenBucket
+from seasons import SEASONS
+
+"""Table page path -> (recording table name, season option XPATHs of its dropdown)"""
+TABLE_PAGES = {
+    urlsplit(PLAYER_BOX_SCORES_PATH).path: ('players/boxscores', SEASONS.boxscore_xpaths),
+    urlsplit(PLAYER_SEASON_STATS_PATH).path: ('players/traditional', SEASONS.season_xpaths),
+    urlsplit(TEAM_BOX_SCORES_PATH).path: ('teams/boxscores', SEASONS.boxscore_xpaths),
+    urlsplit(TEAM_SEASON_STATS_PATH).path: ('teams/traditional', SEASONS.season_xpaths),
+}
+
+"""Query parameters ignored when no response matches a request exactly"""
+DATE_RANGE_PARAMS = ('DateFrom', 'DateTo')
+
+"""Page key of a table's 'All' option"""
+ALL_PAGES = 'all'
+
+"""Shown while no season is selected, and when a page was never recorded"""
+NO_SEASON_TEXT = 'SELECT A SEASON\n-'
+MISSING_TEXT = 'NOT RECORDED'
+
+"""Size of each page asset served under /replay/assets/"""
+ASSET_BYTES = 100 * 1024
+
+"""Third-party scripts of the live table pages. The fixture serves them
+itself, at paths naming their hosts, so driver_profiles.THIRD_PARTY_HOSTS
+blocks them as it would the real ones."""
+THIRD_PARTY_SCRIPTS = [
+    'www.googletagmanager.com/gtm.js',
+    'www.google-analytics.com/analytics.js',
+    'securepubads.g.doubleclick.net/tag/js/gpt.js',
+]
+
+ASSET_TYPES = {'.png': 'image/png', '.woff2': 'font/woff2', '.js': 'application/javascript'}
+
+"""
+Stand-in for a stats.nba.com table page. The dropdowns and the table sit at
+the XPATHs in my_constants.py, so the collectors drive it unchanged, and
+every selection loads its page text from the replay server asynchronously
+like the live site does.
+"""
+TABLE_PAGE_TEMPLATE = string.Template('''<!DOCTYPE html>
+<html><head><title>$table</title></head>
+<body>$assets<main>
+<div></div>
+<div><div><div></div><div><div><div>
+  <div><div><div><div><label><select id="season">$season_options</select></label></div></div></div></div>
+  <nba-stat-table>
+    <div><div><div><select id="page"><option value="all">All</option></select></div></div></div>
+    <div class="nba-stat-table__overflow"></div>
+  </nba-stat-table>
+</div></div></div></div></div>
+</main>
+<script>
+var table = "$table";
+var seasonSelect = document.getElementById("season");
+var pageSelect = document.getElementById("page");
+var overflow = document.querySelector(".nba-stat-table__overflow");
+
+function load(page) {
+  var query = "table=" + encodeURIComponent(table) + "&season=" +
+              encodeURIComponent(seasonSelect.value) + "&page=" + page;
+  return fetch("/replay/table?" + query).then(function (response) { return response.json(); });
+}
+
+seasonSelect.addEventListener("change", function () {
+  load(1).then(function (data) {
+    var options = '<option value="all">All</option>';
+    for (var page = 1; page <= data.pages; page++) {
+      options += '<option value="' + page + '">' + page + '</option>';
+    }
+    pageSelect.innerHTML = options;
+    pageSelect.value = "1";
+    overflow.innerText = data.text;
+  });
+});
+
+pageSelect.addEventListener("change", function () {
+  load(pageSelect.value).then(function (data) { overflow.innerText = data.text; });
+});
+
+seasonSelect.selectedIndex = -1;
+overflow.innerText = "$no_season";
+</script>
+</body></html>
+''')
+
+
+def query_key(params):
+    """Stable key of a query string: its parameters sorted by name."""
+    return urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+class Recording:
+    """
+    Table pages and API responses captured from stats.nba.com, kept as a
+    JSON lines file so collection runs can be replayed offline.
+
+    Each line is either
+        {"type": "page", "table": ..., "season": ..., "page": 1 or "all", "text": ...}
+        {"type": "response", "endpoint": ..., "query": ..., "body": ...}
+
+    Args:
+        path: recording file to load, if it exists
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.pages = dict()     # (table, season) -> {page: text}
+        self.responses = dict() # (endpoint, query) -> body
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path: str):
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['type'] == 'page':
+                    self.add_page(entry['table'], entry['season'], entry['page'], entry['text'])
+                else:
+                    self.responses[(entry['endpoint'], entry['query'])] = entry['body']
+
+    def save(self, path: str = None):
+        """
+        Writes the recording to path (default: the file it was loaded from).
+        """
+
+        path = path or self.path
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for (table, season), pages in sorted(self.pages.items()):
+                for page, text in pages.items():
+                    f.write(json.dumps({'type': 'page', 'table': table, 'season': season,
+                                        'page': page, 'text': text}) + '\n')
+            for (endpoint, query), body in sorted(self.responses.items()):
+                f.write(json.dumps({'type': 'response', 'endpoint': endpoint,
+                                    'query': query, 'body': body}) + '\n')
+        os.replace(temp_path, path)
+
+    def add_page(self, table: str, season: str, page, text: str):
+        """
+        Adds a table page. page is the page number from 1, or ALL_PAGES.
+        """
+
+        page = page if page == ALL_PAGES else int(page)
+        self.pages.setdefault((table, season), dict())[page] = text
+
+    def add_response(self, endpoint: str, params: dict, body: str):
+        self.responses[(endpoint, query_key(params))] = body
+
+    def page(self, table: str, season: str, page):
+        """
+        Returns a recorded page text, or None. A table recorded only as
+        'All' also answers for page 1 and the other way around.
+        """
+
+        pages = self.pages.get((table, season), dict())
+        page = page if page == ALL_PAGES else int(page)
+        if page in pages:
+            return pages[page]
+        if page in (1, ALL_PAGES):
+            return pages.get(ALL_PAGES if page == 1 else 1)
+        return None
+
+    def page_count(self, table: str, season: str):
+        pages = self.pages.get((table, season), dict())
+        return max([page for page in pages if page != ALL_PAGES] or [1])
+
+    def response(self, endpoint: str, params: dict):
+        """
+        Returns the recorded body for a request, or None. A request that
+        only differs in its date range (e.g. an incremental DateFrom) gets
+        the full recorded response.
+        """
+
+        body = self.responses.get((endpoint, query_key(params)))
+        if body is not None:
+            return body
+
+        def undated(query: dict):
+            return {name: str(value) for name, value in query.items()
+                    if name not in DATE_RANGE_PARAMS}
+
+        wanted = undated(params or {})
+        for (recorded_endpoint, query), body in self.responses.items():
+            if recorded_endpoint == endpoint and \
+                    undated(dict(parse_qsl(query, keep_blank_values=True))) == wanted:
+                return body
+        return None
+
+
+class RecordingSession:
+    """
+    Wraps a requests session, adding every successful response to a
+    Recording. Install it with record_http().
+    """
+
+    def __init__(self, session, recording: Recording):
+        self.session = session
+        self.recording = recording
+
+    def get(self, url, params=None, **kwargs):
+        response = self.session.get(url, params=params, **kwargs)
+        if response.ok:
+            endpoint = urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1]
+            self.recording.add_response(endpoint, params, response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def record_http(backend, recording: Recording):
+    """
+    Makes an HttpBackend record every response it receives.
+    """
+
+    backend.session = RecordingSession(backend.session, recording)
+    return backend
+
+
+def record_pages(recording: Recording, table: str, season: str, pages):
+    """
+    Passes page texts through, e.g. from iter_player_box_score_pages(),
+    adding each to the recording as pages 1, 2, ...
+    """
+
+    for page, text in enumerate(pages, 1):
+        recording.add_page(table, season, page, text)
+        yield text
+
+
+def asset_markup(count: int):
+    """
+    Gives the fixture page the weight of a live one: count images, a web
+    font and the third-party scripts, all served by the replay server.
+    """
+
+    if not count:
+        return ''
+
+    font = ('<style>@font-face {font-family: fixture; src: url("/replay/assets/font.woff2");}'
+            ' body {font-family: fixture;}</style>')
+    images = ''.join('<img src="/replay/assets/image{0}.png">'.format(index)
+                     for index in range(count))
+    scripts = ''.join('<script async src="/replay/assets/{0}"></script>'.format(script)
+                      for script in THIRD_PARTY_SCRIPTS)
+    return font + images + scripts
+
+
+def season_options(season_xpaths):
+    """
+    Builds the <option>s of a season dropdown so every season sits at the
+    index its XPATH points to.
+    """
+
+    seasons = dict()
+    for season, xpath in season_xpaths.items():
+        seasons[int(re.search(r'option\[(\d+)\]$', xpath).group(1))] = season
+
+    options = list()
+    for index in range(1, max(seasons) + 1):
+        season = seasons.get(index, '')
+        options.append('<option value="{0}">{1}</option>'.format(season, season or 'OTHER'))
+    return ''.join(options)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: str, content_type: str, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client gave up, e.g. a cancelled request.
+
+    def do_GET(self):
+        replay = self.server.replay
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+        if replay.latency:
+            time.sleep(replay.latency)
+        replay.requests += 1
+
+        data_request = parts.path.startswith('/stats/') or parts.path == '/replay/table'
+        if data_request and not replay.admit():
+            self.send(429, json.dumps({'message': 'too many requests'}), 'application/json',
+                      {'Retry-After': '1'})
+
+        elif parts.path.startswith('/stats/'):
+            endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1]
+            body = replay.recording.response(endpoint, params)
+            if body is None:
+                self.send(404, json.dumps({'message': 'not recorded'}), 'application/json')
+            else:
+                self.send(200, body, 'application/json')
+
+        elif parts.path == '/replay/table':
+            table, season = params.get('table'), params.get('season')
+            text = replay.recording.page(table, season, params.get('page', 1))
+            body = {'text': MISSING_TEXT if text is None else text,
+                    'pages': replay.recording.page_count(table, season)}
+            self.send(200, json.dumps(body), 'application/json')
+
+        elif parts.path in TABLE_PAGES:
+            table, season_xpaths = TABLE_PAGES[parts.path]
+            page = TABLE_PAGE_TEMPLATE.substitute(
+                table=table, season_options=season_options(season_xpaths),
+                no_season=NO_SEASON_TEXT.replace('\n', '\\n'),
+                assets=asset_markup(replay.assets))
+            self.send(200, page, 'text/html')
+
+        elif parts.path.startswith('/replay/assets/'):
+            # Blank padding: valid as a script, and only the bytes matter.
+            content_type = ASSET_TYPES.get(os.path.splitext(parts.path)[1], 'text/plain')
+            self.send(200, ' ' * ASSET_BYTES, content_type, {'Cache-Control': 'max-age=3600'})
+
+        else:
+            self.send(404, 'not found', 'text/plain')
+
+
+class ReplayServer:
+    """
+    Local HTTP server standing in for stats.nba.com, serving a Recording
+    with a fixed delay per response. With max_rate set it throttles like
+    the live site: data requests above max_rate per second get a 429 with
+    Retry-After, to exercise the request scheduler (see scheduler.py).
+
+    Point HttpBackend(base_url=server.stats_url) or
+    SeleniumBackend(site_url=server.url) at it to run the collectors and
+    benchmarks (see benchmarks.py) without the live site.
+
+    Args:
+        recording: Recording (or path of one) to serve
+        latency: seconds to wait before each response
+        host: interface to listen on
+        port: port to listen on (0 picks a free one)
+        max_rate: data requests per second served before answering 429
+                  (None: never throttle)
+        assets: images each table page loads, along with a web font and
+                third-party scripts (0: a bare page), to benchmark driver
+                profiles (see driver_profiles.py)
+    """
+
+    def __init__(self, recording, latency: float = 0.0, host: str = '127.0.0.1',
+                 port: int = 0, max_rate: float = None, assets: int = 0):
+        self.recording = recording if isinstance(recording, Recording) else Recording(recording)
+        self.latency = latency
+        self.assets = assets
+        self.requests = 0
+        self.throttled = 0
+        self._bucket = TokenBucket(max_rate, burst=1) if max_rate else None
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.thread = None
+
+    def admit(self):
+        """
+        Returns whether a data request is within max_rate, counting it in
+        throttled when it is not.
+        """
+
+        if self._bucket is None:
+            return True
+        with self._lock:
+            if self._bucket.take():
+                return True
+            self.throttled += 1
+            return False
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    @property
+    def stats_url(self):
+        return self.url + '/stats/'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def record_seasons(path: str, seasons, backend: str = 'selenium'):
+    """
+    Collects the four tables of some seasons (see backends.STATS_ENDPOINTS)
+    from the live site and adds them to the recording at path.
+
+    Args:
+        path: recording file (created or extended)
+        seasons: seasons such as ['2018-2019']
+        backend: 'selenium' records the table pages, 'http' the API responses
+    """
+
+    # Imported here so serving a recording needs neither a browser nor requests.
+    from backends import HttpBackend, STATS_ENDPOINTS
+    from driver_pool import DriverPool
+    from player_data_collection import iter_player_box_score_pages, get_player_season_stats
+    from team_data_collection import get_team_box_scores_pages, get_team_season_stats
+
+    recording = Recording(path)
+
+    if backend == 'http':
+        http = record_http(HttpBackend(), recording)
+        for season in seasons:
+            for kind in STATS_ENDPOINTS:
+                http.table(kind, season)
+        http.close()
+    else:
+        with DriverPool() as pool:
+            for season in seasons:
+                with pool.driver() as browser:
+                    pages = iter_player_box_score_pages(browser, SEASONS.boxscore_xpath(season))
+                    for _ in record_pages(recording, 'players/boxscores', season, pages):
+                        pass
+                pages = get_team_box_scores_pages(pool, SEASONS.boxscore_xpath(season), workers=1)
+                for _ in record_pages(recording, 'teams/boxscores', season, pages):
+                    pass
+                with pool.driver() as browser:
+                    recording.add_page('players/traditional', season, ALL_PAGES,
+                                       get_player_season_stats(browser, SEASONS.season_xpath(season)))
+                with pool.driver() as browser:
+                    recording.add_page('teams/traditional', season, ALL_PAGES,
+                                       get_team_season_stats(browser, SEASONS.season_xpath(season)))
+
+    recording.save(path)
+    print("[+] RECORDED {0} TO {1}".format(', '.join(seasons), path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record stats.nba.com or serve a recording.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help="record seasons from the live site")
+    record.add_argument('path')
+    record.add_argument('seasons', nargs='+')
+    record.add_argument('--backend', choices=['selenium', 'http'], default='selenium')
+
+    serve = commands.add_parser('serve', help="serve a recording")
+    serve.add_argument('path')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--latency', type=float, default=0.0,
+                       help="seconds to wait before each response")
+    serve.add_argument('--max-rate', type=float, default=None,
+                       help="data requests per second before answering 429")
+    serve.add_argument('--assets', type=int, default=0,
+                       help="images per table page, plus a font and third-party scripts")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_seasons(args.path, args.seasons, args.backend)
+    else:
+        server = ReplayServer(args.path, args.latency, port=args.port, max_rate=args.max_rate,
+                              assets=args.assets)
+        print("[+] SERVING {0} AT {1}".format(args.path, server.url))
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
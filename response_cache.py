@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+
+from seasons import start_year
+
+"""Cache defaults"""
+DEFAULT_CACHE_DIR = '.nba_cache'
+DEFAULT_TTL = 6 * 60 * 60 # Seconds the current season stays fresh.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+"""Share of max_bytes eviction frees the cache down to, so a full cache is
+not walked again on the very next write"""
+EVICT_TO = 0.9
+
+
+def current_season(today: datetime.date = None):
+    """
+    Returns the season in progress (or the last one to finish), in the
+    '2018-2019' format. Seasons start in October.
+    """
+
+    today = today or datetime.date.today()
+    start = today.year if today.month >= 10 else today.year - 1
+    return '{0}-{1}'.format(start, start + 1)
+
+
+class ResponseCache:
+    """
+    Content addressed on-disk cache of fetched tables and responses.
+
+    Entries are keyed by the full URL of the table or endpoint, every
+    request parameter, the season and the page, so a replay server's
+    entries never answer for the live site. Seasons older than the one in
+    progress are closed and never expire; the season in progress (or a
+    later or unrecognized one) expires after ttl seconds, and the least
+    recently used entries are evicted once the cache grows past max_bytes.
+    The size of each entry is indexed on the first write, from one walk of
+    the folder, and kept up to date from then on, so a write only walks
+    the folder again when it takes the cache past max_bytes.
+
+    Args:
+        directory: folder holding the cache files
+        ttl: seconds an entry for the current season stays fresh
+        max_bytes: size limit of the cache folder
+        season_in_progress: season treated as open (defaults to
+                            current_season())
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, season_in_progress: str = None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.season_in_progress = season_in_progress or current_season()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._sizes = None # path -> bytes of every entry, see _index()
+        self._bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Locks can't be pickled; process workers get their own, and index
+        # the folder again as it is when they first write.
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_sizes'], state['_bytes'] = None, 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def is_closed(self, season: str):
+        """
+        Returns whether a season finished before the season in progress.
+        """
+
+        try:
+            return start_year(season) < start_year(self.season_in_progress)
+        except ValueError:
+            return False
+
+    def path(self, endpoint: str, season: str, page: int = None, params: dict = None):
+        """
+        Returns the file of an entry, named by the hash of its key.
+        """
+
+        key = json.dumps([endpoint, season, page,
+                          sorted((str(name), str(value)) for name, value in (params or {}).items())])
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, endpoint: str, season: str, page: int = None, params: dict = None):
+        """
+        Looks up an entry.
+
+        Returns:
+            The cached text, or None when missing or expired.
+        """
+
+        path = self.path(endpoint, season, page, params)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        if not self.is_closed(season) and time.time() - entry['stored'] > self.ttl:
+            self._count('expired')
+            self._count('misses')
+            return None
+
+        os.utime(path) # Mark as recently used for LRU eviction.
+        self._count('hits')
+        return entry['text']
+
+    def put(self, endpoint: str, season: str, text: str, page: int = None, params: dict = None):
+        """
+        Stores an entry, then evicts old entries if over the size limit.
+        """
+
+        path = self.path(endpoint, season, page, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {'endpoint': endpoint, 'season': season, 'page': page, 'params': params,
+                 'stored': time.time(), 'text': text}
+
+        # Write then rename so readers never see a partial entry.
+        temp_path = '{0}.{1}.{2}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            sizes = self._index()
+            self._bytes += size - sizes.get(path, 0)
+            sizes[path] = size
+            over_limit = self._bytes > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def fetch(self, endpoint: str, season: str, fetch_text, page: int = None,
+              params: dict = None):
+        """
+        Returns the cached text for a key, calling fetch_text() and storing
+        its result on a miss. Nothing is stored when fetch_text() raises,
+        e.g. on a table that could not be read to its last page.
+
+        Args:
+            endpoint: full URL of the table page or API endpoint
+            season: season of the data
+            fetch_text: callable with no arguments returning a string
+            page: page number, None for a whole table
+            params: query parameters of the request
+        Returns:
+            The text.
+        """
+
+        text = self.get(endpoint, season, page, params)
+        if text is None:
+            text = fetch_text()
+            self.put(endpoint, season, text, page, params)
+        return text
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _index(self):
+        """
+        Returns the size index of the entries, walking the folder the first
+        time. Call with the lock held.
+        """
+
+        if self._sizes is None:
+            self._sizes = {path: size for path, size, _ in self._entries()}
+            self._bytes = sum(self._sizes.values())
+        return self._sizes
+
+    def evict(self):
+        """
+        Removes least recently used entries once over max_bytes, until under
+        EVICT_TO of it. The folder is walked for the recency of each entry,
+        which also brings the size index up to date with other processes'
+        writes.
+        """
+
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        sizes = {path: size for path, size, _ in entries}
+        total = sum(sizes.values())
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else total
+
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            del sizes[path]
+            total -= size
+            self._count('evictions')
+
+        with self._lock:
+            self._sizes, self._bytes = sizes, total
+
+    def clear(self, season: str = None):
+        """
+        Removes every entry, or only the entries of one season.
+        """
+
+        for path, _, _ in list(self._entries()):
+            if season is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        if json.load(f)['season'] != season:
+                            continue
+                except (OSError, ValueError):
+                    pass
+            os.remove(path)
+
+        with self._lock:
+            self._sizes, self._bytes = None, 0 # Indexed again on the next write.
+
+    def report(self):
+        """
+        Prints and returns cache hit/miss counts and size.
+        """
+
+        entries = list(self._entries())
+        report = dict(self.stats, entries=len(entries),
+                      bytes=sum(size for _, size, _ in entries))
+        lookups = report['hits'] + report['misses']
+        report['hit_rate'] = report['hits'] / lookups if lookups else 0.0
+
+        print("[+] CACHE: {hits} HITS, {misses} MISSES ({expired} EXPIRED), "
+              "{evictions} EVICTIONS, {entries} ENTRIES, {bytes} BYTES".format(**report))
+
+        return report
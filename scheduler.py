@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlsplit
+
+from metrics import METRICS
+from seasons import SEASONS
+
+"""Priority lanes, most urgent first. NbaDataCollector runs daily updates in
+'incremental', the latest season in 'current' and older seasons in 'backfill'."""
+LANES = {'incremental': 0, 'current': 1, 'backfill': 2}
+DEFAULT_LANE = 'current'
+
+"""Requests per second per host: starting rate and the range adaptive
+throttling keeps it in"""
+DEFAULT_RATE = 1.0
+DEFAULT_MIN_RATE = 0.1
+DEFAULT_MAX_RATE = 4.0
+
+"""Requests a host can take back to back after being idle"""
+DEFAULT_BURST = 1
+
+"""A response slower than this is treated like a throttling response"""
+DEFAULT_SLOW_SECONDS = 10.0
+
+"""Within PROBE_FRACTION of the last throttled rate (either side) the rate
+grows PROBE_SLOWDOWN times slower. Past it the host accepts more than
+it did, and the rate grows at full speed again."""
+PROBE_FRACTION = 0.1
+PROBE_SLOWDOWN = 0.1
+
+"""Statuses by which a host asks for fewer requests"""
+THROTTLE_STATUSES = (429, 503)
+
+_current_lane = contextvars.ContextVar('lane', default=DEFAULT_LANE)
+
+
+def host_of(url: str):
+    return urlsplit(url).netloc or url
+
+
+def retry_after(headers):
+    """
+    Returns the seconds of a Retry-After header (None when absent or a date).
+    """
+
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def lane(name: str):
+    """
+    Runs the requests of a with block in a priority lane, e.g.
+
+        with lane('backfill'):
+            dc.collect_player_box_scores('2012-2013')
+
+    Threads started inside the block need contextvars.copy_context() to
+    inherit it.
+    """
+
+    if name not in LANES:
+        raise ValueError("Unknown lane {0!r}.".format(name))
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def season_lane(season: str):
+    """
+    Returns 'current' for the latest registered season, 'backfill' otherwise.
+    """
+
+    return 'current' if season == SEASONS.latest else 'backfill'
+
+
+class TokenBucket:
+    """
+    rate tokens per second, at most burst of them banked. Not thread-safe
+    on its own.
+    """
+
+    def __init__(self, rate: float, burst: float = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float = None):
+        """
+        Returns the seconds until a token is available (0 if one is).
+        """
+
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float = None):
+        """
+        Takes a token if one is available. Returns whether it did.
+        """
+
+        if self.wait_time(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Slot:
+    """
+    One scheduled request, yielded by RequestScheduler.slot(). Set status
+    and retry_after from the response, or counted to False for an outcome
+    that says nothing about the host (e.g. an expected timeout).
+    """
+
+    def __init__(self, host: str, lane: str, waited: float):
+        self.host = host
+        self.lane = lane
+        self.waited = waited
+        self.status = None
+        self.retry_after = None
+        self.counted = True
+
+
+class HostState:
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.waiting = list() # heap of (lane priority, ticket)
+        self.depth = {name: 0 for name in LANES}
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.ceiling = None # rate at the last throttling signal
+
+
+class RequestScheduler:
+    """
+    Central gate for every request sent to stats.nba.com, by the browser
+    getters, the HTTP backend and the asyncio collector alike.
+
+    Each host has a token bucket. Requests waiting on the same host are let
+    through in lane order (see LANES), first come first served within a
+    lane, so daily updates overtake a running backfill.
+
+    The rate adapts like TCP congestion control. Each throttling signal cuts
+    it by decrease, at most once per request interval. The signals are a
+    THROTTLE_STATUSES response, a failed request, or a response slower than
+    slow_seconds. Every other response raises it by increase, up to
+    max_rate. A Retry-After pauses the host. Collection settles just under
+    the rate the host accepts instead of a fixed worst-case delay.
+
+    Queue depth per host and lane and the current rate per host are
+    published as gauges, and the time spent queued in the
+    queue_wait_seconds histogram, of METRICS.
+
+    Args:
+        rate: starting requests per second per host
+        burst: requests a host can take back to back after being idle
+        min_rate, max_rate: bounds of the adapted rate
+        slow_seconds: response time treated as a throttling signal
+        decrease: factor applied to the rate on a throttling signal
+        increase: requests per second added after a good response
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 slow_seconds: float = DEFAULT_SLOW_SECONDS, decrease: float = 0.7,
+                 increase: float = 0.05):
+        self.configure(rate, burst, min_rate, max_rate, slow_seconds, decrease, increase)
+        self._condition = threading.Condition()
+        self._tickets = itertools.count()
+        self.hosts = dict() # host -> HostState
+
+    def configure(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                  min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                  slow_seconds: float = DEFAULT_SLOW_SECONDS, decrease: float = 0.7,
+                  increase: float = 0.05):
+        """
+        Changes the settings. Hosts seen before keep their adapted rate.
+        """
+
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("Rates must satisfy 0 < min_rate <= rate <= max_rate.")
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.slow_seconds = slow_seconds
+        self.decrease = decrease
+        self.increase = increase
+
+    def _state(self, host: str):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.rate, self.burst)
+        return state
+
+    def _set_depth(self, host: str, state: HostState, lane: str, change: int):
+        state.depth[lane] += change
+        METRICS.set_gauge('queue_depth', state.depth[lane], host=host, lane=lane)
+
+    def acquire(self, url: str, lane: str = None):
+        """
+        Blocks until a request to url's host may be sent.
+
+        Args:
+            url: URL (or host) about to be requested
+            lane: key of LANES (default: the lane of the calling context)
+        Returns:
+            Seconds spent waiting.
+        """
+
+        host, lane = host_of(url), lane or _current_lane.get()
+        ticket = (LANES[lane], next(self._tickets))
+        start = time.monotonic()
+
+        with self._condition:
+            state = self._state(host)
+            heapq.heappush(state.waiting, ticket)
+            self._set_depth(host, state, lane, 1)
+            self._condition.notify_all() # A more urgent request may now be first.
+            try:
+                while True:
+                    now = time.monotonic()
+                    if state.waiting[0] == ticket:
+                        wait = max(state.paused_until - now, state.bucket.wait_time(now))
+                        if wait <= 0:
+                            state.bucket.tokens -= 1
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+            finally:
+                state.waiting.remove(ticket)
+                heapq.heapify(state.waiting)
+                self._set_depth(host, state, lane, -1)
+                self._condition.notify_all()
+
+        waited = time.monotonic() - start
+        METRICS.observe('queue_wait_seconds', waited, lane=lane)
+        return waited
+
+    def report(self, url: str, seconds: float, error: BaseException = None,
+               status: int = None, retry_after: float = None):
+        """
+        Adapts a host's rate to how one of its requests went.
+
+        Args:
+            url: requested URL (or host)
+            seconds: time from sending the request to its response
+            error: exception the request failed with
+            status: HTTP status of the response, when known
+            retry_after: seconds the host asked to wait
+        """
+
+        host = host_of(url)
+        throttled = (error is not None or status in THROTTLE_STATUSES
+                     or seconds > self.slow_seconds)
+
+        with self._condition:
+            state = self._state(host)
+            bucket = state.bucket
+            now = time.monotonic()
+            if throttled:
+                METRICS.increment('throttled', host=host)
+                # Requests already in flight report the same episode: react once.
+                if now - state.last_decrease >= 1.0 / bucket.rate:
+                    bucket.wait_time(now)
+                    state.ceiling = bucket.rate
+                    bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                    bucket.tokens = min(bucket.tokens, 0)
+                    state.last_decrease = now
+            else:
+                # Probe slowly around the rate that was throttled last time.
+                near_ceiling = False
+                if state.ceiling:
+                    near_ceiling = abs(bucket.rate - state.ceiling) <= PROBE_FRACTION * state.ceiling
+                    if bucket.rate > state.ceiling * (1 + PROBE_FRACTION):
+                        state.ceiling = None
+                bucket.wait_time(now)
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase
+                                  * (PROBE_SLOWDOWN if near_ceiling else 1))
+            if retry_after:
+                state.paused_until = max(state.paused_until, now + retry_after)
+            METRICS.set_gauge('request_rate', bucket.rate, host=host)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url: str, lane: str = None):
+        """
+        Waits for a turn to request url, then times the with block as the
+        request and reports it; a block that raises is reported as failed.
+
+            with SCHEDULER.slot(url) as slot:
+                response = session.get(url)
+                slot.status = response.status_code
+        """
+
+        slot = Slot(host_of(url), lane or _current_lane.get(), self.acquire(url, lane))
+        start = time.monotonic()
+        try:
+            yield slot
+        except BaseException as error:
+            if slot.counted:
+                self.report(url, time.monotonic() - start, error=error)
+            raise
+        if slot.counted:
+            self.report(url, time.monotonic() - start, status=slot.status,
+                        retry_after=slot.retry_after)
+
+    @asynccontextmanager
+    async def async_slot(self, url: str, lane: str = None):
+        """
+        slot() for coroutines. Waiting for the turn blocks, so it runs in
+        the event loop's default executor, in the lane of the calling task.
+
+            async with SCHEDULER.async_slot(url) as slot:
+                async with session.get(url) as response:
+                    slot.status = response.status
+        """
+
+        import asyncio
+
+        lane = lane or _current_lane.get()
+        waited = await asyncio.get_running_loop().run_in_executor(None, self.acquire, url, lane)
+        slot = Slot(host_of(url), lane, waited)
+        start = time.monotonic()
+        try:
+            yield slot
+        except BaseException as error:
+            if slot.counted:
+                self.report(url, time.monotonic() - start, error=error)
+            raise
+        if slot.counted:
+            self.report(url, time.monotonic() - start, status=slot.status,
+                        retry_after=slot.retry_after)
+
+    def rate_of(self, url: str):
+        with self._condition:
+            return self._state(host_of(url)).bucket.rate
+
+
+"""Scheduler shared by every collector module"""
+SCHEDULER = RequestScheduler()
+
+
+def navigate(browser, url: str):
+    """
+    browser.get(url) once the scheduler lets the request through.
+    """
+
+    with SCHEDULER.slot(url):
+        browser.get(url)
+
+
+def page_url(browser):
+    """
+    Returns the URL a browser shows, to schedule its clicks against its host.
+    """
+
+    return getattr(browser, 'current_url', None) or ''
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+from collections import namedtuple
+
+from my_constants import SEASON_SELECT
+
+"""Environment variable naming a JSON season config read at import (see
+SeasonRegistry.from_config()), so workers and cron jobs share one range"""
+SEASONS_CONFIG_ENV = 'NBA_SEASONS_CONFIG'
+
+"""Default range, latest season first as in the dropdowns"""
+DEFAULT_LATEST_SEASON = '2018-2019'
+DEFAULT_FIRST_SEASON = '2010-2011'
+
+"""Dropdown -> option index of the latest season. The box score dropdowns
+list one more option above the seasons."""
+DEFAULT_OFFSETS = {'season': 1, 'boxscore': 2}
+
+SEASON_FORMAT = re.compile(r'^(\d{4})-(\d{4})$')
+
+Season = namedtuple('Season', ['season', 'start_year', 'api_season', 'season_xpath',
+                               'boxscore_xpath'])
+
+
+def start_year(season: str):
+    """
+    Returns the first year of a season such as '2018-2019'.
+    """
+
+    match = SEASON_FORMAT.match(season)
+    if not match or int(match.group(2)) != int(match.group(1)) + 1:
+        raise ValueError("Invalid season {0!r}, expected e.g. '2018-2019'.".format(season))
+    return int(match.group(1))
+
+
+def season_string(year: int):
+    return '{0}-{1}'.format(year, year + 1)
+
+
+def api_season(season: str):
+    """
+    Converts a collector season string to the stats API format.
+
+    Args:
+        season: season such as '2018-2019'
+    Returns:
+        Season such as '2018-19'
+    """
+    return season[:5] + season[-2:]
+
+
+class SeasonRegistry:
+    """
+    Every season the collectors accept, with the dropdown XPATHs and stats
+    API parameter of each one generated from a season range instead of
+    being maintained by hand. Entries are built once, so every lookup is a
+    dict lookup.
+
+    Seasons sit in the dropdowns latest first, so moving to a new season
+    (or back to 1996-1997) only changes latest/first, e.g. through a JSON
+    config:
+
+        {"latest": "2023-2024", "first": "2003-2004"}
+
+    Args:
+        latest: latest season, the top option of the dropdowns
+        first: oldest season to accept
+        offsets: dropdown ('season' or 'boxscore') -> option index of the
+                 latest season (default: DEFAULT_OFFSETS)
+    """
+
+    def __init__(self, latest: str = DEFAULT_LATEST_SEASON, first: str = DEFAULT_FIRST_SEASON,
+                 offsets: dict = None):
+        self.latest = latest
+        self.first = first
+        self.offsets = dict(DEFAULT_OFFSETS, **(offsets or {}))
+
+        latest_year, first_year = start_year(latest), start_year(first)
+        if first_year > latest_year:
+            raise ValueError("First season {0} is after latest season {1}.".format(first, latest))
+
+        self.entries = dict() # season -> Season, latest first
+        for index, year in enumerate(range(latest_year, first_year - 1, -1)):
+            season = season_string(year)
+            self.entries[season] = Season(
+                season, year, api_season(season),
+                SEASON_SELECT.format(self.offsets['season'] + index),
+                SEASON_SELECT.format(self.offsets['boxscore'] + index))
+
+        self.season_xpaths = {season: entry.season_xpath for season, entry in self.entries.items()}
+        self.boxscore_xpaths = {season: entry.boxscore_xpath
+                                for season, entry in self.entries.items()}
+
+    @classmethod
+    def from_config(cls, path: str):
+        """
+        Builds a registry from a JSON file with 'latest', 'first' and
+        optionally 'offsets' keys.
+        """
+
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config.get('latest', DEFAULT_LATEST_SEASON),
+                   config.get('first', DEFAULT_FIRST_SEASON), config.get('offsets'))
+
+    def to_config(self):
+        return {'latest': self.latest, 'first': self.first, 'offsets': self.offsets}
+
+    def __contains__(self, season):
+        return season in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, season: str):
+        return self.entries[season]
+
+    def season_xpath(self, season: str):
+        return self.entries[season].season_xpath
+
+    def boxscore_xpath(self, season: str):
+        return self.entries[season].boxscore_xpath
+
+    def api_season(self, season: str):
+        entry = self.entries.get(season)
+        return entry.api_season if entry else api_season(season)
+
+    def between(self, first: str = None, last: str = None):
+        """
+        Returns the registered seasons from first to last (both included,
+        default: the whole range), oldest first, e.g. to spread a backfill
+        over collect_many() workers.
+        """
+
+        low = start_year(first) if first else start_year(self.first)
+        high = start_year(last) if last else start_year(self.latest)
+        return [season for season, entry in reversed(self.entries.items())
+                if low <= entry.start_year <= high]
+
+
+def load_registry(path: str = None):
+    """
+    Returns the registry of a JSON config, by default the file named by
+    $NBA_SEASONS_CONFIG, or the default range when there is none.
+    """
+
+    path = path or os.environ.get(SEASONS_CONFIG_ENV)
+    return SeasonRegistry.from_config(path) if path else SeasonRegistry()
+
+
+"""Registry shared by every collector module"""
+SEASONS = load_registry()
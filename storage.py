@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+
+from metrics import METRICS
+
+DEFAULT_STORAGE_DIR = os.path.join('data', 'warehouse')
+
+"""File format name -> (pyarrow.dataset format, file extension)"""
+FORMATS = {
+    'parquet': ('parquet', 'parquet'),
+    'arrow': ('ipc', 'arrow'),
+}
+
+
+def _arrow():
+    """
+    Imports pyarrow on first use so the rest of the package works without it.
+    """
+
+    import pyarrow
+    import pyarrow.fs
+    import pyarrow.dataset
+    import pyarrow.parquet
+    import pyarrow.feather
+    return pyarrow
+
+
+def to_expression(filters):
+    """
+    Converts [(column, op, value), ...] filters (ANDed together) into a
+    pyarrow expression. Expressions are passed through unchanged.
+    """
+
+    pyarrow = _arrow()
+    if filters is None or isinstance(filters, pyarrow.dataset.Expression):
+        return filters
+    return pyarrow.parquet.filters_to_expression(filters)
+
+
+class StatsStore:
+    """
+    Typed columnar storage of collected tables, one dataset per kind
+    partitioned by season (kind/season=2018-2019/part-0.parquet).
+
+    Reads only decode the requested columns and push filters down to the
+    files, so loading pts/ast for one team touches a fraction of the data.
+    The 'arrow' format writes uncompressed Arrow IPC files that are memory
+    mapped on read for zero-copy loads.
+
+    A season is written into a hidden staging folder next to its partition
+    and renamed over it once complete, so a failed write leaves the stored
+    season as it was.
+
+    Args:
+        root: folder holding one sub folder per kind
+        file_format: 'parquet' or 'arrow'
+    """
+
+    def __init__(self, root: str = DEFAULT_STORAGE_DIR, file_format: str = 'parquet'):
+        if file_format not in FORMATS:
+            raise ValueError("Unknown storage format {0}".format(file_format))
+        self.root = root
+        self.file_format = file_format
+
+    def partition_dir(self, kind: str, season: str):
+        return os.path.join(self.root, kind, 'season={0}'.format(season))
+
+    def path(self, kind: str, season: str, part: int = 0, directory: str = None):
+        extension = FORMATS[self.file_format][1]
+        return os.path.join(directory or self.partition_dir(kind, season),
+                            'part-{0}.{1}'.format(part, extension))
+
+    def stage_partition(self, kind: str, season: str):
+        """
+        Creates an empty staging folder for a season's new files. Its name
+        starts with a dot, so datasets and seasons() skip it.
+        """
+
+        staging = os.path.join(self.root, kind, '.season={0}.{1}.tmp'.format(season, os.getpid()))
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        return staging
+
+    def replace_partition(self, kind: str, season: str, staging: str):
+        """
+        Moves a complete staging folder in place of a season's partition.
+        """
+
+        partition = self.partition_dir(kind, season)
+        old = staging[:-len('.tmp')] + '.old'
+        if os.path.isdir(partition):
+            os.replace(partition, old)
+        os.replace(staging, partition)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def arrow_table(self, df):
+        # The season lives in the partition folder, not in the file.
+        pyarrow = _arrow()
+        return pyarrow.Table.from_pandas(df.drop(columns=['season'], errors='ignore'),
+                                         preserve_index=False)
+
+    def write_table(self, table, path: str):
+        pyarrow = _arrow()
+        with METRICS.stage('store', format=self.file_format):
+            if self.file_format == 'parquet':
+                pyarrow.parquet.write_table(table, path)
+            else:
+                pyarrow.feather.write_feather(table, path, compression='uncompressed')
+        METRICS.increment('rows_stored', table.num_rows, format=self.file_format)
+
+    def write(self, kind: str, df, season: str = None):
+        """
+        Replaces the stored partition of a season with a DataFrame.
+
+        Args:
+            kind: table kind, e.g. 'player_box_scores'
+            df: DataFrame from a collect method
+            season: season of the rows (defaults to the df's season column)
+        Returns:
+            Path of the written file.
+        """
+
+        season = season or str(df['season'].iloc[0])
+        staging = self.stage_partition(kind, season)
+
+        try:
+            self.write_table(self.arrow_table(df), self.path(kind, season, directory=staging))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.replace_partition(kind, season, staging)
+
+        print("[+] STORED {0} ROWS OF {1} {2}".format(len(df), kind, season))
+        return self.path(kind, season)
+
+    def writer(self, kind: str, season: str):
+        """
+        Returns a BatchWriter that appends DataFrame batches to a season's
+        partition, e.g. as the sink of stream_player_box_scores().
+        """
+
+        return BatchWriter(self, kind, season)
+
+    def dataset(self, kind: str):
+        pyarrow = _arrow()
+        partitioning = pyarrow.dataset.partitioning(
+            pyarrow.schema([('season', pyarrow.string())]), flavor='hive')
+        filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+        return pyarrow.dataset.dataset(os.path.join(self.root, kind),
+                                       format=FORMATS[self.file_format][0],
+                                       partitioning=partitioning, filesystem=filesystem)
+
+    def read(self, kind: str, columns=None, filters=None, seasons=None):
+        """
+        Loads a stored dataset.
+
+        Args:
+            kind: table kind, e.g. 'player_box_scores'
+            columns: columns to load (default: all)
+            filters: pyarrow expression or [(column, op, value), ...], e.g.
+                     [('team', '==', 'LAL')]
+            seasons: only read these season partitions
+        Returns:
+            DataFrame, season as a categorical column.
+        """
+
+        pyarrow = _arrow()
+        expression = to_expression(filters)
+        if seasons is not None:
+            season_filter = pyarrow.dataset.field('season').isin(list(seasons))
+            expression = season_filter if expression is None else expression & season_filter
+
+        table = self.dataset(kind).to_table(columns=columns, filter=expression)
+        df = table.to_pandas()
+        if 'season' in df.columns:
+            df['season'] = df['season'].astype('category')
+
+        return df
+
+    def seasons(self, kind: str):
+        """
+        Returns the seasons stored for a kind.
+        """
+
+        folder = os.path.join(self.root, kind)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(folder)
+                      if name.startswith('season='))
+
+
+class BatchWriter:
+    """
+    Streams DataFrame batches into one season partition, one file per
+    batch, so only the current batch is held in memory. Use as a context
+    manager or call close().
+
+    Batches go to a staging folder that close() renames over the stored
+    partition. Leaving the with block on an exception (or calling
+    discard()) drops them and keeps the stored season.
+    """
+
+    def __init__(self, store: StatsStore, kind: str, season: str):
+        self.store = store
+        self.kind = kind
+        self.season = season
+        self.parts = 0
+        self.rows = 0
+
+        self.staging = store.stage_partition(kind, season)
+
+    def __call__(self, batch):
+        self.store.write_table(self.store.arrow_table(batch),
+                                self.store.path(self.kind, self.season, self.parts,
+                                                directory=self.staging))
+        self.parts += 1
+        self.rows += len(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def discard(self):
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+    def close(self):
+        if self.staging is None:
+            return
+        self.store.replace_partition(self.kind, self.season, self.staging)
+        self.staging = None
+        print("[+] STORED {0} ROWS OF {1} {2} IN {3} PARTS".format(
+            self.rows, self.kind, self.season, self.parts))
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+
+import io
+import csv
+import bisect
+from itertools import repeat
+from collections import namedtuple
+
+from metrics import METRICS
+from utilities import normalize_dates
+
+"""Source of a column that comes from the name line instead of the stat line"""
+NAME = 'name'
+
+"""Lines standing in for a missing value, never a name or a record"""
+PLACEHOLDER_LINES = frozenset(['', 'N/A', 'NA', '-', '--'])
+
+"""
+A line or record rejected while framing or validating a table: page
+(counted by headers, from 1), line number in the table text, why it was
+rejected and its text
+"""
+Reject = namedtuple('Reject', ['page', 'line', 'reason', 'text'])
+
+"""
+Records framed from a table text: name and stat line of each record, the
+line number of each stat line, the line numbers of the headers and the
+rejected lines
+"""
+Framed = namedtuple('Framed', ['names', 'stat_lines', 'line_numbers', 'header_lines',
+                               'rejects'])
+
+"""Header line of the player box score table, repeated on every page"""
+PLAYER_BOX_SCORE_HEADER = "PLAYER TEAM MATCH UP GAME DATE W/L MIN PTS FGM FGA FG% 3PM 3PA 3P% FTM FTA FT% OREB DREB REB AST STL BLK TOV PF +/-"
+
+"""
+Declarative column schemas shared by the four table parsers and the HTTP
+backend: (column, token index in the stat line or NAME, dtype).
+dtype is a numpy/pandas dtype name, 'category', 'string' or 'date'.
+"""
+PLAYER_BOX_SCORE_SCHEMA = [
+    ('player', NAME, 'string'),
+    ('team', 0, 'category'),
+    ('matchup', 3, 'category'),
+    ('gamedate', 4, 'date'),
+    ('wl', 5, 'category'),
+    ('min', 6, 'int16'),
+    ('pts', 7, 'int16'),
+    ('fgm', 8, 'int16'),
+    ('fga', 9, 'int16'),
+    ('fgp', 10, 'float32'),
+    ('3pm', 11, 'int16'),
+    ('3pa', 12, 'int16'),
+    ('3pp', 13, 'float32'),
+    ('ftm', 14, 'int16'),
+    ('fta', 15, 'int16'),
+    ('ftp', 16, 'float32'),
+    ('oreb', 17, 'int16'),
+    ('dreb', 18, 'int16'),
+    ('reb', 19, 'int16'),
+    ('ast', 20, 'int16'),
+    ('stl', 21, 'int16'),
+    ('blk', 22, 'int16'),
+    ('tov', 23, 'int16'),
+    ('pf', 24, 'int16'),
+    ('pm', 25, 'int16'),
+]
+
+PLAYER_SEASON_STATS_SCHEMA = [
+    ('player', NAME, 'string'),
+    ('team', 0, 'category'),
+    ('age', 1, 'int16'),
+    ('gp', 2, 'int16'),
+    ('w', 3, 'int16'),
+    ('l', 4, 'int16'),
+    ('min', 5, 'float32'),
+    ('pts', 6, 'float32'),
+    ('fgm', 7, 'float32'),
+    ('fga', 8, 'float32'),
+    ('fgp', 9, 'float32'),
+    ('3pm', 10, 'float32'),
+    ('3pa', 11, 'float32'),
+    ('3pp', 12, 'float32'),
+    ('ftm', 13, 'float32'),
+    ('fta', 14, 'float32'),
+    ('ftp', 15, 'float32'),
+    ('oreb', 16, 'float32'),
+    ('dreb', 17, 'float32'),
+    ('reb', 18, 'float32'),
+    ('ast', 19, 'float32'),
+    ('tov', 20, 'float32'),
+    ('stl', 21, 'float32'),
+    ('blk', 22, 'float32'),
+    ('pf', 23, 'float32'),
+    ('fp', 24, 'float32'),
+    ('dd2', 25, 'int16'),
+    ('td3', 26, 'int16'),
+    ('pm', 27, 'float32'),
+]
+
+TEAM_BOX_SCORE_SCHEMA = [
+    ('team', 0, 'category'),
+    ('opp', 3, 'category'),
+    ('date', 4, 'date'),
+    ('wl', 5, 'category'),
+    ('min', 6, 'int16'),
+    ('pts', 7, 'int16'),
+    ('fgm', 8, 'int16'),
+    ('fga', 9, 'int16'),
+    ('fgp', 10, 'float32'),
+    ('3pm', 11, 'int16'),
+    ('3pa', 12, 'int16'),
+    ('3pp', 13, 'float32'),
+    ('ftm', 14, 'int16'),
+    ('fta', 15, 'int16'),
+    ('ftp', 16, 'float32'),
+    ('oreb', 17, 'int16'),
+    ('dreb', 18, 'int16'),
+    ('reb', 19, 'int16'),
+    ('ast', 20, 'int16'),
+    ('stl', 21, 'int16'),
+    ('blk', 22, 'int16'),
+    ('tov', 23, 'int16'),
+    ('pf', 24, 'int16'),
+    ('pm', 25, 'int16'),
+]
+
+TEAM_SEASON_STATS_SCHEMA = [
+    ('team', NAME, 'category'),
+    ('gp', 0, 'int16'),
+    ('w', 1, 'int16'),
+    ('l', 2, 'int16'),
+    ('winpct', 3, 'float32'),
+    ('min', 4, 'float32'),
+    ('pts', 5, 'float32'),
+    ('fgm', 6, 'float32'),
+    ('fga', 7, 'float32'),
+    ('fgp', 8, 'float32'),
+    ('3pm', 9, 'float32'),
+    ('3pa', 10, 'float32'),
+    ('3pp', 11, 'float32'),
+    ('ftm', 12, 'float32'),
+    ('fta', 13, 'float32'),
+    ('ftp', 14, 'float32'),
+    ('oreb', 15, 'float32'),
+    ('dreb', 16, 'float32'),
+    ('reb', 17, 'float32'),
+    ('ast', 18, 'float32'),
+    ('tov', 19, 'float32'),
+    ('stl', 20, 'float32'),
+    ('blk', 21, 'float32'),
+    ('blka', 22, 'float32'),
+    ('pf', 23, 'float32'),
+    ('pfd', 24, 'float32'),
+    ('pm', 25, 'float32'),
+]
+
+
+def stat_width(schema):
+    """
+    Returns the number of space separated fields of a schema's stat line.
+    """
+
+    return max(source for _, source, _ in schema if source != NAME) + 1
+
+
+def page_of(header_lines, line_number: int):
+    """
+    Returns the page of a line, given the line numbers of the headers that
+    start each page (a header glued to a page's last line ends that page).
+    """
+
+    return max(1, bisect.bisect_left(header_lines, line_number))
+
+
+def frame_records(lines, header: str, width: int, named: bool = True, ranked: bool = False):
+    """
+    Frames table lines into records of an optional rank line, a name line
+    and a stat line of exactly width fields.
+
+    A well formed table is framed by one vectorized check of the field
+    counts. Otherwise lines are told apart by their length instead of
+    their position, so a stray line only costs its own record: framing
+    resynchronizes on the next name and stat line. Rejected are
+    placeholder lines (N/A), stat lines with too few or too many fields (a
+    missing +/-, a team name with spaces), stat lines without a name line
+    and name lines without stats.
+
+    Args:
+        lines: lines of the table text
+        header: header line, skipped wherever it is repeated. Pages can be
+                concatenated without a newline, so a header glued to the
+                end of the previous page's last stat line is cut off too.
+        width: fields of a stat line, see stat_width()
+        named: whether records have a name line
+        ranked: whether records start with a rank line
+    Returns:
+        Framed
+    """
+
+    import numpy
+
+    lines = list(lines)
+    spaces = numpy.fromiter(map(str.count, lines, repeat(' ')), dtype=numpy.int64,
+                            count=len(lines))
+    header_lines = list()
+    skipped = list()
+
+    if header:
+        for index in numpy.flatnonzero(spaces >= header.count(' ')).tolist():
+            if header in lines[index]:
+                header_lines.append(index + 1)
+                lines[index] = lines[index].replace(header, "")
+                spaces[index] = lines[index].count(' ')
+                if not lines[index]:
+                    skipped.append(index)
+    if lines and not lines[-1]:
+        skipped.append(len(lines) - 1)
+
+    framed = frame_well_formed(lines, spaces, numpy.delete(numpy.arange(len(lines)), skipped),
+                               header_lines, width, named, ranked)
+    if framed is None:
+        framed = frame_resync(lines, spaces, header_lines, width, named, ranked)
+    return framed
+
+
+def frame_well_formed(lines, spaces, kept, header_lines, width: int, named: bool,
+                      ranked: bool):
+    """
+    Frames the kept lines by position when every record has the expected
+    shape, checked on whole arrays. Returns None when one does not.
+    """
+
+    size = 1 + named + ranked
+    if len(kept) % size:
+        return None
+
+    stats = kept[size - 1::size]
+    if not (spaces[stats] == width - 1).all():
+        return None
+
+    names = list()
+    if named:
+        name_positions = kept[size - 2::size]
+        if not (spaces[name_positions] < width // 2).all():
+            return None
+        names = [lines[index] for index in name_positions.tolist()]
+        if not PLACEHOLDER_LINES.isdisjoint(names):
+            return None
+
+    if ranked:
+        ranks = kept[0::size]
+        if not ((spaces[ranks] == 0).all()
+                and all(lines[index].isdigit() for index in ranks.tolist())):
+            return None
+
+    stats = stats.tolist()
+    return Framed(names, [lines[index] for index in stats], [index + 1 for index in stats],
+                  header_lines, [])
+
+
+def frame_resync(lines, spaces, header_lines, width: int, named: bool, ranked: bool):
+    """
+    Frames lines one by one, rejecting what does not fit a record and
+    picking up at the next one (see frame_records()).
+    """
+
+    names, stat_lines, line_numbers, rejects = [], [], [], []
+    name = None # name line waiting for its stat line
+    name_number = 0
+    shortest = width // 2
+
+    def reject(number, reason, text):
+        rejects.append(Reject(page_of(header_lines, number), number, reason, text))
+
+    for number, (line, count) in enumerate(zip(lines, spaces.tolist()), 1):
+        if count < shortest:
+            if not line.strip() or ranked and line.isdigit():
+                continue
+            if not named or line.strip() in PLACEHOLDER_LINES:
+                reject(number, 'stray line', line)
+                continue
+            if name is not None:
+                reject(name_number, 'name line without a stat line', name)
+            name, name_number = line, number
+            continue
+
+        if count + 1 != width:
+            text = line if name is None else name + '\n' + line
+            reject(number, 'expected {0} fields, found {1}'.format(width, count + 1), text)
+        elif name is not None:
+            names.append(name)
+            stat_lines.append(line)
+            line_numbers.append(number)
+        elif named:
+            reject(number, 'stat line without a name line', line)
+        else:
+            stat_lines.append(line)
+            line_numbers.append(number)
+        name = None
+
+    if name is not None:
+        reject(name_number, 'name line without a stat line', name)
+
+    return Framed(names, stat_lines, line_numbers, header_lines, rejects)
+
+
+def frame_alternating(lines, header: str, width: int):
+    """
+    Frames a table where every record is a name line followed by a stat
+    line, with the header repeated once per page (player box scores).
+
+    Returns:
+        Framed, see frame_records()
+    """
+
+    return frame_records(lines, header, width)
+
+
+def frame_ranked(lines, width: int):
+    """
+    Frames a table of rank, name and stat lines after one header line
+    (player and team season stats).
+
+    Returns:
+        Framed, see frame_records()
+    """
+
+    return frame_records(lines, lines[0] if lines else None, width, ranked=True)
+
+
+def frame_single(lines, width: int):
+    """
+    Frames a table of one stat line per record after a header line (team
+    box scores). Pages joined by new lines repeat the header, and the
+    repeats are skipped.
+
+    Returns:
+        Framed, see frame_records()
+    """
+
+    return frame_records(lines, lines[0] if lines else None, width, named=False)
+
+
+def read_stat_lines(schema, stat_lines, width: int = None):
+    """
+    Splits and converts every stat line in a single pass of pandas' C
+    parser, reading only the token positions the schema uses.
+
+    Rows with fewer tokens than the widest row read as missing values.
+
+    Args:
+        schema: list of (column, source, dtype)
+        stat_lines: list of space separated stat lines
+        width: fields of every line, when known (framed lines)
+    Returns:
+        DataFrame of raw columns keyed by token index.
+    """
+
+    import pandas
+
+    sources = sorted(source for _, source, _ in schema if source != NAME)
+    if not stat_lines:
+        return pandas.DataFrame({source: [] for source in sources})
+
+    if width is None:
+        width = max(max(line.count(' ') for line in stat_lines) + 1, sources[-1] + 1)
+
+    # Text-like columns are read as categories so repeated values (teams,
+    # dates) are converted once per distinct value. Numeric columns are
+    # inferred, and stray text in them is coerced by convert_column().
+    read_dtypes = {source: 'category' for _, source, dtype in schema
+                   if source != NAME and dtype in ('category', 'date', 'string')}
+
+    return pandas.read_csv(io.StringIO('\n'.join(stat_lines)), sep=' ', header=None,
+                           names=range(width), usecols=sources, dtype=read_dtypes,
+                           na_values=['-'], keep_default_na=False,
+                           quoting=csv.QUOTE_NONE, skip_blank_lines=False)
+
+
+def convert_column(values, dtype: str):
+    """
+    Converts a column of strings (or raw values) to its schema dtype.
+
+    Integer columns holding missing values use the pandas nullable integer
+    dtype of the same width instead of failing. A fractional value in an
+    integer column is converted to a missing value rather than truncated,
+    so invalid_values() rejects its row.
+    """
+
+    import numpy
+    import pandas
+
+    if dtype == 'string' and isinstance(values, list):
+        # Record names: one object array, without a Series in between.
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    values = pandas.Series(values) if not isinstance(values, pandas.Series) else values
+
+    if dtype == 'string':
+        return values.astype(object).values
+    if dtype == 'category':
+        return values.astype('category').values
+    if dtype == 'date':
+        return normalize_dates(values)
+
+    numbers = values if values.dtype.kind in 'if' else \
+        pandas.to_numeric(values.astype(object), errors='coerce')
+
+    if dtype.startswith('int'):
+        if numbers.dtype.kind == 'f':
+            numbers = numbers.where(numpy.floor(numbers) == numbers)
+        if numbers.isna().any():
+            return numbers.astype(dtype.capitalize()).array
+        return numbers.values.astype(dtype)
+
+    return numbers.values.astype(dtype)
+
+
+def typed_columns(schema, names, raw):
+    """
+    Converts the raw columns of read_stat_lines() and the record names to
+    the schema's dtypes, keyed by column name.
+    """
+
+    rows = len(raw)
+
+    columns = dict()
+    for column, source, dtype in schema:
+        values = names[:rows] if source == NAME else raw[source]
+        columns[column] = convert_column(values, dtype)
+
+    return columns
+
+
+def columns_dataframe(columns, season: str):
+    """
+    Builds the DataFrame of typed columns with a categorical season column.
+    """
+
+    import numpy
+    import pandas
+
+    df = pandas.DataFrame(columns)
+    # Add the season, as codes rather than a list of len(df) strings.
+    df['season'] = pandas.Categorical.from_codes(numpy.zeros(len(df), dtype='int8'), [season])
+    return df
+
+
+def invalid_values(schema, raw, columns):
+    """
+    Finds the values a column's dtype cannot hold, e.g. text in a number
+    column, a fractional value in an integer column or an unparseable
+    date, as values that were present in the stat lines but are missing
+    after conversion. Missing values ('-') are
+    valid. Checked column by column on whole arrays.
+
+    Returns:
+        {column: boolean numpy array, True for an invalid value} of the
+        columns with at least one.
+    """
+
+    import numpy
+    import pandas
+
+    invalid = dict()
+    for column, source, dtype in schema:
+        if source == NAME or dtype in ('string', 'category'):
+            continue
+        kind = raw[source].dtype.kind
+        if dtype != 'date' and (kind == 'i' or kind == 'f' and not dtype.startswith('int')):
+            continue # Read as numbers that fit the column, so every value converted.
+        mask = numpy.asarray(pandas.isna(columns[column])) & raw[source].notna().values
+        if mask.any():
+            invalid[column] = mask
+
+    return invalid
+
+
+def parse_records(schema, framed: Framed, season: str):
+    """
+    Builds the typed DataFrame of framed records, with the schema's
+    columns and a categorical season, leaving out the records with a
+    value that does not fit its column.
+
+    Args:
+        schema: list of (column, source, dtype)
+        framed: records from one of the frame functions
+        season: season to append at the end of dataframe as column.
+    Returns:
+        (DataFrame, list of Reject): the rejects of framing and validation
+    """
+
+    import numpy
+
+    with METRICS.stage('dataframe_build'):
+        raw = read_stat_lines(schema, framed.stat_lines, stat_width(schema))
+        columns = typed_columns(schema, framed.names, raw)
+        invalid = invalid_values(schema, raw, columns)
+
+        rejects = list(framed.rejects)
+        if invalid:
+            rows = numpy.logical_or.reduce(list(invalid.values()))
+            columns = {column: values[~rows] for column, values in columns.items()}
+            for row in numpy.flatnonzero(rows):
+                number = framed.line_numbers[row]
+                text = framed.stat_lines[row]
+                if framed.names:
+                    text = framed.names[row] + '\n' + text
+                bad = ', '.join(column for column, mask in invalid.items() if mask[row])
+                rejects.append(Reject(page_of(framed.header_lines, number), number,
+                                      'invalid value in ' + bad, text))
+            rejects.sort(key=lambda reject: reject.line)
+
+        df = columns_dataframe(columns, season)
+
+    return df, rejects
+
+
+def concat_batches(batches):
+    """
+    Concatenates parsed batches into one DataFrame, keeping categorical
+    columns categorical even when batches have different categories.
+
+    Args:
+        batches: iterable of DataFrames built by parse_records()
+    Returns:
+        The combined DataFrame (None when there are no batches).
+    """
+
+    import pandas
+
+    batches = list(batches)
+    if not batches:
+        return None
+
+    df = pandas.concat(batches, ignore_index=True)
+    for column in batches[0].select_dtypes('category').columns:
+        df[column] = df[column].astype('category')
+
+    return df
@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
 
-import time
-import pandas
 from termcolor import colored
 
-from utilities import dateConversion
-from my_constants import BUTTON_PAGE_SELECT
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from my_constants import BUTTON_PAGE_SELECT, STATS_SITE_URL, TEAM_BOX_SCORES_PATH, \
+                         TEAM_SEASON_STATS_PATH
+from metrics import METRICS
+from page_wait import select_season, wait_for_table, DEFAULT_TIMEOUT
+from pagination import get_table_pages, count_pages, read_pages
+from quarantine import QUARANTINE
+from scheduler import SCHEDULER, navigate
+from table_schema import TEAM_BOX_SCORE_SCHEMA, TEAM_SEASON_STATS_SCHEMA, \
+                         frame_single, frame_ranked, parse_records, stat_width
 
-def get_team_box_scores(browser, season_xpath: str, page_option: int):
+TEAM_BOX_SCORES_URL = STATS_SITE_URL + TEAM_BOX_SCORES_PATH
+TEAM_SEASON_STATS_URL = STATS_SITE_URL + TEAM_SEASON_STATS_PATH
+
+
+def get_team_box_scores(browser, season_xpath: str, page_option: int,
+                        timeout: float = DEFAULT_TIMEOUT, url: str = TEAM_BOX_SCORES_URL):
     """
     Collects the team box scores from NBA.com
 
@@ -16,6 +27,8 @@ def get_team_box_scores(browser, season_xpath: str, page_option: int):
         browser: Chrome driver browser instance (from initalizeChromeDriver())
         season_xath: XPATH of NBA season (defined on nba_data_scrapper.py)
         page_option: page on team box scores to collect
+        timeout: seconds to wait for each page to render (see page_wait.py)
+        url: page with the table
 
     Returns:
         table (long string) separate by new lines and spaces of the NBA
@@ -27,121 +40,117 @@ def get_team_box_scores(browser, season_xpath: str, page_option: int):
     print(colored(message, 'green'))
 
     #Get table of stats. 
-    browser.get('https://stats.nba.com/teams/boxscores/')
-    browser.find_element_by_xpath(season_xpath).click()
-    time.sleep(3) #Delay needed to let page load.
-
-    browser.find_element_by_xpath(page_selected).click()
-    time.sleep(3) #Delay needed to let page load.
+    navigate(browser, url)
+    table = select_season(browser, season_xpath, timeout)
 
-    table = browser.find_element_by_class_name('nba-stat-table__overflow')
+    with SCHEDULER.slot(url):
+        browser.find_element_by_xpath(page_selected).click()
+        if page_option > 2: #Option 2 is the first page, already shown.
+            table = wait_for_table(browser, table, timeout)
 
     return table
 
 
+def get_all_team_box_scores(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT,
+                            url: str = TEAM_BOX_SCORES_URL):
+    """
+    Collects every page of the team box scores for a season in one browser
+    session: the season is selected once and the pages are clicked through
+    in order.
+
+    Args:
+        browser: Chrome driver browser instance (from initalizeChromeDriver())
+        season_xpath: XPATH of NBA season (from my_constants.py)
+        timeout: seconds to wait for each page to render (see page_wait.py)
+        url: page with the table
+
+    Returns:
+        Table (long string) of every page, one page after the other, for
+        parse_team_box_scores().
+    """
+
+    message = '[+] GETTING ALL TEAM BOX SCORE PAGES'
+    print(colored(message, 'green'))
+
+    navigate(browser, url)
+
+    try:
+        season_table = select_season(browser, season_xpath, timeout)
+        page_count = count_pages(browser)
+        pages = read_pages(browser, range(1, page_count + 1), season_table, timeout)
+    except (TimeoutException, WebDriverException):
+        print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        raise
+
+    METRICS.increment('pages', page_count, table='teams/boxscores')
+
+    return '\n'.join(pages[page] for page in range(1, page_count + 1))
+
+
+def get_team_box_scores_pages(pool, season_xpath: str, workers: int = 4,
+                              timeout: float = DEFAULT_TIMEOUT, url: str = TEAM_BOX_SCORES_URL):
+    """
+    Collects every page of the team box scores for a season, reading page
+    ranges in several browser sessions at once (see pagination.py).
+
+    Args:
+        pool: DriverPool to lease browsers from
+        season_xpath: XPATH of NBA season (defined on nba_data_scrapper.py)
+        workers: number of browser sessions reading pages
+        timeout: seconds to wait for each page to render
+        url: page with the table
+
+    Returns:
+        List of table texts in page order. Joined by new lines they are
+        accepted by parse_team_box_scores().
+    """
+
+    message = '[+] GETTING ALL TEAM BOX SCORE PAGES'
+    print(colored(message, 'green'))
+
+    return get_table_pages(pool, url, season_xpath, workers, timeout)
+
+
 def parse_team_box_scores(table, season: str):
     """
     Parses through the box score table returned by get_team_box_scores().
 
     Args:
         table: (long string) separate by new lines and spaces of the NBA
-            team box score stats for a particular season.
+            team box score stats for a particular season, one or more
+            pages joined by new lines, or a table element.
         season: season to append at the end of the data frame as a column.
 
     Returns:
-        Data frame of the team box scores. 
+        Data frame of the team box scores, typed per TEAM_BOX_SCORE_SCHEMA
+        in table_schema.py
     """
 
     message = '[+] PARSING TEAM BOX SCORE TABLE'
     print(colored(message, 'green'))
 
-    team_stats = list()
-    lines_to_parse = table.text.split('\n')
-
-    for line_num, lines in enumerate(lines_to_parse):
-        if line_num != 0:
-            team_stats.append([i for i in lines.split(' ')])
-    
-    df = pandas.DataFrame({'team': [i[0] for i in team_stats],
-                       'opp': [i[3] for i in team_stats],
-                       'date': [i[4] for i in team_stats],
-                       'wl': [i[5] for i in team_stats],
-                       'min': [i[6] for i in team_stats], 
-                       'pts': [i[7] for i in team_stats],
-                       'fgm': [i[8] for i in team_stats],
-                       'fga': [i[9] for i in team_stats],
-                       'fgp': [i[10] for i in team_stats],
-                       '3pm': [i[11] for i in team_stats],
-                       '3pa': [i[12] for i in team_stats],
-                       '3pp': [i[13] for i in team_stats],
-                       'ftm': [i[14] for i in team_stats],
-                       'fta': [i[15] for i in team_stats],
-                       'ftp': [i[16] for i in team_stats],
-                       'oreb': [i[17] for i in team_stats],
-                       'dreb': [i[18] for i in team_stats],
-                       'reb': [i[19] for i in team_stats],
-                       'ast': [i[20] for i in team_stats],
-                       'stl': [i[21] for i in team_stats],
-                       'blk': [i[22] for i in team_stats],
-                       'tov': [i[23] for i in team_stats],
-                       'pf': [i[24] for i in team_stats],
-                       'pm': [i[25] for i in team_stats],
-                       })
-
-    df.insert(len(df.columns), 'season', season)
-
-    return df
+    text = table if isinstance(table, str) else table.text
 
+    with METRICS.stage('parse', table='teams/boxscores'):
+        lines_to_parse = text.split('\n')
+        framed = frame_single(lines_to_parse, stat_width(TEAM_BOX_SCORE_SCHEMA))
+        df, rejects = parse_records(TEAM_BOX_SCORE_SCHEMA, framed, season)
 
-def team_box_to_string(row):
-    """
-    Converts each row from generic team stats rows to a string so it can 
-    be inserted with SQL commands.  
+    QUARANTINE.add('teams/boxscores', season, rejects)
+    METRICS.increment('rows', len(df), table='teams/boxscores')
+    return df
 
-    Arg: 
-        row: iterative row called from insertGenericTeamDFtoTable()
-            in database_wrapper.py()
-    
-    Returns: 
-        String of the row passed as an argument.
-    """
 
-    result = "('" + row['team'] + "',"
-    result += "'" + str(row['opp']) + "',"
-    result += "'" + str(dateConversion(row['date'])) + "',"
-    result += "'" + str(row['wl']) + "',"
-    result += str(row['min']) + ','
-    result += str(row['pts']) + ','
-    result += str(row['fgm']) + ','
-    result += str(row['fga']) + ','
-    result += str(row['fgp']) + ','
-    result += str(row['3pm']) + ','
-    result += str(row['3pa']) + ','
-    result += str(row['3pp']) + ','
-    result += str(row['ftm']) + ','
-    result += str(row['fta']) + ','
-    result += str(row['ftp']) + ','
-    result += str(row['oreb']) + ','
-    result += str(row['dreb']) + ','
-    result += str(row['reb']) + ','
-    result += str(row['ast']) + ','
-    result += str(row['stl']) + ','
-    result += str(row['blk']) + ','
-    result += str(row['tov']) + ','
-    result += str(row['pf']) + ','
-    result += str(row['pm']) + ','
-    result += "'" + row['season'] + "')"
-
-    return result
-
-
-def get_team_season_stats(browser, season_xpath: str):
+def get_team_season_stats(browser, season_xpath: str, timeout: float = DEFAULT_TIMEOUT,
+                          url: str = TEAM_SEASON_STATS_URL):
     """
     Collects the season stats for all teams from NBA.com
 
     Args:
         browser: Chrome driver browser instance (from initalizeChromeDriver())
         seasonPath: XPATH of NBA season (defined on nba_data_scrapper.py)
+        timeout: seconds to wait for the table to render (see page_wait.py)
+        url: page with the table
 
     Returns: 
         Table (long string) separate by new lines and spaces of the NBA
@@ -152,11 +161,13 @@ def get_team_season_stats(browser, season_xpath: str):
     print(colored(message, 'green'))
 
     #Get table of stats. 
-    browser.get('https://stats.nba.com/teams/traditional/?sort=W_PCT&dir=-1')
-    browser.find_element_by_xpath(season_xpath).click()
-    time.sleep(3) #Delay needed to let page load.
+    navigate(browser, url)
 
-    table = browser.find_element_by_class_name('nba-stat-table__overflow')
+    try:
+        table = select_season(browser, season_xpath, timeout)
+    except (TimeoutException, WebDriverException):
+        print("[-] ERROR: PAGE FAILED TO LOAD IN TIME. RETRY AGAIN")
+        raise
 
     return table
 
@@ -167,103 +178,24 @@ def parse_team_season_stats(table, season: str):
 
     Args:
         table: a table (long string) separate by new lines and spaces of the NBA
-            team stats for a particular season.
+            team stats for a particular season, or the table element.
         season: season to append at the end (for my use for inserting into DB)
 
     Returns:
-        Data frame of the 
+        Data frame of the team season stats, typed per
+        TEAM_SEASON_STATS_SCHEMA in table_schema.py
     """
 
     message = '[+] PARSING GENERIC TABLE'
     print(colored(message, 'green'))
 
-    team_names = list()
-    team_stats = list()
-    lines_to_parse = table.text.split('\n')
-
-    for line_num, lines in enumerate(lines_to_parse):
-        if line_num != 0:
-            if line_num % 3 == 2:
-                team_names.append(lines)
-            elif line_num % 3 == 0:
-                team_stats.append([i for i in lines.split(' ')])
-    #player_stats now list of lists
-    
-    df = pandas.DataFrame({'team': team_names,
-                       'gp': [i[0] for i in team_stats],
-                       'w': [i[1] for i in team_stats],
-                       'l': [i[2] for i in team_stats],
-                       'winpct': [i[3] for i in team_stats], 
-                       'min': [i[4] for i in team_stats],
-                       'pts': [i[5] for i in team_stats],
-                       'fgm': [i[6] for i in team_stats],
-                       'fga': [i[7] for i in team_stats],
-                       'fgp': [i[8] for i in team_stats],
-                       '3pm': [i[9] for i in team_stats],
-                       '3pa': [i[10] for i in team_stats],
-                       '3pp': [i[11] for i in team_stats],
-                       'ftm': [i[12] for i in team_stats],
-                       'fta': [i[13] for i in team_stats],
-                       'ftp': [i[14] for i in team_stats],
-                       'oreb': [i[15] for i in team_stats],
-                       'dreb': [i[16] for i in team_stats],
-                       'reb': [i[17] for i in team_stats],
-                       'ast': [i[18] for i in team_stats],
-                       'tov': [i[19] for i in team_stats],
-                       'stl': [i[20] for i in team_stats],
-                       'blk': [i[21] for i in team_stats],
-                       'blka': [i[22] for i in team_stats],
-                       'pf': [i[23] for i in team_stats],
-                       'pfd': [i[24] for i in team_stats],
-                       'pm': [i[25] for i in team_stats],
-                       })
-
-    df.insert(len(df.columns), 'season', season) #Add the season
-
-    return df
-
+    text = table if isinstance(table, str) else table.text
 
-def team_season_to_string(row):
-    """
-    Converts each row from generic team stats rows to a string so it can 
-    be inserted with SQL commands.  
-
-    Arg: 
-        row = iterative row called from insertGenericTeamDFtoTable()
-            in database_wrapper.py()
-    
-    Returns:
-        String of the row passed as the argument
-    """
-
-    result = "('" + row['team'] + "',"
-    result += str(row['gp']) + ','
-    result += str(row['w']) + ','
-    result += str(row['l']) + ','
-    result += str(row['winpct']) + ','
-    result += str(row['min']) + ','
-    result += str(row['pts']) + ','
-    result += str(row['fgm']) + ','
-    result += str(row['fga']) + ','
-    result += str(row['fgp']) + ','
-    result += str(row['3pm']) + ','
-    result += str(row['3pa']) + ','
-    result += str(row['3pp']) + ','
-    result += str(row['ftm']) + ','
-    result += str(row['fta']) + ','
-    result += str(row['ftp']) + ','
-    result += str(row['oreb']) + ','
-    result += str(row['dreb']) + ','
-    result += str(row['reb']) + ','
-    result += str(row['ast']) + ','
-    result += str(row['tov']) + ','
-    result += str(row['stl']) + ','
-    result += str(row['blk']) + ','
-    result += str(row['blka']) + ','
-    result += str(row['pf']) + ','
-    result += str(row['pfd']) + ','
-    result += str(row['pm']) + ','
-    result += "'" + row['season'] + "')"
-
-    return result
+    with METRICS.stage('parse', table='teams/traditional'):
+        lines_to_parse = text.split('\n')
+        framed = frame_ranked(lines_to_parse, stat_width(TEAM_SEASON_STATS_SCHEMA))
+        df, rejects = parse_records(TEAM_SEASON_STATS_SCHEMA, framed, season)
 
+    QUARANTINE.add('teams/traditional', season, rejects)
+    METRICS.increment('rows', len(df), table='teams/traditional')
+    return df
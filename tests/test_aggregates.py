@@ -0,0 +1,51 @@
+import pandas
+
+from aggregates import BoxScoreAggregates
+from player_data_collection import parse_player_box_scores
+from benchmarks import synthetic_player_box_scores
+
+
+def box_scores(rows: int = 3000):
+    return parse_player_box_scores(synthetic_player_box_scores(rows), '2018-2019')
+
+
+def test_append_counts_every_game_once():
+    df = box_scores()
+    aggregates = BoxScoreAggregates()
+
+    added = aggregates.append(df)
+
+    unique = df.drop_duplicates(subset=['player', 'team', 'gamedate'])
+    assert added == len(unique)
+    assert aggregates.totals['gp'].sum() == len(unique)
+    assert aggregates.totals['pts'].sum() == unique['pts'].astype('float64').sum()
+
+
+def test_append_ignores_old_overlapping_batches():
+    df = box_scores()
+    aggregates = BoxScoreAggregates(windows=(2,))
+    aggregates.append(df)
+    totals = aggregates.totals.copy()
+    splits = {by: split.copy() for by, split in aggregates.splits.items()}
+
+    # Older than any player's last games, like a resumed backfill page.
+    oldest = df.sort_values('gamedate').head(200)
+    assert aggregates.append(oldest) == 0
+    assert aggregates.append(df.astype({'player': object, 'team': object})) == 0
+
+    pandas.testing.assert_frame_equal(aggregates.totals, totals)
+    for by, split in splits.items():
+        pandas.testing.assert_frame_equal(aggregates.splits[by], split)
+
+
+def test_append_keeps_the_key_index_across_save(tmp_path):
+    df = box_scores()
+    aggregates = BoxScoreAggregates()
+    aggregates.append(df.iloc[:300])
+    aggregates.save(str(tmp_path / 'aggregates.pkl'))
+
+    loaded = BoxScoreAggregates.load(str(tmp_path / 'aggregates.pkl'))
+    loaded.append(df)
+
+    unique = df.drop_duplicates(subset=['player', 'team', 'gamedate'])
+    assert loaded.totals['gp'].sum() == len(unique)
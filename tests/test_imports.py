@@ -0,0 +1,13 @@
+import pytest
+
+from benchmarks import IMPORT_BUDGETS, benchmark_imports
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS))
+def test_import_stays_light_and_within_budget(module):
+    result, = benchmark_imports({module: IMPORT_BUDGETS[module]})
+
+    assert result['loaded'] == [], "{0} imports {1} at import time".format(
+        module, ', '.join(result['loaded']))
+    assert result['seconds'] <= result['budget'], "{0} took {1}s to import, budget {2}s".format(
+        module, result['seconds'], result['budget'])
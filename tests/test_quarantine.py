@@ -0,0 +1,30 @@
+import json
+
+from quarantine import Quarantine
+from table_schema import Reject
+
+
+def rejects(count, start=0):
+    return [Reject(1, line, 'bad', 'row %d' % line) for line in range(start, start + count)]
+
+
+def test_rows_in_memory_are_capped():
+    quarantine = Quarantine(max_rows=10)
+    quarantine.add('players/boxscores', '2019-20', rejects(8))
+    quarantine.add('players/boxscores', '2019-20', rejects(8, start=8))
+
+    assert quarantine.count == 16
+    assert [row['line'] for row in quarantine.rows] == list(range(6, 16))
+
+    quarantine.clear()
+    assert quarantine.count == 0 and not quarantine.rows
+
+
+def test_log_file_gets_every_row(tmp_path):
+    log = tmp_path / 'quarantine.jsonl'
+    quarantine = Quarantine(str(log), max_rows=2)
+    quarantine.add('teams/boxscores', '2019-20', rejects(5))
+
+    with open(log) as f:
+        assert [json.loads(line)['line'] for line in f] == list(range(5))
+    assert len(quarantine.rows) == 2
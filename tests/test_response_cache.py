@@ -0,0 +1,48 @@
+import pytest
+
+from response_cache import ResponseCache
+
+LIVE = 'https://stats.nba.com/stats/leaguegamelog'
+REPLAY = 'http://127.0.0.1:8000/stats/leaguegamelog'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path), season_in_progress='2018-2019')
+
+
+def test_only_older_seasons_are_closed(cache):
+    assert cache.is_closed('2017-2018')
+    assert not cache.is_closed('2018-2019')
+    assert not cache.is_closed('2019-2020')
+    assert not cache.is_closed('2018-19')
+
+
+def test_entries_are_keyed_by_url_and_params(cache):
+    cache.put(LIVE, '2017-2018', 'live', params={'Season': '2017-18', 'DateFrom': ''})
+
+    assert cache.get(LIVE, '2017-2018', params={'Season': '2017-18', 'DateFrom': ''}) == 'live'
+    assert cache.get(REPLAY, '2017-2018', params={'Season': '2017-18', 'DateFrom': ''}) is None
+    assert cache.get(LIVE, '2017-2018',
+                     params={'Season': '2017-18', 'DateFrom': '01/01/2018'}) is None
+
+
+def test_open_seasons_expire(cache):
+    cache.ttl = -1
+    cache.put(LIVE, '2019-2020', 'future')
+    cache.put(LIVE, '2017-2018', 'closed')
+
+    assert cache.get(LIVE, '2019-2020') is None
+    assert cache.get(LIVE, '2017-2018') == 'closed'
+
+
+def test_failed_fetch_is_not_cached(cache):
+    def truncated():
+        raise RuntimeError('table ended early')
+
+    with pytest.raises(RuntimeError):
+        cache.fetch(LIVE, '2017-2018', truncated)
+
+    assert cache.get(LIVE, '2017-2018') is None
+    assert cache.fetch(LIVE, '2017-2018', lambda: 'full') == 'full'
+    assert cache.get(LIVE, '2017-2018') == 'full'
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from storage import StatsStore
+from player_data_collection import parse_player_box_scores
+from benchmarks import synthetic_player_box_scores
+
+
+def box_scores(rows: int, seed: int = 0):
+    return parse_player_box_scores(synthetic_player_box_scores(rows, seed), '2018-2019')
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StatsStore(str(tmp_path))
+    store.write('player_box_scores', box_scores(100))
+    return store
+
+
+def test_write_replaces_the_season(store):
+    store.write('player_box_scores', box_scores(40, seed=1))
+
+    assert len(store.read('player_box_scores')) == 40
+    assert store.seasons('player_box_scores') == ['2018-2019']
+    assert os.listdir(os.path.join(store.root, 'player_box_scores')) == ['season=2018-2019']
+
+
+def test_failed_write_keeps_the_stored_season(store, monkeypatch):
+    def fail(table, path):
+        raise OSError('disk full')
+    monkeypatch.setattr(store, 'write_table', fail)
+
+    with pytest.raises(OSError):
+        store.write('player_box_scores', box_scores(40, seed=1))
+
+    monkeypatch.undo()
+    assert len(store.read('player_box_scores')) == 100
+    assert os.listdir(os.path.join(store.root, 'player_box_scores')) == ['season=2018-2019']
+
+
+def test_batch_writer_replaces_the_season_on_close(store):
+    with store.writer('player_box_scores', '2018-2019') as writer:
+        writer(box_scores(30, seed=1))
+        writer(box_scores(20, seed=2))
+        # Readers keep seeing the stored season while batches stream in.
+        assert len(store.read('player_box_scores')) == 100
+
+    assert len(store.read('player_box_scores')) == 50
+
+
+def test_interrupted_stream_keeps_the_stored_season(store):
+    with pytest.raises(RuntimeError):
+        with store.writer('player_box_scores', '2018-2019') as writer:
+            writer(box_scores(30, seed=1))
+            raise RuntimeError('page failed')
+
+    assert len(store.read('player_box_scores')) == 100
+    assert os.listdir(os.path.join(store.root, 'player_box_scores')) == ['season=2018-2019']
@@ -0,0 +1,35 @@
+from table_schema import Framed, convert_column, parse_records
+
+SCHEMA = [
+    ('player', 'name', 'string'),
+    ('team', 0, 'category'),
+    ('pts', 1, 'int16'),
+    ('fgp', 2, 'float32'),
+]
+
+
+def framed(stat_lines):
+    names = ['Player %d' % row for row in range(len(stat_lines))]
+    return Framed(names, stat_lines, list(range(2, 2 * len(stat_lines) + 2, 2)), [1], [])
+
+
+def test_integer_column_converts_whole_floats():
+    values = convert_column(['12', '12.0', '7'], 'int16')
+    assert values.dtype == 'int16'
+    assert list(values) == [12, 12, 7]
+
+
+def test_fractional_value_in_integer_column_is_not_truncated():
+    df, rejects = parse_records(SCHEMA, framed(['LAL 12.5 40.0', 'BOS 10 50.0']), '2019-20')
+    assert list(df['player']) == ['Player 1']
+    assert list(df['pts']) == [10]
+    assert [reject.reason for reject in rejects] == ['invalid value in pts']
+    assert rejects[0].text == 'Player 0\nLAL 12.5 40.0'
+
+
+def test_fractional_value_in_float_column_is_kept():
+    df, rejects = parse_records(SCHEMA, framed(['LAL 12 40.5', 'BOS 10 -']), '2019-20')
+    assert rejects == []
+    assert list(df['pts']) == [12, 10]
+    assert df['fgp'].iloc[0] == 40.5
+    assert list(df['season']) == ['2019-20', '2019-20']
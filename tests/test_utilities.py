@@ -0,0 +1,43 @@
+import numpy
+import pandas
+
+from utilities import normalize_dates
+
+
+def test_normalize_dates_parses_every_value():
+    dates = normalize_dates(['04/10/2019', '04/09/2019', '04/10/2019'])
+
+    assert list(dates) == list(numpy.array(['2019-04-10', '2019-04-09', '2019-04-10'],
+                                           dtype='datetime64[ns]'))
+
+
+def test_normalize_dates_keeps_missing_dates_missing():
+    dates = normalize_dates(['04/10/2019', None, '04/09/2019'])
+
+    assert dates[0] == numpy.datetime64('2019-04-10', 'ns')
+    assert numpy.isnat(dates[1])
+    assert dates[2] == numpy.datetime64('2019-04-09', 'ns')
+
+
+def test_normalize_dates_keeps_blank_dates_missing():
+    dates = normalize_dates(['04/10/2019', None, '04/09/2019', float('nan'), ''])
+
+    assert dates[0] == numpy.datetime64('2019-04-10', 'ns')
+    assert numpy.isnat(dates[1])
+    assert dates[2] == numpy.datetime64('2019-04-09', 'ns')
+    assert numpy.isnat(dates[3])
+    assert numpy.isnat(dates[4])
+
+
+def test_normalize_dates_keeps_missing_categories_missing():
+    dates = normalize_dates(pandas.Categorical(['04/10/2019', None, '04/09/2019']))
+
+    assert numpy.isnat(dates[1])
+    assert dates[2] == numpy.datetime64('2019-04-09', 'ns')
+
+
+def test_normalize_dates_falls_back_to_dateutil():
+    dates = normalize_dates(['2019-04-10', 'not a date'])
+
+    assert dates[0] == numpy.datetime64('2019-04-10', 'ns')
+    assert numpy.isnat(dates[1])
@@ -1,25 +1,96 @@
 #!/usr/bin/env python3
 
 import os
+import datetime
+import functools
 
-from selenium import webdriver
-from dateutil.parser import parse
+#selenium.webdriver, pandas, numpy, dateutil (and requests/aiohttp in the backends) are
+#imported by the functions that use them, so importing the collectors stays cheap for
+#cache-only and parse-only runs. `benchmarks.py --suite imports` checks the budget.
 
-#----------------Utils---------------------------------------------------------------------------------------
+STATS_DATE_FORMAT = '%m/%d/%Y'
 
-all_players_option = '/html/body/main/div[2]/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select/option[1]'
+#----------------Utils---------------------------------------------------------------------------------------
 
-def initialize_chrome_driver():
+def initialize_chrome_driver(profile=None):
     """
-    Creates a chrome driver instance. 
+    Creates a chrome driver instance, from ./chromedriver when there is one
+    and from the PATH otherwise.
+
+    Args:
+        profile: driver profile, a name in driver_profiles.PROFILES such as
+                 'headless' or 'trimmed' (default: $NBA_DRIVER_PROFILE, else
+                 'full', a plain headed Chrome)
     """
+    from driver_profiles import start_chrome
+
     cwd = os.getcwd()
     chromedriver_path = cwd + '/chromedriver' 
-    browser = webdriver.Chrome(executable_path = chromedriver_path)
-    return browser
+    if not os.path.exists(chromedriver_path):
+        chromedriver_path = None
+    return start_chrome(profile, chromedriver_path)
+
+@functools.lru_cache(maxsize=4096)
+def _flexible_date(text: str):
+    """
+    Parses a date in any format dateutil understands, memoized since the
+    same few dates repeat across thousands of rows. NaT when unparseable.
+    """
+    import numpy
+    from dateutil.parser import parse
+
+    try:
+        return numpy.datetime64(parse(text), 'ns')
+    except (ValueError, OverflowError):
+        return numpy.datetime64('NaT', 'ns')
+
+def normalize_dates(values, date_format: str = STATS_DATE_FORMAT):
+    """
+    Converts a whole column of stats.nba.com date strings to datetime64.
+
+    Each distinct value is parsed once: categoricals reuse their categories
+    and other columns are factorized first. Distinct values go through the
+    fixed format fast path, and only those it rejects fall back to dateutil.
+
+    Args:
+        values: Series, Categorical or list of date strings (MM/DD/YYYY)
+        date_format: strptime format of the fast path
+    Returns:
+        numpy datetime64[ns] array (NaT for blanks and unparseable values).
+    """
+    import numpy
+    import pandas
+
+    values = values if isinstance(values, pandas.Series) else pandas.Series(values, dtype=object)
+
+    if isinstance(values.dtype, pandas.CategoricalDtype):
+        codes, uniques = values.cat.codes.values, values.cat.categories
+    else:
+        codes, uniques = pandas.factorize(values)
+
+    uniques = pandas.Index(uniques, dtype=object).astype(str)
+    parsed = pandas.to_datetime(uniques, format=date_format, errors='coerce').values.copy()
+
+    for index in numpy.flatnonzero(numpy.isnat(parsed)):
+        if uniques[index].strip():
+            parsed[index] = _flexible_date(uniques[index])
+
+    # Code -1 (None/NaN) must become NaT, not wrap around to the last date.
+    return pandas.DatetimeIndex(parsed).take(codes, allow_fill=True, fill_value=pandas.NaT).values
+
+def dateConversion(_date):
+    """
+    Formats a date string, or an already parsed date, as YYYY-MM-DD.
+    Prefer normalize_dates() for whole columns.
+    """
+    from dateutil.parser import parse
 
-def dateConversion(_date:str):
-    dt = parse(_date)
+    if hasattr(_date, 'strftime'):
+        return _date.strftime('%Y-%m-%d')
+    try:
+        dt = datetime.datetime.strptime(_date, STATS_DATE_FORMAT)
+    except ValueError:
+        dt = parse(_date)
     return dt.strftime('%Y-%m-%d')
 
 